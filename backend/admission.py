@@ -0,0 +1,398 @@
+"""
+Admission control for stem renders and mixdowns, against a memory budget for the whole host.
+
+create_dialogue / create_sfx hold the full-length stem as an AudioSegment and every overlay
+copies it, so a few long shows rendering at once can run the server out of memory. Before
+a render starts its peak memory is estimated from total_dialogue_duration, the sample
+format the mix ends up in (the highest rate and channel count of its clips, 16-bit) and
+its events' clips, and the render is admitted only if it fits in RENDER_MEMORY_BUDGET_MB
+next to the renders already running. A mixdown, which decodes every stem, is admitted the
+same way (run_admitted_mixdown).
+
+Reservations live in a small SQLite store (the rate limiter's, by default), so the API,
+the pipeline's render processes and worker.py processes on one machine share one budget.
+A reservation whose process has died is dropped.
+
+A render that does not fit
+- switches to the time-sliced parallel path (same output, far smaller peak) if that fits now,
+- otherwise waits its turn in a FIFO queue,
+- and when even alone it would exceed the budget, runs once nothing else is running - or,
+  with RENDER_DEGRADE_TO_DRAFT=1, renders a draft instead. A master render that was turned
+  into a draft is recorded next to the stem (repository.set_audio_degraded), so /get-audio can say so.
+
+The API starts its renders with submit_render, on RENDER_THREADS threads of their own: a render
+waiting its turn holds one of those, never a thread of the pool FastAPI runs sync endpoints on.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from database.connection import get_connection
+from database import repository
+from audio_generation.assets import get_asset_info
+from audio_generation.sfx import get_sfx_path
+from audio_generation.parallel_render import RENDER_WORKERS, WINDOWS_PER_WORKER, MIN_WINDOW_SECONDS
+from audio_generation.draft import DRAFT_SAMPLE_RATE, DRAFT_CHANNELS
+from audio_generation.music_library import best_tracks, scene_text
+from rate_limit import RATE_LIMIT_DB
+
+MB = 1024 * 1024
+RENDER_MEMORY_BUDGET = int(float(os.getenv("RENDER_MEMORY_BUDGET_MB", "2048")) * MB)  # 0 disables admission
+RENDER_DEGRADE_TO_DRAFT = os.getenv("RENDER_DEGRADE_TO_DRAFT", "0") == "1"
+RENDER_MEMORY_DB = os.getenv("RENDER_MEMORY_DB", RATE_LIMIT_DB)
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", "4"))
+
+SAMPLE_WIDTH = 2  # every path mixes 16-bit PCM (float32 in numpy, 4 bytes, where noted)
+SEQUENTIAL_STEM_COPIES = 4  # the stem, overlay's copy and slices of it, compute_peaks' float array
+WORKER_BASE_BYTES = 80 * MB  # a spawned render process with numpy and pydub imported
+EVENT_OVERHEAD_BYTES = 64 * 1024  # timing entries, plan ops and pydub bookkeeping per event
+MISSING_CLIP_SECONDS = 10  # effects not in the library yet are generated at about this length
+MISSING_CLIP_FORMAT = (44100, 2)
+ENCODE_CHUNK_SECONDS = 30
+MIXDOWN_FORMAT = (48000, 2)  # stems decode at the rate they were encoded at, at most this for the assets here
+MIXDOWN_COPIES = 4  # the mix, the stem being overlaid, overlay's result and export's copy
+POLL_SECONDS = 0.5
+WAITER_STALE_SECONDS = 10  # a waiter that stopped polling no longer holds up the queue
+
+_stats = Counter()  # this process's admissions
+_local = threading.local()
+_render_pool = ThreadPoolExecutor(max_workers=RENDER_THREADS, thread_name_prefix="render")
+_in_flight = 0  # renders submitted to _render_pool and not finished yet
+_in_flight_lock = threading.Lock()
+
+
+def _pcm_bytes(seconds, sample_rate, channels, sample_width=SAMPLE_WIDTH):
+    return int(math.ceil(seconds * sample_rate)) * channels * sample_width
+
+
+def _clip_formats(event_timing, audio_type):
+    """(path, duration_seconds, sample_rate, channels) of every clip a stem overlays, from the asset index."""
+    clips = []
+    if audio_type == "dialogue":
+        for segment in event_timing.get("dialogue_timing", []):
+            if os.path.exists(segment["file"]):
+                info = get_asset_info(segment["file"])
+                clips.append((segment["file"], info["duration"], info["sample_rate"], info["channels"]))
+    else:
+        for event in event_timing.get("sound_effect_timing", []):
+            path = get_sfx_path(event["effect"], event.get("description"))
+            if path:
+                info = get_asset_info(path)
+                clips.append((path, info["duration"], info["sample_rate"], info["channels"]))
+            else:
+                clips.append((event["effect"], MISSING_CLIP_SECONDS, *MISSING_CLIP_FORMAT))
+    return clips
+
+
+def estimate_stem(event_timing, audio_type, parsed_script=None, free=None):
+    """
+    Estimated peak bytes of each way of rendering a stem: {"sequential", "parallel", "draft"}
+    for dialogue and sfx, {"sequential", "draft"} for the already streamed music.
+    Dialogue and sfx also get "parallel_workers", the pool size the parallel estimate is for:
+    as many as fit in free bytes (at least one), up to RENDER_WORKERS.
+    """
+    seconds = event_timing["total_dialogue_duration"]
+    events = len(event_timing.get("dialogue_timing" if audio_type == "dialogue" else "sound_effect_timing", []))
+    overhead = events * EVENT_OVERHEAD_BYTES
+
+    if audio_type == "music":
+        tracks = best_tracks(scene_text(parsed_script or {}), total_duration=seconds)
+        track = max(tracks, key=lambda track: track["duration"])
+        info = get_asset_info(track["path"])
+        decoded = _pcm_bytes(info["duration"], info["sample_rate"], info["channels"])
+        chunk = _pcm_bytes(ENCODE_CHUNK_SECONDS, info["sample_rate"], info["channels"])
+        return {
+            # the decoded track, the loop body cut from it, and a few chunks on their way to the encoder
+            "sequential": 2 * decoded + 4 * chunk,
+            "draft": _pcm_bytes(info["duration"], DRAFT_SAMPLE_RATE, DRAFT_CHANNELS, 4)
+                     + 2 * _pcm_bytes(seconds, DRAFT_SAMPLE_RATE, DRAFT_CHANNELS, 4),
+        }
+
+    clips = _clip_formats(event_timing, audio_type)
+    # pydub's overlay upgrades the mix to the highest rate and channel count it meets
+    sample_rate = max([11025] + [rate for _, _, rate, _ in clips])
+    channels = max([1] + [clip_channels for _, _, _, clip_channels in clips])
+    stem = _pcm_bytes(seconds, sample_rate, channels)
+    durations = {path: duration for path, duration, _, _ in clips}.values()
+    largest_clip = max([_pcm_bytes(duration, sample_rate, channels) for duration in durations] or [0])
+    # float32 samples of every distinct clip, cached by whichever window process needs them
+    clip_cache = sum(_pcm_bytes(duration, sample_rate, channels, 4) for duration in durations)
+
+    def parallel_peak(workers):
+        # fewer workers cut the timeline into fewer, longer windows (see parallel_render._windows)
+        windows = max(1, min(workers * WINDOWS_PER_WORKER, int(seconds // MIN_WINDOW_SECONDS) or 1))
+        window = _pcm_bytes(seconds / windows, sample_rate, channels, 4)
+        # the shared PCM buffer, plus per window process its float32 window and the clips it touches
+        return stem + clip_cache + overhead + min(workers, windows) * (WORKER_BASE_BYTES + 2 * window)
+
+    workers = RENDER_WORKERS
+    while free is not None and workers > 1 and parallel_peak(workers) > free:
+        workers -= 1
+
+    draft_clips = sum(_pcm_bytes(duration, DRAFT_SAMPLE_RATE, DRAFT_CHANNELS, 4) for duration in durations)
+    return {
+        "sequential": SEQUENTIAL_STEM_COPIES * stem + 2 * largest_clip + overhead,
+        "parallel": parallel_peak(workers),
+        "parallel_workers": workers,
+        # float32 mix, its int16 copy for the encoder, and every clip decoded at the draft rate
+        "draft": _pcm_bytes(seconds, DRAFT_SAMPLE_RATE, DRAFT_CHANNELS, 6) + draft_clips + overhead,
+    }
+
+
+def load_estimate(show_id, audio_type, free=None):
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+        parsed_script = repository.get_parsed_script(conn, show_id) if audio_type == "music" else None
+    if not event_timing:
+        raise ValueError(f"Show {show_id} has no timing")
+    return estimate_stem(event_timing, audio_type, parsed_script, free)
+
+
+def estimate_mixdown(show_id, quality="master"):
+    """Estimated peak bytes of mixing down a show's stems (or with quality="draft", its draft stems)."""
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+        sizes = repository.get_audio_sizes(conn, show_id)
+    if not event_timing:
+        raise ValueError(f"Show {show_id} has no timing")
+    seconds = event_timing["total_dialogue_duration"]
+    if quality == "draft":
+        # every draft stem decoded to int16 and kept as float32, and the float32 mix with its int16 copy
+        return (len(repository.AUDIO_TYPES) + 1) * _pcm_bytes(seconds, DRAFT_SAMPLE_RATE, DRAFT_CHANNELS, 6)
+    return sum(sizes.values()) + MIXDOWN_COPIES * _pcm_bytes(seconds, *MIXDOWN_FORMAT)
+
+
+def _mode(audio_type, parallel, quality):
+    if quality == "draft":
+        return "draft"
+    return "parallel" if parallel and audio_type in ("dialogue", "sfx") else "sequential"
+
+
+def choose_mode(estimates, requested, free, budget=None):
+    """
+    The mode to render in and whether to wait for it: the requested mode if it fits now, the
+    parallel path (same output) if that does, otherwise the smallest same-output mode that fits
+    the budget at all - or a draft, when no master render ever could.
+    """
+    budget = RENDER_MEMORY_BUDGET if budget is None else budget
+    same_output = [requested] if requested == "draft" else \
+        [mode for mode in (requested, "parallel") if mode in estimates]
+    for mode in same_output:
+        if estimates[mode] <= free:
+            return mode, False
+
+    fitting = [mode for mode in same_output if estimates[mode] <= budget]
+    if fitting:
+        return min(fitting, key=estimates.get), True
+    if requested != "draft" and RENDER_DEGRADE_TO_DRAFT and estimates["draft"] <= budget:
+        return "draft", estimates["draft"] > free
+    # too big even alone: run it by itself rather than never
+    return min(same_output, key=estimates.get), True
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        os.makedirs(os.path.dirname(RENDER_MEMORY_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(RENDER_MEMORY_DB, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS render_reservations (
+            id TEXT PRIMARY KEY, pid INTEGER, show_id INTEGER, audio_type TEXT, mode TEXT, bytes INTEGER,
+            admitted REAL, queued_seconds REAL)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS render_waiters (
+            id TEXT PRIMARY KEY, arrived REAL, heartbeat REAL)""")
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """An immediate (write-locked) transaction, so check-and-reserve is atomic across processes."""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _purge(conn, now):
+    """Drop the reservations of dead processes and waiters that stopped polling."""
+    for (pid,) in conn.execute("SELECT DISTINCT pid FROM render_reservations").fetchall():
+        if not _alive(pid):
+            conn.execute("DELETE FROM render_reservations WHERE pid = ?", (pid,))
+    conn.execute("DELETE FROM render_waiters WHERE heartbeat < ?", (now - WAITER_STALE_SECONDS,))
+
+
+def _usage(conn):
+    """(bytes reserved, renders running, renders waiting)."""
+    in_use, running = conn.execute("SELECT COALESCE(SUM(bytes), 0), COUNT(*) FROM render_reservations").fetchone()
+    waiting = conn.execute("SELECT COUNT(*) FROM render_waiters").fetchone()[0]
+    return in_use, running, waiting
+
+
+def free_bytes():
+    """Budget left for a render arriving now - none while others are queued, so nobody jumps the queue."""
+    with _transaction() as conn:
+        _purge(conn, time.time())
+        in_use, _, waiting = _usage(conn)
+    return RENDER_MEMORY_BUDGET - in_use if not waiting else 0
+
+
+def _try_admit(conn, waiter_id, arrived, show_id, audio_type, mode, estimate, now):
+    _purge(conn, now)
+    in_use, running, _ = _usage(conn)
+    ahead = conn.execute(
+        "SELECT COUNT(*) FROM render_waiters WHERE (arrived < ? OR (arrived = ? AND id < ?)) AND id != ?",
+        (arrived, arrived, waiter_id, waiter_id)
+    ).fetchone()[0]
+    # first in line, and either it fits or nothing else is running
+    if not ahead and (in_use + estimate <= RENDER_MEMORY_BUDGET or not running):
+        conn.execute("DELETE FROM render_waiters WHERE id = ?", (waiter_id,))
+        conn.execute("INSERT INTO render_reservations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     (waiter_id, os.getpid(), show_id, audio_type, mode, estimate, now, round(now - arrived, 2)))
+        return in_use + estimate
+    conn.execute("INSERT OR REPLACE INTO render_waiters VALUES (?, ?, ?)", (waiter_id, arrived, now))
+    return None
+
+
+@contextmanager
+def admitted(show_id, audio_type, mode, estimate, wait):
+    """Reserve estimate bytes of the host's budget for the duration of a render, queueing for it if need be."""
+    reservation = uuid.uuid4().hex
+    arrived = time.time()
+    if wait:
+        _stats["queued"] += 1
+        print(f"⏳ {audio_type} render of show {show_id} queued: needs {estimate / MB:.0f} MB")
+    while True:
+        with _transaction() as conn:
+            in_use = _try_admit(conn, reservation, arrived, show_id, audio_type, mode, estimate, time.time())
+        if in_use is not None:
+            break
+        time.sleep(POLL_SECONDS)
+    _stats["admitted"] += 1
+    _stats["peak_in_use_bytes"] = max(_stats["peak_in_use_bytes"], in_use)
+    try:
+        yield
+    finally:
+        with _transaction() as conn:
+            conn.execute("DELETE FROM render_reservations WHERE id = ?", (reservation,))
+
+
+def _record_outcome(show_id, audio_type, requested, mode):
+    if requested == "draft":
+        return  # a requested draft leaves the master stem, and what is known about it, alone
+    with get_connection() as conn:
+        repository.set_audio_degraded(conn, show_id, audio_type, "draft" if mode == "draft" else None)
+
+
+def run_admitted(render, show_id, audio_type, parallel=False, quality="master"):
+    """
+    Run render(show_id, audio_type, parallel, quality, workers) once it fits in the memory
+    budget, possibly switched to the parallel or draft path (see choose_mode). A parallel
+    render gets as many workers as fit in the budget left when it arrives.
+    """
+    if RENDER_MEMORY_BUDGET <= 0:
+        _local.mode = _mode(audio_type, parallel, quality)
+        return render(show_id, audio_type, parallel, quality, RENDER_WORKERS)
+
+    free = free_bytes()
+    estimates = load_estimate(show_id, audio_type, free)
+    requested = _mode(audio_type, parallel, quality)
+    mode, wait = choose_mode(estimates, requested, free)
+    if mode != requested:
+        _stats[f"degraded_to_{mode}"] += 1
+        print(f"🧮 {audio_type} render of show {show_id}: {requested} needs ~{estimates[requested] / MB:.0f} MB, "
+              f"rendering {mode} (~{estimates[mode] / MB:.0f} MB) instead")
+
+    _local.mode = mode
+    with admitted(show_id, audio_type, mode, estimates[mode], wait):
+        result = render(show_id, audio_type, mode == "parallel", "draft" if mode == "draft" else "master",
+                        estimates.get("parallel_workers", RENDER_WORKERS))
+    # only a render that succeeded changes what the stem is known to be
+    _record_outcome(show_id, audio_type, requested, mode)
+    return result
+
+
+def run_admitted_mixdown(mix, show_id, quality="master"):
+    """Run mix(show_id, quality) once it fits in the memory budget. A mixdown has no cheaper path, so it only waits."""
+    if RENDER_MEMORY_BUDGET <= 0:
+        return mix(show_id, quality)
+    estimate = estimate_mixdown(show_id, quality)
+    with admitted(show_id, "mixdown", quality, estimate, estimate > free_bytes()):
+        return mix(show_id, quality)
+
+
+def admitted_mode():
+    """The mode the calling thread's last render ran in: "sequential", "parallel" or "draft"."""
+    return getattr(_local, "mode", None)
+
+
+def admission_stats():
+    """The host's reservations and queue, plus this process's admission counters."""
+    with _transaction() as conn:
+        _purge(conn, time.time())
+        in_use, _, waiting = _usage(conn)
+        running = conn.execute(
+            "SELECT pid, show_id, audio_type, mode, bytes, queued_seconds FROM render_reservations ORDER BY admitted"
+        ).fetchall()
+    stats = dict(_stats)
+    peak = stats.pop("peak_in_use_bytes", 0)
+    return {
+        "budget_mb": round(RENDER_MEMORY_BUDGET / MB, 1),
+        "in_use_mb": round(in_use / MB, 1),
+        "peak_in_use_mb": round(peak / MB, 1),
+        "queue_depth": waiting,
+        "running": [{"pid": pid, "show_id": show_id, "audio_type": audio_type, "mode": mode,
+                     "estimated_mb": round(size / MB, 1), "queued_seconds": queued}
+                    for pid, show_id, audio_type, mode, size, queued in running],
+        **stats,
+    }
+
+
+def _run_render(render, args):
+    global _in_flight
+    try:
+        render(*args)
+    except Exception as e:
+        traceback.print_exc()
+        print(f"❌ {render.__name__}{args} failed: {str(e)}")
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def submit_render(render, *args):
+    """Run render(*args) on the render threads, queueing behind the renders already there."""
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+    _render_pool.submit(_run_render, render, args)
+
+
+def renders_in_flight():
+    """Renders submitted in this process that have not finished, queued ones included."""
+    return _in_flight
+
+
+def shutdown():
+    _render_pool.shutdown(wait=False, cancel_futures=True)
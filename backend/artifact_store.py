@@ -0,0 +1,233 @@
+"""
+Content-addressed store for the files workers share: TTS clips, sound effects, music and stems.
+
+Objects are stored once under their SHA-256; refs map a file's path in the backend folder
+(e.g. "data/dialogue/Leo_curious_what_is_this_Charlie.mp3") to the object it holds. A worker with
+its own working folder calls ensure_local(path) before reading a file and publish(path) after
+writing one, so every worker keeps using the ordinary data/ paths.
+
+ARTIFACT_STORE picks the backend: a directory (or file:// URL) for the filesystem store.
+It does not make the workers portable across machines: they still share the API's database,
+which is also the one place rendered stems are kept.
+"""
+import abc
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from urllib.parse import urlparse
+
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "data/artifacts")
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_local_digests = {}  # path -> (size, mtime_ns, digest), so unchanged files are not hashed again
+
+
+def local_digest(path):
+    """Digest of a local file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cached = _local_digests.get(path)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+    digest = file_digest(path)
+    _local_digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+class ArtifactStore(abc.ABC):
+    """Interface of an artifact store backend."""
+
+    @abc.abstractmethod
+    def put_file(self, path) -> str:
+        """Store a file's content, returning its digest."""
+
+    @abc.abstractmethod
+    def put_bytes(self, data) -> str:
+        """Store bytes, returning their digest."""
+
+    @abc.abstractmethod
+    def get_bytes(self, digest) -> bytes:
+        """The content of an object."""
+
+    @abc.abstractmethod
+    def fetch(self, digest, path):
+        """Write the object to path."""
+
+    @abc.abstractmethod
+    def exists(self, digest) -> bool:
+        """Whether an object is stored."""
+
+    @abc.abstractmethod
+    def set_ref(self, name, digest):
+        """Point the ref name at an object."""
+
+    @abc.abstractmethod
+    def get_ref(self, name):
+        """The digest a ref points at, or None."""
+
+    @abc.abstractmethod
+    def list_refs(self, prefix=""):
+        """Names of the refs under prefix, sorted."""
+
+
+def _atomic_write(path, write):
+    """Write through a temporary file and rename, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class FilesystemArtifactStore(ArtifactStore):
+    """objects/ab/cdef... hold the content, refs/<path> hold the digest of what a path contains."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def _ref_path(self, name):
+        name = os.path.normpath(name)
+        if name.startswith("..") or os.path.isabs(name):
+            raise ValueError(f"Invalid artifact ref: {name}")
+        return os.path.join(self.root, "refs", name)
+
+    def put_file(self, path):
+        digest = file_digest(path)
+        if not self.exists(digest):
+            with open(path, "rb") as source:
+                _atomic_write(self._object_path(digest), lambda f: shutil.copyfileobj(source, f))
+        return digest
+
+    def put_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            _atomic_write(self._object_path(digest), lambda f: f.write(data))
+        return digest
+
+    def get_bytes(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return f.read()
+
+    def fetch(self, digest, path):
+        with open(self._object_path(digest), "rb") as source:
+            _atomic_write(path, lambda f: shutil.copyfileobj(source, f))
+
+    def exists(self, digest):
+        return os.path.exists(self._object_path(digest))
+
+    def set_ref(self, name, digest):
+        _atomic_write(self._ref_path(name), lambda f: f.write(digest.encode("ascii")))
+
+    def get_ref(self, name):
+        try:
+            with open(self._ref_path(name), "r", encoding="ascii") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def list_refs(self, prefix=""):
+        refs_root = os.path.join(self.root, "refs")
+        start = os.path.join(refs_root, os.path.normpath(prefix)) if prefix else refs_root
+        names = []
+        for folder, _, files in os.walk(start):
+            for file_name in files:
+                if not file_name.endswith(".tmp"):
+                    names.append(os.path.relpath(os.path.join(folder, file_name), refs_root))
+        return sorted(names)
+
+
+ARTIFACT_BACKENDS = {"file": FilesystemArtifactStore}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """The store configured by ARTIFACT_STORE (a path, or scheme://location)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            parsed = urlparse(ARTIFACT_STORE)
+            scheme = parsed.scheme or "file"
+            location = parsed.path if parsed.scheme else ARTIFACT_STORE
+            if scheme not in ARTIFACT_BACKENDS:
+                raise ValueError(f"Unknown artifact store '{scheme}'. Choose from {', '.join(ARTIFACT_BACKENDS)}.")
+            _store = ARTIFACT_BACKENDS[scheme](location)
+        return _store
+
+
+def publish(path):
+    """
+    Store a local file under its path, unless the ref already points at the same content.
+    Returns its digest, or None if the file does not exist.
+    """
+    digest = local_digest(path)
+    if digest is None:
+        return None
+    store = get_artifact_store()
+    if store.get_ref(path) != digest or not store.exists(digest):
+        store.put_file(path)
+        store.set_ref(path, digest)
+    return digest
+
+
+def _refresh(path):
+    """Fetch path if it is missing or differs from its ref. True if it was fetched, None if there is no ref."""
+    store = get_artifact_store()
+    digest = store.get_ref(path)
+    if digest is None or not store.exists(digest):
+        return None
+    if local_digest(path) == digest:
+        return False
+    store.fetch(digest, path)
+    return True
+
+
+def ensure_local(path):
+    """
+    Make the local copy of path match the store (a file replaced by another worker is fetched
+    again). True if the file exists afterwards.
+    """
+    _refresh(path)
+    return os.path.exists(path)
+
+
+def sync_folder(folder):
+    """Fetch every stored file under folder that is missing or stale locally (e.g. the SFX or music library)."""
+    return sum(1 for name in get_artifact_store().list_refs(folder) if _refresh(name))
+
+
+def publish_folder(folder, extensions=None):
+    """Publish the files of a local folder that are new or changed since they were last published."""
+    published = 0
+    if not os.path.isdir(folder):
+        return published
+    store = get_artifact_store()
+    for file_name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file_name)
+        if not os.path.isfile(path) or (extensions and not file_name.endswith(extensions)):
+            continue
+        before = store.get_ref(path)
+        if publish(path) != before:
+            published += 1
+    return published
@@ -0,0 +1,130 @@
+"""
+In-process cache of recently served stems for /get-audio.
+
+A size-bounded LRU of (show_id, audio_type) -> MP3 bytes, together with what else the
+endpoint reports about the stem (whether it is degraded). Concurrent misses for the same
+stem share a single database read: the first request loads it and the others wait for
+that result, so a launch does not copy the same BLOB once per listener.
+
+Entries are dropped when repository.save_audio (or set_audio_degraded) changes a stem in this
+process, and re-checked against the stored version every AUDIO_CACHE_REVALIDATE_SECONDS to catch stems
+written by other processes (pipeline workers).
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "256")) * 1024 * 1024
+AUDIO_CACHE_MAX_ENTRY_FRACTION = 0.25  # a stem bigger than this share of the cache is served uncached
+AUDIO_CACHE_REVALIDATE_SECONDS = float(os.getenv("AUDIO_CACHE_REVALIDATE_SECONDS", "2"))
+
+_entries = OrderedDict()  # key -> {"audio", "version", "info", "checked"}
+_inflight = {}  # key -> Future shared by the requests waiting on the first one's load
+_generations = Counter()  # bumped by invalidate(), so a load that raced a write is not stored
+_stats = Counter()
+_size = 0
+_lock = threading.Lock()
+
+
+def _drop(key):
+    global _size
+    entry = _entries.pop(key, None)
+    if entry:
+        _size -= len(entry["audio"])
+
+
+def _store(key, audio, version, info):
+    global _size
+    if len(audio) > AUDIO_CACHE_MAX_BYTES * AUDIO_CACHE_MAX_ENTRY_FRACTION:
+        _stats["too_large"] += 1
+        return
+    _drop(key)
+    _entries[key] = {"audio": audio, "version": version, "info": info, "checked": time.monotonic()}
+    _size += len(audio)
+    while _size > AUDIO_CACHE_MAX_BYTES:
+        oldest = next(iter(_entries))
+        _drop(oldest)
+        _stats["evictions"] += 1
+
+
+def get_audio(key, load, current_version):
+    """
+    (audio, info) for key, from the cache or from load() -> (audio, version, info) / None,
+    (None, None) when there is no audio. current_version() returns the stored version and is
+    only called to revalidate an entry older than AUDIO_CACHE_REVALIDATE_SECONDS.
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry and time.monotonic() - entry["checked"] < AUDIO_CACHE_REVALIDATE_SECONDS:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry["audio"], entry["info"]
+
+    if entry:
+        version = current_version()
+        with _lock:
+            if _entries.get(key) is entry and entry["version"] == version:
+                entry["checked"] = time.monotonic()
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return entry["audio"], entry["info"]
+            if _entries.get(key) is entry:
+                _drop(key)
+                _stats["stale"] += 1
+
+    with _lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+            generation = _generations[key]
+            _stats["misses"] += 1
+        else:
+            _stats["coalesced"] += 1
+    if not leader:
+        return future.result()
+
+    try:
+        loaded = load()
+    except BaseException as e:
+        with _lock:
+            _inflight.pop(key, None)
+        future.set_exception(e)
+        raise
+
+    audio, info = (loaded[0], loaded[2]) if loaded else (None, None)
+    with _lock:
+        _inflight.pop(key, None)
+        if audio and _generations[key] == generation:
+            _store(key, audio, loaded[1], info)
+    future.set_result((audio, info))
+    return audio, info
+
+
+def invalidate(key):
+    """Forget a stem that has just been rewritten (or re-flagged)."""
+    with _lock:
+        _generations[key] += 1
+        if key in _entries:
+            _drop(key)
+            _stats["invalidations"] += 1
+
+
+def cache_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"] + _stats["coalesced"]
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "coalesced": _stats["coalesced"],
+            "stale": _stats["stale"],
+            "evictions": _stats["evictions"],
+            "invalidations": _stats["invalidations"],
+            "too_large": _stats["too_large"],
+            "hit_rate": (_stats["hits"] + _stats["coalesced"]) / lookups if lookups else 0.0,
+            "entries": len(_entries),
+            "bytes": _size,
+            "max_bytes": AUDIO_CACHE_MAX_BYTES,
+        }
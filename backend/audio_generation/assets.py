@@ -0,0 +1,219 @@
+"""
+Asset ingest: loudness and format metadata for every SFX, music and dialogue file.
+
+Each file is decoded once when it first appears (or changes) and the results are
+kept in data/asset_index.json, so renders can do gain staging from metadata
+instead of decoding every file up front to measure it.
+
+Usage:
+    python -m audio_generation.assets        # ingest the whole library
+"""
+import json
+import os
+import threading
+import numpy as np
+from pydub import AudioSegment
+from scipy.signal import lfilter
+
+ASSET_INDEX_PATH = "data/asset_index.json"
+ASSET_FOLDERS = ("data/sfx", "data/music", "data/dialogue")
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+# An asset counts as background ambience when it is long and steady
+BACKGROUND_MIN_DURATION = 5.0  # seconds
+BACKGROUND_MAX_LOUDNESS_RANGE = 8.0  # LU
+
+SILENCE_LUFS = -70.0  # absolute gate of ITU-R BS.1770, also used for silent files
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _k_weighting_filters(sample_rate):
+    """ITU-R BS.1770 K-weighting (high shelf + high pass) biquads for any sample rate."""
+    # stage 1: high shelf modelling the acoustic effect of the head
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    # stage 2: RLB high pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    return (shelf_b, shelf_a), (highpass_b, highpass_a)
+
+
+def _block_loudness(weighted, sample_rate, block_seconds, step_seconds):
+    """Mean square per gating block, summed over channels."""
+    block = int(block_seconds * sample_rate)
+    step = int(step_seconds * sample_rate)
+    if len(weighted) < block:
+        return np.array([np.mean(weighted ** 2, axis=0).sum()]) if len(weighted) else np.array([])
+
+    squared = np.cumsum(np.vstack([np.zeros((1, weighted.shape[1])), weighted ** 2]), axis=0)
+    starts = np.arange(0, len(weighted) - block + 1, step)
+    return ((squared[starts + block] - squared[starts]) / block).sum(axis=1)
+
+
+def _to_lufs(mean_square):
+    return -0.691 + 10 * np.log10(np.maximum(mean_square, 1e-12))
+
+
+def integrated_loudness(samples, sample_rate):
+    """
+    Integrated loudness (LUFS) of float samples shaped (frames, channels),
+    following ITU-R BS.1770-4 with absolute and relative gating.
+    """
+    (shelf_b, shelf_a), (highpass_b, highpass_a) = _k_weighting_filters(sample_rate)
+    weighted = lfilter(highpass_b, highpass_a, lfilter(shelf_b, shelf_a, samples, axis=0), axis=0)
+
+    blocks = _block_loudness(weighted, sample_rate, 0.4, 0.1)
+    blocks = blocks[_to_lufs(blocks) > SILENCE_LUFS]
+    if not len(blocks):
+        return SILENCE_LUFS, weighted
+
+    relative_gate = _to_lufs(blocks.mean()) - 10
+    gated = blocks[_to_lufs(blocks) > relative_gate]
+    return float(_to_lufs(gated.mean())), weighted
+
+
+def loudness_range(weighted, sample_rate):
+    """EBU R128 loudness range (LU) from short-term (3s) loudness, 10th to 95th percentile."""
+    short_term = _to_lufs(_block_loudness(weighted, sample_rate, 3.0, 1.0))
+    short_term = short_term[short_term > SILENCE_LUFS]
+    if len(short_term) < 2:
+        return 0.0
+
+    relative_gate = _to_lufs(np.mean(10 ** ((short_term + 0.691) / 10))) - 20
+    short_term = short_term[short_term > relative_gate]
+    if len(short_term) < 2:
+        return 0.0
+    return float(np.percentile(short_term, 95) - np.percentile(short_term, 10))
+
+
+def segment_to_array(audio):
+    """pydub AudioSegment -> float32 numpy array shaped (frames, channels) in [-1, 1]."""
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    samples = samples.reshape(-1, audio.channels)
+    return samples / float(1 << (8 * audio.sample_width - 1))
+
+
+def analyze_audio(audio):
+    """Loudness and format metadata of a decoded AudioSegment."""
+    samples = segment_to_array(audio)
+    lufs, weighted = integrated_loudness(samples, audio.frame_rate)
+    peak = float(np.abs(samples).max()) if len(samples) else 0.0
+    duration = len(audio) / 1000.0
+    lra = loudness_range(weighted, audio.frame_rate)
+
+    return {
+        "duration": duration,
+        "duration_ms": len(audio),
+        "sample_rate": audio.frame_rate,
+        "channels": audio.channels,
+        "lufs": round(lufs, 2),
+        "peak_dbfs": round(20 * np.log10(peak), 2) if peak > 0 else -120.0,
+        "loudness_range": round(lra, 2),
+        "is_background": duration > BACKGROUND_MIN_DURATION and lra <= BACKGROUND_MAX_LOUDNESS_RANGE,
+    }
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(ASSET_INDEX_PATH, "r", encoding="utf-8") as f:
+                _index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _index = {}
+    return _index
+
+
+def _save_index(index):
+    # merge with what other processes (pipeline workers) have written since we loaded
+    try:
+        with open(ASSET_INDEX_PATH, "r", encoding="utf-8") as f:
+            on_disk = json.load(f)
+        for key, info in on_disk.items():
+            index.setdefault(key, info)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    os.makedirs(os.path.dirname(ASSET_INDEX_PATH), exist_ok=True)
+    tmp_path = f"{ASSET_INDEX_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, ASSET_INDEX_PATH)
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def ingest_asset(path, audio=None, save=True):
+    """
+    Analyze one file and store it in the index. Pass the already decoded
+    AudioSegment as audio when the caller has one, to avoid decoding twice.
+    """
+    if audio is None:
+        audio = AudioSegment.from_file(path)
+    info = {**analyze_audio(audio), **_fingerprint(path)}
+
+    with _index_lock:
+        index = _load_index()
+        index[os.path.normpath(path)] = info
+        if save:
+            _save_index(index)
+
+    print(f"📇 Ingested {path}: {info['lufs']:.1f} LUFS, peak {info['peak_dbfs']:.1f} dBFS, "
+          f"{info['duration']:.2f}s{' (background)' if info['is_background'] else ''}")
+    return info
+
+
+def get_asset_info(path):
+    """Metadata for path, ingesting it first if it is new or has changed on disk."""
+    key = os.path.normpath(path)
+    with _index_lock:
+        info = _load_index().get(key)
+    if info and all(info.get(k) == v for k, v in _fingerprint(path).items()):
+        return info
+    return ingest_asset(path)
+
+
+def ingest_library(folders=ASSET_FOLDERS):
+    """Ingest every audio file under folders that is not indexed yet. Returns the number ingested."""
+    ingested = 0
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(AUDIO_EXTENSIONS):
+                continue
+            path = os.path.join(folder, name)
+            key = os.path.normpath(path)
+            info = _load_index().get(key)
+            if info and all(info.get(k) == v for k, v in _fingerprint(path).items()):
+                continue
+            try:
+                ingest_asset(path, save=False)
+                ingested += 1
+            except Exception as e:
+                print(f"❌ Could not ingest {path}: {str(e)}")
+
+    if ingested:
+        with _index_lock:
+            _save_index(_load_index())
+    print(f"Asset index: {ingested} files ingested, {len(_load_index())} indexed")
+    return ingested
+
+
+if __name__ == "__main__":
+    ingest_library()
@@ -1,12 +1,37 @@
 from audio_generation.dialogue import create_dialogue
 from audio_generation.sfx import create_sfx
 from audio_generation.music import create_music
+from audio_generation.parallel_render import create_stem_parallel, RENDER_WORKERS
+from audio_generation.draft import create_draft
 from fastapi import HTTPException
+from admission import run_admitted
+from database.repository import AUDIO_TYPES
 
-def create_audio(show_id, audio_type):
-    """Generates MP3 for dialogue, music, or SFX and stores as BLOB."""
+QUALITIES = ("master", "draft")
+
+def create_audio(show_id, audio_type, parallel=False, quality="master"):
+    """
+    Generates MP3 for dialogue, music, or SFX and stores as BLOB.
+    With parallel=True, dialogue and SFX are rendered in time slices across a process pool;
+    music is already streamed chunk by chunk and always takes its own path.
+    quality="draft" renders a quick low-rate Opus preview to data/drafts instead (see draft.py).
+    Renders are admitted against the memory budget first (see admission.py), which may queue
+    them or switch them to the parallel or draft path.
+    """
+    if audio_type not in AUDIO_TYPES:
+        raise HTTPException(status_code=400, detail=f"Audio type '{audio_type}' is not supported")
+    return run_admitted(_render, show_id, audio_type, parallel, quality)
+
+
+def _render(show_id, audio_type, parallel, quality, workers=RENDER_WORKERS):
     print(f"\n🎙️ Creating {audio_type} audio for show_id: {show_id}")
 
+    if quality == "draft":
+        return create_draft(show_id, audio_type)
+
+    if parallel and audio_type in ("dialogue", "sfx"):
+        return create_stem_parallel(show_id, audio_type, workers)
+
     if audio_type == "dialogue":
         return create_dialogue(show_id)
     elif audio_type == "sfx":
@@ -14,4 +39,4 @@ def create_audio(show_id, audio_type):
     elif audio_type == "music":
         return create_music(show_id)
 
-    raise HTTPException(status_code=400, detail=f"Audio type '{audio_type}' is not supported")
\ No newline at end of file
+    raise HTTPException(status_code=400, detail=f"Audio type '{audio_type}' is not supported")
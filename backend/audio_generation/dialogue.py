@@ -1,9 +1,9 @@
 import os
-import sqlite3
-import json
 from pydub import AudioSegment
-from database.constants import DB_FILE, TABLE_NAME
+from database.connection import get_connection
+from database import repository
 from io import BytesIO
+from audio_generation.peaks import compute_peaks
 
 DEBUG_AUDIO_FOLDER = "debug_audio"  # Define debug folder
 
@@ -14,15 +14,12 @@ def create_dialogue(show_id):
     os.makedirs(DEBUG_AUDIO_FOLDER, exist_ok=True)
 
     # Get show data from database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT event_timing FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-    result = cursor.fetchone()
-    
-    if not result:
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+
+    if not event_timing:
         raise ValueError(f"Show {show_id} not found")
-        
-    event_timing = json.loads(result[0])
+
     dialogue_timing = event_timing['dialogue_timing']
     total_duration = event_timing['total_dialogue_duration']
 
@@ -34,7 +31,7 @@ def create_dialogue(show_id):
     for segment in dialogue_timing:
         file_path = segment["file"]
         if os.path.exists(file_path):
-            audio_segment = AudioSegment.from_mp3(file_path)
+            audio_segment = AudioSegment.from_file(file_path)
             start_ms = int(segment["start_time"] * 1000)  # Convert to milliseconds
 
             print(f"Overlayin dialogue: {os.path.basename(file_path)} at {segment['start_time']:.2f}s")
@@ -46,6 +43,7 @@ def create_dialogue(show_id):
     mp3_buffer = BytesIO()
     dialogue_audio.export(mp3_buffer, format="mp3")
     mp3_binary = mp3_buffer.getvalue()
+    peaks = compute_peaks(dialogue_audio)
 
     # Save for debugging
     debug_mp3_path = os.path.join(DEBUG_AUDIO_FOLDER, f"{show_id}.mp3")
@@ -53,12 +51,11 @@ def create_dialogue(show_id):
     print(f"🔍 Debug MP3 saved: {debug_mp3_path}")
 
     try:
-        cursor.execute(f"UPDATE {TABLE_NAME} SET dialogue_audio = ? WHERE id = ?", (mp3_binary, show_id))
-        conn.commit()
+        with get_connection() as conn:
+            repository.save_audio(conn, show_id, "dialogue", mp3_binary)
+            repository.save_peaks(conn, show_id, "dialogue", peaks)
         print(f"✅ Database updated: show_id {show_id} → (BLOB data stored)")
     except Exception as e:
         print(f"❌ Database update failed: {str(e)}")
-    finally:
-        conn.close()
 
     return f"Dialogue stored as BLOB for show_id {show_id}, and saved to {debug_mp3_path}"
\ No newline at end of file
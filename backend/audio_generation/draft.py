@@ -0,0 +1,198 @@
+"""
+Draft-quality renders, for a quick listen while a script is still changing.
+
+A draft renders the same plans as the master path (see parallel_render) but
+- decodes every clip straight to 16 kHz mono with ffmpeg and mixes in numpy,
+- never calls a TTS or SFX API: dialogue uses whichever cached rendering of a line
+  exists, and effects missing from the library are left out,
+- cuts the one second background crossfades and music loop seams down to short de-click fades,
+- encodes low bitrate Opus.
+
+Gains still come from the asset index, so the draft keeps the master's balance
+without measuring anything. Drafts are files in data/drafts and never replace the
+master stems in the database.
+"""
+import os
+import time
+import numpy as np
+from database.connection import get_connection
+from database import repository
+from database.repository import AUDIO_TYPES
+from audio_generation.encoding import encode_pcm_stream, decode_pcm
+from audio_generation.parallel_render import build_sfx_plan, SILENCE_GAIN
+from audio_generation.music import MUSIC_TARGET_LUFS
+from audio_generation.music_library import select_track, scene_text
+from audio_generation.tts import TTS_BACKENDS, get_tts_filename
+
+DRAFTS_FOLDER = "data/drafts"
+DRAFT_SAMPLE_RATE = 16000
+DRAFT_CHANNELS = 1
+DRAFT_BITRATE = os.getenv("DRAFT_BITRATE", "24k")
+DRAFT_FADE_MS = 50  # replaces CROSSFADE_DURATION and music seam crossfades
+DRAFT_EXTENSION = "ogg"
+DRAFT_MEDIA_TYPE = "audio/ogg"
+
+
+def get_draft_path(show_id, audio_type):
+    """Path of a draft stem, or of the draft mixdown for audio_type="full_show"."""
+    return os.path.join(DRAFTS_FOLDER, f"{show_id}_{audio_type}.{DRAFT_EXTENSION}")
+
+
+def _frames(ms):
+    return int(round(ms * DRAFT_SAMPLE_RATE / 1000))
+
+
+def _decode(path, clips):
+    """float32 mono samples of path at the draft rate, decoded once per render."""
+    clip = clips.get(path)
+    if clip is None:
+        pcm = np.frombuffer(decode_pcm(path, DRAFT_SAMPLE_RATE, DRAFT_CHANNELS), dtype=np.int16)
+        clip = pcm.astype(np.float32) / 32768.0
+        clips[path] = clip
+    return clip
+
+
+def _cached_line(segment, voice):
+    """The line's timing file if it exists, otherwise any other backend's cached rendering of it."""
+    if os.path.exists(segment["file"]):
+        return segment["file"]
+    for backend in TTS_BACKENDS.values():
+        path = get_tts_filename(segment["line"], segment["character"], voice, segment["emotion"],
+                                directory=backend.directory, extension=backend.extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build_draft_dialogue_plan(event_timing, parsed_script):
+    characters = (parsed_script or {}).get("characters", {})
+    ops = []
+    for segment in event_timing["dialogue_timing"]:
+        voice = characters.get(segment["character"], {}).get("elevenlabs_voice", "")
+        path = _cached_line(segment, voice)
+        if not path:
+            print(f"❌ No cached rendering of: {segment['line'][:40]}")
+            continue
+        # a substitute rendering is cut to the slot the timing gave the line
+        ops.append({"op": "overlay", "path": path, "position_ms": int(segment["start_time"] * 1000),
+                    "gain_db": 0.0, "fade_in_ms": 0, "max_ms": int(segment["duration"] * 1000)})
+    return ops
+
+
+def build_draft_sfx_plan(event_timing):
+    ops = []
+    for op in build_sfx_plan(event_timing, generate_missing=False):
+        if op["op"] == "overlay":
+            ops.append({**op, "fade_in_ms": min(op["fade_in_ms"], DRAFT_FADE_MS)})
+        else:
+            ops.append({**op, "duration_ms": min(op["duration_ms"], DRAFT_FADE_MS)})
+    return ops
+
+
+def mix_plan(ops, total_ms):
+    """Render a plan into a float32 mono buffer at the draft rate, with the master path's op semantics."""
+    mix = np.zeros(_frames(total_ms), dtype=np.float32)
+    clips = {}
+    for op in ops:
+        if op["op"] == "overlay":
+            clip = _decode(op["path"], clips)
+            if op.get("max_ms"):
+                clip = clip[:_frames(op["max_ms"])]
+            clip = clip * np.float32(10 ** (op["gain_db"] / 20))
+            if op["fade_in_ms"]:
+                fade = min(_frames(op["fade_in_ms"]), len(clip))
+                clip[:fade] *= np.linspace(0.0, 1.0, fade, dtype=np.float32)
+            position = _frames(op["position_ms"])
+            end = min(position + len(clip), len(mix))
+            if position < end:
+                mix[position:end] += clip[:end - position]
+        elif op["op"] == "fade_out":
+            # like pydub's fade: a ramp down to -120 dB, and silence after it
+            start = min(_frames(op["start_ms"]), len(mix))
+            end = min(start + max(_frames(op["duration_ms"]), 1), len(mix))
+            mix[start:end] *= np.linspace(1.0, SILENCE_GAIN, end - start, dtype=np.float32)
+            mix[end:] *= SILENCE_GAIN
+    return mix
+
+
+def mix_music(parsed_script, total_ms):
+    """The music bed, looped between the track's loop points with hard seams."""
+    track = select_track(scene_text(parsed_script or {}), total_duration=total_ms / 1000)
+    print(f"Selected background music: {os.path.basename(track['path'])}")
+    audio = _decode(track["path"], {})
+    loop = audio[_frames(track["loop_start"]):_frames(track["loop_end"])]
+    if _frames(total_ms) <= len(audio):
+        pieces, length = [audio], len(audio)
+    else:
+        pieces, length = [audio[:_frames(track["loop_end"])]], _frames(track["loop_end"])
+    while length < _frames(total_ms) and len(loop):
+        pieces.append(loop)
+        length += len(loop)
+    bed = np.concatenate(pieces)[:_frames(total_ms)]
+    fade = min(_frames(DRAFT_FADE_MS), len(loop)) if len(pieces) > 1 else 0
+    if fade:
+        # de-click every seam
+        for seam in np.cumsum([len(piece) for piece in pieces[:-1]]):
+            if seam < len(bed):
+                bed[max(seam - fade, 0):seam] *= np.linspace(1.0, 0.0, min(fade, seam), dtype=np.float32)
+                bed[seam:seam + fade] *= np.linspace(0.0, 1.0, len(bed[seam:seam + fade]), dtype=np.float32)
+    return bed * np.float32(10 ** ((MUSIC_TARGET_LUFS - track["lufs"]) / 20))
+
+
+def encode_draft(mix):
+    pcm = (np.clip(mix, -1.0, 1.0) * 32767).astype(np.int16)
+    return encode_pcm_stream([pcm.tobytes()], DRAFT_SAMPLE_RATE, DRAFT_CHANNELS, 2,
+                             format="ogg", codec="libopus", bitrate=DRAFT_BITRATE)
+
+
+def _write_draft(path, data):
+    os.makedirs(DRAFTS_FOLDER, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def create_draft(show_id, audio_type):
+    """Render a draft of one stem to data/drafts. Returns its path."""
+    if audio_type not in AUDIO_TYPES:
+        raise ValueError(f"Audio type '{audio_type}' is not supported")
+    started = time.time()
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+        parsed_script = repository.get_parsed_script(conn, show_id)
+    if not event_timing:
+        raise ValueError(f"Show {show_id} not found")
+
+    total_ms = int(event_timing["total_dialogue_duration"] * 1000)
+    if audio_type == "dialogue":
+        mix = mix_plan(build_draft_dialogue_plan(event_timing, parsed_script), total_ms)
+    elif audio_type == "sfx":
+        mix = mix_plan(build_draft_sfx_plan(event_timing), total_ms)
+    else:
+        mix = mix_music(parsed_script, total_ms)
+
+    path = get_draft_path(show_id, audio_type)
+    _write_draft(path, encode_draft(mix))
+    print(f"📝 Draft {audio_type} for show {show_id} saved: {path} ({time.time() - started:.1f}s)")
+    return path
+
+
+def create_draft_mixdown(show_id):
+    """Sum the show's draft stems into data/drafts/{show_id}_full_show.ogg. Stems without a draft are skipped."""
+    stems = [
+        np.frombuffer(decode_pcm(get_draft_path(show_id, audio_type), DRAFT_SAMPLE_RATE, DRAFT_CHANNELS),
+                      dtype=np.int16).astype(np.float32) / 32768.0
+        for audio_type in AUDIO_TYPES if os.path.exists(get_draft_path(show_id, audio_type))
+    ]
+    if not stems:
+        raise ValueError(f"No draft stems found for show {show_id}")
+
+    mix = np.zeros(max(len(stem) for stem in stems), dtype=np.float32)
+    for stem in stems:
+        mix[:len(stem)] += stem
+
+    path = get_draft_path(show_id, "full_show")
+    _write_draft(path, encode_draft(mix))
+    print(f"✅ Draft mixdown saved: {path}")
+    return path
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import tempfile
+import threading
+from pydub.utils import get_encoder_name
+
+PCM_FORMATS = {1: "u8", 2: "s16le", 4: "s32le"}
+
+
+def encode_pcm_stream(chunks, frame_rate, channels, sample_width, format="mp3", codec=None, bitrate=None):
+    """
+    Encode an iterable of raw PCM byte chunks (or AudioSegments) with ffmpeg and return
+    the encoded bytes. Audio is piped through ffmpeg as it is produced, so the caller
+    never has to hold the whole timeline as a single AudioSegment.
+    The output goes to a temporary file rather than a pipe: ffmpeg can only write the
+    MP3 gapless (LAME/Xing) header to a seekable output, and without it decoders keep
+    the encoder delay and padding, making the stem about one frame longer than pydub's.
+    """
+    command = [
+        get_encoder_name(), "-hide_banner", "-loglevel", "error",
+        "-f", PCM_FORMATS[sample_width], "-ar", str(frame_rate), "-ac", str(channels), "-i", "pipe:0",
+    ]
+    if codec:
+        command += ["-c:a", codec]
+    if bitrate:
+        command += ["-b:a", bitrate]
+    fd, output_path = tempfile.mkstemp(suffix=f".{format}")
+    os.close(fd)
+    command += ["-f", format, "-y", output_path]
+
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        stderr = []
+
+        # drain stderr on a thread so ffmpeg never blocks on a full pipe while we write
+        reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()))
+        reader.start()
+
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk.raw_data)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+            reader.join()
+            process.wait()
+
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg encoding failed: {b''.join(stderr).decode(errors='replace')}")
+
+        with open(output_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(output_path)
+
+
+def decode_pcm(path, frame_rate, channels):
+    """
+    Decode a file straight to 16-bit PCM at frame_rate / channels with ffmpeg, resampling
+    in the same pass - much cheaper than decoding at the source rate and converting in pydub.
+    """
+    command = [
+        get_encoder_name(), "-hide_banner", "-loglevel", "error", "-i", path,
+        "-f", PCM_FORMATS[2], "-ar", str(frame_rate), "-ac", str(channels), "pipe:1",
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg decoding of {path} failed: {result.stderr.decode(errors='replace')}")
+    return result.stdout
@@ -0,0 +1,56 @@
+import os
+from io import BytesIO
+from pydub import AudioSegment
+from database.connection import get_connection
+from database import repository
+from database.repository import AUDIO_TYPES
+from audio_generation.draft import create_draft_mixdown
+from admission import run_admitted_mixdown
+
+SHOWS_FOLDER = "data/shows"
+
+
+def get_mixdown_path(show_id):
+    return os.path.join(SHOWS_FOLDER, f"{show_id}_full_show.mp3")
+
+
+def create_mixdown(show_id, quality="master"):
+    """
+    Stitch the dialogue, sfx and music stems of a show into a single MP3.
+    Stems that have not been rendered yet are skipped. quality="draft" mixes the draft stems instead.
+    Admitted against the render memory budget first (see admission.py), like the stem renders.
+    """
+    return run_admitted_mixdown(_mix, show_id, quality)
+
+
+def _mix(show_id, quality):
+    if quality == "draft":
+        return create_draft_mixdown(show_id)
+
+    print("\nCreating mixdown for show:", show_id)
+
+    with get_connection() as conn:
+        stems = {audio_type: repository.get_audio(conn, show_id, audio_type) for audio_type in AUDIO_TYPES}
+
+    stems = {audio_type: audio for audio_type, audio in stems.items() if audio}
+    if not stems:
+        raise ValueError(f"No rendered stems found for show {show_id}")
+
+    mix = None
+    for audio_type, audio in stems.items():
+        segment = AudioSegment.from_file(BytesIO(audio), format="mp3")
+        if mix is None:
+            mix = segment
+        else:
+            # overlay() keeps the length of the base segment, so lay the shorter stem over the longer one
+            if len(segment) > len(mix):
+                mix, segment = segment, mix
+            mix = mix.overlay(segment)
+        print(f"Mixed in {audio_type} stem ({len(segment) / 1000:.2f}s)")
+
+    os.makedirs(SHOWS_FOLDER, exist_ok=True)
+    output_path = get_mixdown_path(show_id)
+    mix.export(output_path, format="mp3")
+    print(f"✅ Mixdown saved: {output_path}")
+
+    return output_path
@@ -1,12 +1,12 @@
 import os
-import random
-import sqlite3
-import json
-from pydub import AudioSegment
-from database.constants import DB_FILE, TABLE_NAME
-from io import BytesIO
+from database.connection import get_connection
+from database import repository
+from audio_generation.encoding import encode_pcm_stream
+from audio_generation.peaks import PeakAccumulator, encode_peaks
+from audio_generation.music_library import select_track, scene_text, iter_music_bed
 
 DEBUG_AUDIO_FOLDER = "debug_audio"
+MUSIC_TARGET_LUFS = -35  # music sits well under the dialogue
 
 def create_music(show_id):
     print("\nCreating background music for show:", show_id)
@@ -14,55 +14,57 @@ def create_music(show_id):
     os.makedirs(DEBUG_AUDIO_FOLDER, exist_ok=True)
 
     # Get show data from database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT event_timing FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-    result = cursor.fetchone()
-    
-    if not result:
-        raise ValueError(f"Show {show_id} not found")
-        
-    event_timing = json.loads(result[0])
-    total_duration = event_timing['total_dialogue_duration']
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+        parsed_script = repository.get_parsed_script(conn, show_id) or {}
 
-    # Select and process music file
-    music_dir = "data/music"
-    music_files = [f for f in os.listdir(music_dir) if f.endswith((".mp3", ".wav"))]
-
-    if not music_files:
-        raise ValueError("No music files found in music directory")
+    if not event_timing:
+        raise ValueError(f"Show {show_id} not found")
 
-    music_file = random.choice(music_files)
-    music_path = os.path.join(music_dir, music_file)
-    print(f"Selected background music: {music_file}")
+    total_duration = event_timing['total_dialogue_duration']
+    total_ms = int(total_duration * 1000)
+    if total_ms <= 0:
+        raise ValueError(f"Show {show_id} has no dialogue to score")
 
-    # Load and prepare the music
-    music = AudioSegment.from_file(music_path)
+    # Select a track that fits the scene from the indexed library
+    track = select_track(scene_text(parsed_script), total_duration=total_duration)
+    print(f"Selected background music: {os.path.basename(track['path'])} (tags: {', '.join(track['tags']) or 'none'})")
 
-    # Loop music to cover the full duration if needed
-    if len(music) < total_duration * 1000:
-        loops_needed = int((total_duration * 1000) / len(music)) + 1
-        music = music * loops_needed
-    music = music[:(total_duration * 1000)]
+    # Lower the volume of the music to the target loudness
+    gain = MUSIC_TARGET_LUFS - track["lufs"]
 
-    # Lower the volume of the music
-    music = music - 15
-    mp3_buffer = BytesIO()
-    music.export(mp3_buffer, format="mp3")
-    mp3_binary = mp3_buffer.getvalue()
+    # Build the bed lazily, looping with crossfaded seams, and stream it into the encoder
+    chunks = iter_music_bed(track, total_ms, gain_db=gain)
+    first_chunk = next(chunks)
+    peak_accumulator = PeakAccumulator(first_chunk.frame_rate)
+    mp3_binary = encode_pcm_stream(
+        _with_peaks(_prepend(first_chunk, chunks), peak_accumulator),
+        first_chunk.frame_rate, first_chunk.channels, first_chunk.sample_width,
+        format="mp3"
+    )
+    peaks = encode_peaks(peak_accumulator)
 
     # Save debug file
     debug_mp3_path = os.path.join(DEBUG_AUDIO_FOLDER, f"{show_id}_music.mp3")
-    music.export(debug_mp3_path, format="mp3")
+    with open(debug_mp3_path, "wb") as f:
+        f.write(mp3_binary)
     print(f"🔍 Debug MP3 saved: {debug_mp3_path}")
 
     try:
-        cursor.execute(f"UPDATE {TABLE_NAME} SET music_audio = ? WHERE id = ?", (mp3_binary, show_id))
-        conn.commit()
+        with get_connection() as conn:
+            repository.save_audio(conn, show_id, "music", mp3_binary)
+            repository.save_peaks(conn, show_id, "music", peaks)
         print(f"✅ Database updated: show_id {show_id} → (BLOB data stored)")
     except Exception as e:
         print(f"❌ Database update failed: {str(e)}")
-    finally:
-        conn.close()
 
     return f"Music stored as BLOB for show_id {show_id}, and saved to {debug_mp3_path}"
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+def _with_peaks(chunks, peak_accumulator):
+    for chunk in chunks:
+        peak_accumulator.add(chunk)
+        yield chunk
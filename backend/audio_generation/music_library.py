@@ -0,0 +1,248 @@
+"""
+Music library: indexes data/music once (duration, mood tags, loop points),
+picks tracks that fit a scene and builds a music bed of any length lazily.
+
+The bed is yielded chunk by chunk, looping between the track's loop points with a
+crossfade at every seam, so a long show never holds N copies of the track in memory.
+Decoded tracks are kept in a small LRU (MUSIC_CACHE_MAX_MB) keyed on the file's size and
+mtime, so re-renders share a decode and a replaced track is decoded again.
+"""
+import json
+import os
+import random
+import re
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+from pydub import AudioSegment
+from audio_generation.assets import get_asset_info, segment_to_array
+
+MUSIC_DIR = "data/music"
+MUSIC_INDEX_PATH = "data/music_index.json"
+MUSIC_TAGS_PATH = os.path.join(MUSIC_DIR, "tags.json")  # optional {"file.mp3": ["tag", ...]}
+MUSIC_EXTENSIONS = (".mp3", ".wav")
+
+MUSIC_CACHE_MAX_BYTES = int(os.getenv("MUSIC_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+SEAM_CROSSFADE_MS = 2000
+CHUNK_MS = 10000  # length of the chunks the bed is streamed in
+
+# words in a scene that point at a mood tag
+MOOD_KEYWORDS = {
+    "mysterious": ["mysterious", "mystery", "strange", "secret", "magic", "magical", "door", "tree", "hidden", "unknown"],
+    "tense": ["tense", "danger", "afraid", "fear", "frightened", "alarmed", "urgent", "hum", "humming", "run", "dark"],
+    "ambient": ["ambient", "ambience", "forest", "wind", "night", "quiet", "calm", "atmosphere", "wave"],
+    "cinematic": ["cinematic", "movie", "score", "epic", "adventure", "light", "beam", "discover", "amazed"],
+    "piano": ["piano", "gentle", "soft", "sad", "melancholy", "tender"],
+}
+
+_library = None
+_library_mtime = None
+_library_lock = threading.Lock()
+_decoded = OrderedDict()  # (path, size, mtime_ns) -> decoded AudioSegment, least recently used first
+_decoded_size = 0
+_decoded_lock = threading.Lock()
+
+
+def _tags_from_name(file_name):
+    words = set(re.split(r"[^a-z]+", file_name.lower()))
+    return sorted(tag for tag, keywords in MOOD_KEYWORDS.items() if tag in words or words & set(keywords))
+
+
+def find_loop_points(audio):
+    """
+    Loop region of a track in ms: skips a quiet intro and a fade-out tail, so
+    repeats loop the body of the track instead of passing through silence.
+    """
+    frame_ms = 100
+    samples = segment_to_array(audio.set_channels(1))[:, 0]
+    frame = int(audio.frame_rate * frame_ms / 1000)
+    frames = len(samples) // frame
+    if frames < 10:
+        return 0, len(audio)
+
+    rms = np.sqrt(np.square(samples[:frames * frame]).reshape(frames, frame).mean(axis=1))
+    loud = np.nonzero(rms > np.median(rms) * 0.1)[0]  # within 20 dB of the median level
+    if not len(loud):
+        return 0, len(audio)
+
+    loop_start, loop_end = int(loud[0]) * frame_ms, (int(loud[-1]) + 1) * frame_ms
+    if loop_end - loop_start < 3 * SEAM_CROSSFADE_MS:
+        return 0, len(audio)
+    return loop_start, loop_end
+
+
+def _load_tag_overrides():
+    try:
+        with open(MUSIC_TAGS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _index_track(path, tag_overrides):
+    # decoded only for the analysis, not cached: indexing a library must not keep it all in memory
+    audio = AudioSegment.from_file(path)
+    asset_info = get_asset_info(path)
+    loop_start, loop_end = find_loop_points(audio)
+    file_name = os.path.basename(path)
+    return {
+        "path": path,
+        "duration": asset_info["duration"],
+        "lufs": asset_info["lufs"],
+        "tags": tag_overrides.get(file_name) or _tags_from_name(file_name),
+        "loop_start": loop_start,
+        "loop_end": loop_end,
+        "size": asset_info["size"],
+        "mtime": asset_info["mtime"],
+    }
+
+
+def get_music_library():
+    """
+    Return the indexed music library. The directory is only listed again when
+    it changes, and only new or changed tracks are analysed.
+    """
+    global _library, _library_mtime
+    with _library_lock:
+        mtime = os.stat(MUSIC_DIR).st_mtime
+        if _library is not None and mtime == _library_mtime:
+            return _library
+
+        try:
+            with open(MUSIC_INDEX_PATH, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            cached = {}
+
+        tag_overrides = _load_tag_overrides()
+        library = {}
+        for file_name in sorted(os.listdir(MUSIC_DIR)):
+            if not file_name.endswith(MUSIC_EXTENSIONS):
+                continue
+            path = os.path.join(MUSIC_DIR, file_name)
+            stat = os.stat(path)
+            track = cached.get(file_name)
+            if not track or track["size"] != stat.st_size or track["mtime"] != int(stat.st_mtime):
+                print(f"Indexing music track: {file_name}")
+                track = _index_track(path, tag_overrides)
+            library[file_name] = track
+
+        # written aside and renamed, so a render in another process never reads half an index
+        tmp_path = f"{MUSIC_INDEX_PATH}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(library, f, indent=1)
+            os.replace(tmp_path, MUSIC_INDEX_PATH)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        _library, _library_mtime = library, mtime
+        return library
+
+
+def load_track(path):
+    """Decoded track, from the LRU while the file is unchanged. Tracks bigger than the cache are not kept."""
+    global _decoded_size
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _decoded_lock:
+        audio = _decoded.get(key)
+        if audio is not None:
+            _decoded.move_to_end(key)
+            return audio
+
+    audio = AudioSegment.from_file(path)
+    size = len(audio.raw_data)
+    with _decoded_lock:
+        for stale in [cached for cached in _decoded if cached[0] == path and cached != key]:
+            _decoded_size -= len(_decoded.pop(stale).raw_data)
+        if key not in _decoded and size <= MUSIC_CACHE_MAX_BYTES:
+            _decoded[key] = audio
+            _decoded_size += size
+            while _decoded_size > MUSIC_CACHE_MAX_BYTES:
+                _, evicted = _decoded.popitem(last=False)
+                _decoded_size -= len(evicted.raw_data)
+    return audio
+
+
+def scene_text(parsed_script):
+    """The words that describe a show's mood: scene descriptions, effects and emotions."""
+    parts = [scene.get("description", "") for scene in parsed_script.get("scene_descriptions", [])]
+    for event in parsed_script.get("events", []):
+        parts.append(event.get("description", "") or event.get("effect", ""))
+        parts.append(event.get("emotion", ""))
+    return " ".join(parts)
+
+
+def best_tracks(text, total_duration=None):
+    """The tracks whose mood tags best match text (all of them on a tie)."""
+    library = get_music_library()
+    if not library:
+        raise ValueError("No music files found in music directory")
+
+    words = set(re.split(r"[^a-z]+", text.lower()))
+    scores = {}
+    for file_name, track in library.items():
+        score = sum(len(words & set(MOOD_KEYWORDS[tag] + [tag])) for tag in track["tags"] if tag in MOOD_KEYWORDS)
+        if total_duration and track["duration"] >= total_duration:
+            score += 1  # no seams at all
+        scores[file_name] = score
+
+    best = max(scores.values())
+    return [library[name] for name, score in scores.items() if score == best]
+
+
+def select_track(text, total_duration=None):
+    """
+    Pick the track whose mood tags best match text. Ties are broken at random so
+    re-rendering the music still offers a different bed.
+    """
+    return random.choice(best_tracks(text, total_duration))
+
+
+def iter_music_bed(track, total_ms, gain_db=0.0, chunk_ms=CHUNK_MS):
+    """
+    Yield the music bed for total_ms as consecutive AudioSegment chunks. The track plays
+    from the start, then loops between its loop points with a SEAM_CROSSFADE_MS crossfade
+    at every seam. Only the decoded track and one chunk are held in memory.
+    """
+    audio = load_track(track["path"])
+    if not len(audio):
+        raise ValueError(f"Music track is empty: {track['path']}")
+    loop_start, loop_end = track["loop_start"], track["loop_end"]
+    crossfade = min(SEAM_CROSSFADE_MS, (loop_end - loop_start) // 3)
+
+    def pieces():
+        if total_ms <= len(audio):
+            yield audio
+            return
+        if crossfade <= 0:
+            yield audio
+            while True:
+                yield audio[loop_start:loop_end]
+        # first pass plays the intro, later passes loop the body
+        yield audio[:loop_end - crossfade]
+        while True:
+            tail = audio[loop_end - crossfade:loop_end]
+            head = audio[loop_start:loop_start + crossfade]
+            yield tail.append(head, crossfade=crossfade)
+            yield audio[loop_start + crossfade:loop_end - crossfade]
+
+    produced = 0
+    pending = AudioSegment.empty()
+    for piece in pieces():
+        pending += piece
+        while len(pending) >= chunk_ms and produced < total_ms:
+            chunk = pending[:min(chunk_ms, total_ms - produced)]
+            pending = pending[len(chunk):]
+            produced += len(chunk)
+            yield chunk + gain_db if gain_db else chunk
+        if produced >= total_ms:
+            return
+
+    if produced < total_ms and len(pending):
+        chunk = pending[:total_ms - produced]
+        yield chunk + gain_db if gain_db else chunk
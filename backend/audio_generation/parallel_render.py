@@ -0,0 +1,252 @@
+"""
+Time-sliced parallel rendering of the dialogue and sfx stems.
+
+The stem is first turned into a render plan: an ordered list of operations
+(overlay a clip at a position with a gain and fade-in, or fade the mix out from a
+position) built from event_timing and the asset index, without decoding anything.
+The timeline is then cut into windows that render in a process pool, each writing
+its samples straight into a shared memory-mapped PCM buffer. Every operation is a
+function of absolute time, so a window evaluates the clips and fades that cross its
+boundaries exactly as a single pass would. The windows therefore meet sample-exactly
+and need no overlap. The buffer is encoded to MP3 once at the end.
+"""
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pydub import AudioSegment
+from database.connection import get_connection
+from database import repository
+from audio_generation.assets import get_asset_info, segment_to_array
+from audio_generation.encoding import encode_pcm_stream
+from audio_generation.peaks import PeakAccumulator, encode_peaks
+from audio_generation.sfx import (
+    get_sfx_path, validate_sound_effects, generate_ai_sfx, normalization_gain,
+    build_placement_timeline, background_fadeouts, SFXModel, TARGET_LUFS, CROSSFADE_DURATION
+)
+from timeline import Timeline, SFX
+
+DEBUG_AUDIO_FOLDER = "debug_audio"
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+WINDOWS_PER_WORKER = 2  # a few more windows than workers evens out busy and quiet stretches
+MIN_WINDOW_SECONDS = 10
+SAMPLE_WIDTH = 2
+SILENCE_GAIN = 10 ** (-120.0 / 20)  # pydub fades to -120 dB
+ENCODE_CHUNK_SECONDS = 30
+# shared memory when the OS has it, so the PCM buffer never touches disk
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_clip_cache = {}  # per worker process: (path, sample_rate, channels, gain, fade_in) -> float32 samples
+
+
+def build_dialogue_plan(event_timing):
+    ops = []
+    for segment in event_timing["dialogue_timing"]:
+        if os.path.exists(segment["file"]):
+            ops.append({"op": "overlay", "path": segment["file"], "position_ms": int(segment["start_time"] * 1000),
+                        "gain_db": 0.0, "fade_in_ms": 0})
+        else:
+            print(f"❌ Dialogue file not found: {segment['file']}")
+    return ops
+
+
+def build_sfx_plan(event_timing, sfx_model=SFXModel.ELEVENLABS_API, generate_missing=True):
+    """
+    The operations create_sfx performs, in the same order, as plain data.
+    With generate_missing=False, effects missing from the library are left out instead of generated.
+    """
+    events = event_timing.get("sound_effect_timing", [])
+    missing_effects = validate_sound_effects(events)
+    if missing_effects and generate_missing:
+        generate_ai_sfx(missing_effects, sfx_model=sfx_model)
+
+    ops = []
+    placements = build_placement_timeline(events)
+    faded = set()
+    for event_id, event in enumerate(events):
+        sfx_path = get_sfx_path(event["effect"], event.get("description"))
+        if not sfx_path:
+            print(f"Sound effect file not found: {event['effect']}")
+            continue
+
+        asset_info = get_asset_info(sfx_path)
+        start_ms = int(event["start_time"] * 1000)
+        overlay = {"op": "overlay", "path": sfx_path, "position_ms": start_ms,
+                   "gain_db": normalization_gain(TARGET_LUFS, asset_info), "fade_in_ms": 0}
+
+        if asset_info["is_background"]:
+            # same rules as sfx.apply_crossfading
+            for effect, fadeout_start, needs_fade in background_fadeouts(placements, event_id, start_ms, faded):
+                if needs_fade:
+                    ops.append({"op": "fade_out", "start_ms": fadeout_start, "duration_ms": CROSSFADE_DURATION})
+            overlay["fade_in_ms"] = CROSSFADE_DURATION
+
+        ops.append(overlay)
+    return ops
+
+
+def _output_format(ops):
+    """pydub's overlay upgrades the mix to the highest rate and channel count it meets; do the same."""
+    sample_rate, channels = 11025, 1  # AudioSegment.silent() defaults
+    for op in ops:
+        if op["op"] == "overlay":
+            asset_info = get_asset_info(op["path"])
+            sample_rate = max(sample_rate, asset_info["sample_rate"])
+            channels = max(channels, asset_info["channels"])
+    return sample_rate, channels
+
+
+def _load_clip(op, sample_rate, channels):
+    key = (op["path"], sample_rate, channels, op["gain_db"], op["fade_in_ms"])
+    clip = _clip_cache.get(key)
+    if clip is None:
+        audio = AudioSegment.from_file(op["path"])
+        audio = audio.set_frame_rate(sample_rate).set_channels(channels).set_sample_width(SAMPLE_WIDTH)
+        if op["gain_db"]:
+            audio = audio.apply_gain(op["gain_db"])
+        if op["fade_in_ms"]:
+            audio = audio.fade_in(op["fade_in_ms"])
+        clip = segment_to_array(audio)
+        _clip_cache[key] = clip
+    return clip
+
+
+def build_op_timeline(ops, sample_rate):
+    """
+    Frame extents of the operations (id = index in ops), so a window only visits the
+    operations that touch it. A fade reaches to the end of the stem: pydub leaves
+    everything after the fade silenced.
+    """
+    extents = []
+    for op in ops:
+        if op["op"] == "overlay":
+            position = int(round(op["position_ms"] * sample_rate / 1000))
+            # from metadata, rounded up, so nothing is decoded to find out where a clip ends
+            length = int(math.ceil((get_asset_info(op["path"])["duration_ms"] + 1) * sample_rate / 1000))
+            extents.append({"kind": SFX, "start": position, "end": position + length})
+        else:
+            extents.append({"kind": SFX, "start": int(round(op["start_ms"] * sample_rate / 1000)), "end": math.inf})
+    return Timeline.build(extents)
+
+
+def _render_window(buffer_path, total_frames, sample_rate, channels, ops, op_timeline, window_start, window_end):
+    """Render frames [window_start, window_end) into the shared buffer. Runs in a worker process."""
+    window = np.zeros((window_end - window_start, channels), dtype=np.float32)
+    touching = Timeline.from_bytes(op_timeline).ids_in_window(window_start, window_end)
+
+    # operations run in plan order: a fade only affects what was overlaid before it
+    for op_id, op in enumerate(ops):
+        if op_id not in touching:
+            continue
+
+        if op["op"] == "overlay":
+            position = int(round(op["position_ms"] * sample_rate / 1000))
+            clip = _load_clip(op, sample_rate, channels)
+            start, end = max(position, window_start), min(position + len(clip), window_end, total_frames)
+            if start < end:
+                window[start - window_start:end - window_start] += clip[start - position:end - position]
+
+        elif op["op"] == "fade_out":
+            # linear gain ramp to -120 dB, and the mix stays silent after the fade (as pydub's fade does)
+            fade_start = int(round(op["start_ms"] * sample_rate / 1000))
+            fade_end = fade_start + int(round(op["duration_ms"] * sample_rate / 1000))
+            if fade_end <= window_start:
+                window *= SILENCE_GAIN
+                continue
+            frames = np.arange(window_start, window_end)
+            progress = np.clip((frames - fade_start) / max(fade_end - fade_start, 1), 0.0, 1.0)
+            window *= (1.0 + (SILENCE_GAIN - 1.0) * progress)[:, None]
+
+    scale = float(1 << (8 * SAMPLE_WIDTH - 1))
+    buffer = np.memmap(buffer_path, dtype=np.int16, mode="r+", shape=(total_frames, channels))
+    buffer[window_start:window_end] = np.clip(np.round(window * scale), -scale, scale - 1).astype(np.int16)
+    buffer.flush()
+    del buffer
+    return window_end - window_start
+
+
+def _windows(total_frames, sample_rate, workers):
+    count = max(1, min(workers * WINDOWS_PER_WORKER, total_frames // (MIN_WINDOW_SECONDS * sample_rate) or 1))
+    bounds = np.linspace(0, total_frames, count + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def render_plan(ops, total_ms, workers=RENDER_WORKERS):
+    """
+    Render a plan across a process pool. Returns (mp3_binary, peaks, sample_rate, channels).
+    """
+    sample_rate, channels = _output_format(ops)
+    total_frames = int(round(total_ms * sample_rate / 1000))
+    windows = _windows(total_frames, sample_rate, workers)
+    op_timeline = build_op_timeline(ops, sample_rate).to_bytes()
+
+    fd, buffer_path = tempfile.mkstemp(suffix=".pcm", dir=SHARED_MEMORY_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.truncate(total_frames * channels * SAMPLE_WIDTH)
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(windows)), mp_context=context) as executor:
+            futures = [
+                executor.submit(_render_window, buffer_path, total_frames, sample_rate, channels, ops, op_timeline,
+                                start, end)
+                for start, end in windows
+            ]
+            for future in futures:
+                future.result()
+
+        buffer = np.memmap(buffer_path, dtype=np.int16, mode="r", shape=(total_frames, channels))
+        peak_accumulator = PeakAccumulator(sample_rate)
+        chunk_frames = ENCODE_CHUNK_SECONDS * sample_rate
+
+        def chunks():
+            for start in range(0, total_frames, chunk_frames):
+                data = buffer[start:start + chunk_frames].tobytes()
+                peak_accumulator.add(AudioSegment(data=data, sample_width=SAMPLE_WIDTH,
+                                                  frame_rate=sample_rate, channels=channels))
+                yield data
+
+        mp3_binary = encode_pcm_stream(chunks(), sample_rate, channels, SAMPLE_WIDTH, format="mp3")
+        del buffer
+        return mp3_binary, encode_peaks(peak_accumulator), sample_rate, channels
+    finally:
+        os.remove(buffer_path)
+
+
+def create_stem_parallel(show_id, audio_type, workers=RENDER_WORKERS):
+    """Parallel equivalent of create_dialogue / create_sfx."""
+    if audio_type not in ("dialogue", "sfx"):
+        raise ValueError(f"Parallel rendering is not supported for '{audio_type}'")
+
+    print(f"\nCreating {audio_type} for show {show_id} on {workers} workers")
+    os.makedirs(DEBUG_AUDIO_FOLDER, exist_ok=True)
+
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+
+    if not event_timing:
+        raise ValueError(f"Show {show_id} not found")
+
+    started = time.time()
+    ops = build_dialogue_plan(event_timing) if audio_type == "dialogue" else build_sfx_plan(event_timing)
+    mp3_binary, peaks, sample_rate, channels = render_plan(ops, event_timing["total_dialogue_duration"] * 1000, workers)
+    print(f"Rendered {len(ops)} operations at {sample_rate}Hz/{channels}ch in {time.time() - started:.1f}s")
+
+    suffix = "" if audio_type == "dialogue" else f"_{audio_type}"
+    debug_mp3_path = os.path.join(DEBUG_AUDIO_FOLDER, f"{show_id}{suffix}.mp3")
+    with open(debug_mp3_path, "wb") as f:
+        f.write(mp3_binary)
+    print(f"🔍 Debug MP3 saved: {debug_mp3_path}")
+
+    try:
+        with get_connection() as conn:
+            repository.save_audio(conn, show_id, audio_type, mp3_binary)
+            repository.save_peaks(conn, show_id, audio_type, peaks)
+        print(f"✅ Database updated: show_id {show_id} → (BLOB data stored)")
+    except Exception as e:
+        print(f"❌ Database update failed: {str(e)}")
+
+    return f"{audio_type.capitalize()} stored as BLOB for show_id {show_id}, and saved to {debug_mp3_path}"
@@ -0,0 +1,125 @@
+"""
+Multi-resolution min/max waveform peaks, computed while a stem is rendered so the
+stem player can draw a waveform without downloading and decoding the audio first.
+
+Binary layout (little endian):
+    b"ADPK", version u8, level count u8, sample rate u32, total samples u64
+    then per level: samples per peak u32, peak count u32, count * (min i8, max i8)
+"""
+import struct
+import numpy as np
+from audio_generation.assets import segment_to_array
+
+PEAKS_MAGIC = b"ADPK"
+PEAKS_VERSION = 1
+BASE_SAMPLES_PER_PEAK = 256
+LEVEL_FACTOR = 4
+LEVEL_COUNT = 5  # 256, 1024, 4096, 16384, 65536 samples per peak
+DEFAULT_MAX_PEAKS = 10000  # enough for any waveform width on screen
+
+
+class PeakAccumulator:
+    """
+    Collects min/max peaks from audio fed in any number of chunks (e.g. a streamed
+    music bed), carrying partial buckets across chunk boundaries.
+    """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.total_samples = 0
+        self._leftover = np.zeros(0, dtype=np.float32)
+        self._mins = []
+        self._maxs = []
+
+    def add(self, audio):
+        # one value per frame: the channel extremes, so stereo stems keep their full envelope
+        samples = segment_to_array(audio)
+        low, high = samples.min(axis=1), samples.max(axis=1)
+        self.total_samples += len(samples)
+
+        # min and max are interleaved so one leftover buffer serves both
+        frames = np.concatenate([self._leftover, np.column_stack([low, high]).ravel()])
+        whole = len(frames) // (2 * BASE_SAMPLES_PER_PEAK) * (2 * BASE_SAMPLES_PER_PEAK)
+        buckets = frames[:whole].reshape(-1, BASE_SAMPLES_PER_PEAK, 2)
+        self._mins.append(buckets[:, :, 0].min(axis=1))
+        self._maxs.append(buckets[:, :, 1].max(axis=1))
+        self._leftover = frames[whole:]
+
+    def finish(self):
+        """Return [(samples_per_peak, mins, maxs), ...] from the finest to the coarsest level."""
+        mins = list(self._mins)
+        maxs = list(self._maxs)
+        if len(self._leftover):
+            partial = self._leftover.reshape(-1, 2)
+            mins.append(partial[:, 0].min(keepdims=True))
+            maxs.append(partial[:, 1].max(keepdims=True))
+        mins = np.concatenate(mins) if mins else np.zeros(0, dtype=np.float32)
+        maxs = np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.float32)
+
+        levels = [(BASE_SAMPLES_PER_PEAK, mins, maxs)]
+        for _ in range(LEVEL_COUNT - 1):
+            pad = -len(mins) % LEVEL_FACTOR
+            mins = np.pad(mins, (0, pad), mode="edge").reshape(-1, LEVEL_FACTOR).min(axis=1) if len(mins) else mins
+            maxs = np.pad(maxs, (0, pad), mode="edge").reshape(-1, LEVEL_FACTOR).max(axis=1) if len(maxs) else maxs
+            levels.append((levels[-1][0] * LEVEL_FACTOR, mins, maxs))
+        return levels
+
+
+def compute_peaks(audio):
+    """Peaks of a fully rendered AudioSegment, encoded in the binary format."""
+    accumulator = PeakAccumulator(audio.frame_rate)
+    accumulator.add(audio)
+    return encode_peaks(accumulator)
+
+
+def encode_peaks(accumulator):
+    levels = accumulator.finish()
+    parts = [PEAKS_MAGIC, struct.pack("<BBIQ", PEAKS_VERSION, len(levels),
+                                      accumulator.sample_rate, accumulator.total_samples)]
+    for samples_per_peak, mins, maxs in levels:
+        interleaved = np.column_stack([mins, maxs]).ravel() if len(mins) else np.zeros(0)
+        quantized = np.clip(np.round(interleaved * 127), -128, 127).astype("<i1")
+        parts.append(struct.pack("<II", samples_per_peak, len(mins)))
+        parts.append(quantized.tobytes())
+    return b"".join(parts)
+
+
+def decode_peaks(data):
+    """Parse the binary format back into {"sample_rate", "total_samples", "levels": [...]}."""
+    if data[:4] != PEAKS_MAGIC:
+        raise ValueError("Not a peaks blob")
+    version, level_count, sample_rate, total_samples = struct.unpack_from("<BBIQ", data, 4)
+    if version != PEAKS_VERSION:
+        raise ValueError(f"Unsupported peaks version {version}")
+
+    offset = 4 + struct.calcsize("<BBIQ")
+    levels = []
+    for _ in range(level_count):
+        samples_per_peak, count = struct.unpack_from("<II", data, offset)
+        offset += 8
+        values = np.frombuffer(data, dtype="<i1", count=2 * count, offset=offset)
+        offset += 2 * count
+        levels.append({"samples_per_peak": samples_per_peak, "count": count, "data": values})
+    return {"sample_rate": sample_rate, "total_samples": total_samples, "levels": levels}
+
+
+def select_level(peaks, max_peaks=DEFAULT_MAX_PEAKS):
+    """The finest level with at most max_peaks peaks (the coarsest one if none fits)."""
+    for level in peaks["levels"]:
+        if level["count"] <= max_peaks:
+            return level
+    return peaks["levels"][-1]
+
+
+def slice_level_blob(data, samples_per_peak):
+    """Binary blob holding a single level, for clients that only want one resolution."""
+    peaks = decode_peaks(data)
+    level = next((l for l in peaks["levels"] if l["samples_per_peak"] == samples_per_peak), None)
+    if level is None:
+        raise ValueError(f"No peaks level with {samples_per_peak} samples per peak")
+    return b"".join([
+        PEAKS_MAGIC,
+        struct.pack("<BBIQ", PEAKS_VERSION, 1, peaks["sample_rate"], peaks["total_samples"]),
+        struct.pack("<II", level["samples_per_peak"], level["count"]),
+        level["data"].tobytes(),
+    ])
@@ -1,26 +1,50 @@
 import os
-import sqlite3
-import json
 import re
 from pydub import AudioSegment
-from database.constants import DB_FILE, TABLE_NAME
+from database.connection import get_connection
+from database import repository
 from io import BytesIO
-from audiocraft.models import AudioGen
-from audiocraft.data.audio import audio_write
+from audio_generation.peaks import compute_peaks
 from enum import Enum
 import io
-from elevenlabs import ElevenLabs
 from dotenv import load_dotenv
+from audio_generation.assets import get_asset_info, ingest_asset
+from timeline import Timeline, SFX, BACKGROUND
+from providers import load_provider, is_enabled
+from rate_limit import call_with_rate_limit
+from audio_generation.sfx_search import find_similar_sfx
+from functools import lru_cache
 
 CROSSFADE_DURATION = 1000  # 1 second crossfade
+TARGET_LUFS = -40  # loudness every effect is normalised to
+PEAK_CEILING_DBFS = -1.0  # never push an effect's peak above this
 DEBUG_AUDIO_FOLDER = "debug_audio"  # Define debug folder
 
 class SFXModel(Enum):
     ELEVENLABS_API = "elevenlabs_api"
     AUDIOCRAFT_LOCAL = "audiocraft_local"
 
-def is_background_noise(duration, effect_name):
-    return duration > 5.0
+def get_sfx_path(effect_name, description=None):
+    """
+    Path of an effect in the library, preferring MP3 over WAV. An effect that is not there
+    under its own name resolves to the most similar library effect (see sfx_search), if any.
+    None if nothing matches.
+    """
+    def library_path(name):
+        for extension in (".mp3", ".wav"):
+            path = f"data/sfx/{name}{extension}"
+            if os.path.exists(path):
+                return path
+        return None
+
+    path = library_path(effect_name)
+    if path is None:
+        similar = find_similar_sfx(effect_name, description)
+        path = library_path(similar) if similar else None
+    return path
+
+def is_background_noise(asset_info):
+    return asset_info["is_background"]
 
 def validate_sound_effects(events):
     """
@@ -30,9 +54,7 @@ def validate_sound_effects(events):
     missing_effects = []
     for event in events:
         # Check for both MP3 and WAV files
-        sfx_mp3 = f"data/sfx/{event['effect']}.mp3"
-        sfx_wav = f"data/sfx/{event['effect']}.wav"
-        if not os.path.exists(sfx_mp3) and not os.path.exists(sfx_wav):
+        if not get_sfx_path(event['effect'], event.get('description')):
             missing_effects.append(event['effect'])
     
     if missing_effects:
@@ -42,13 +64,21 @@ def validate_sound_effects(events):
     
     return list(set(missing_effects))  # Return unique missing effects
 
+@lru_cache(maxsize=1)
+def get_audiogen_model():
+    """AudioGen (and torch with it) is only imported and loaded the first time an effect is generated locally."""
+    AudioGen = load_provider("audiocraft")
+    model = AudioGen.get_pretrained('facebook/audiogen-medium')
+    model.set_generation_params(duration=3)  # 3 seconds default duration
+    return model
+
 def generate_ai_sound_effect_audiocraft(effect_name):
     """
     Use Meta's Audiocraft to generate a single sound effect.
     """
     try:
-        model = AudioGen.get_pretrained('facebook/audiogen-medium')
-        model.set_generation_params(duration=3)  # 3 seconds default duration
+        model = get_audiogen_model()
+        audio_write = load_provider("audiocraft", "audiocraft.data.audio:audio_write")
         
         # Convert effect name to description (replace underscores with spaces)
         description = effect_name.replace('_', ' ')
@@ -62,6 +92,7 @@ def generate_ai_sound_effect_audiocraft(effect_name):
         save_path = f"data/sfx/{effect_name}"
         audio_write(save_path, wav[0].cpu(), model.sample_rate, 
                    strategy="loudness", loudness_compressor=True)
+        ingest_asset(f"{save_path}.wav")
         
         print(f"✅ Generated with Audiocraft: {effect_name}")
         return True
@@ -78,6 +109,7 @@ def generate_ai_sound_effect_elevenlabs(effect_name):
     try:
         load_dotenv()
         
+        ElevenLabs = load_provider("elevenlabs")
         client = ElevenLabs(
             api_key=os.getenv("ELEVENLABS_API_KEY"),
         )
@@ -85,17 +117,20 @@ def generate_ai_sound_effect_elevenlabs(effect_name):
         description = effect_name.replace('_', ' ')
         print(f"Generating with ElevenLabs: {description}")
         
-        # Get generator response
-        audio_generator = client.text_to_sound_effects.convert(
-            text=description,
-            duration_seconds=10 
-        )
-        
-        # Convert generator to bytes
-        audio_data = io.BytesIO()
-        for chunk in audio_generator:
-            audio_data.write(chunk)
-        audio_data = audio_data.getvalue()
+        def request():
+            # Get generator response
+            audio_generator = client.text_to_sound_effects.convert(
+                text=description,
+                duration_seconds=10 
+            )
+
+            # Convert generator to bytes
+            audio_data = io.BytesIO()
+            for chunk in audio_generator:
+                audio_data.write(chunk)
+            return audio_data.getvalue()
+
+        audio_data = call_with_rate_limit("elevenlabs", request)
         
         # Ensure data/sfx directory exists
         os.makedirs('data/sfx', exist_ok=True)
@@ -104,6 +139,7 @@ def generate_ai_sound_effect_elevenlabs(effect_name):
         output_path = f"data/sfx/{effect_name}.mp3"
         with open(output_path, 'wb') as f:
             f.write(audio_data)
+        ingest_asset(output_path)
             
         print(f"✅ Generated with ElevenLabs: {effect_name}")
         return True
@@ -123,112 +159,125 @@ def generate_ai_sfx(missing_effects, sfx_model):
     for effect in missing_effects:
         if sfx_model == SFXModel.ELEVENLABS_API:
             success = generate_ai_sound_effect_elevenlabs(effect)
-            if not success:
+            if not success and is_enabled("audiocraft"):
                 # Fallback to Audiocraft if ElevenLabs fails
                 print("Falling back to Audiocraft...")
                 generate_ai_sound_effect_audiocraft(effect)
         else:
             generate_ai_sound_effect_audiocraft(effect)
 
-def apply_crossfading(sfx_audio, event, effect_audio, active_backgrounds, start_ms):
+def build_placement_timeline(events):
+    """
+    Timeline of where each effect will sit in the SFX stem (in ms, id = index in events),
+    from the asset index alone. Ambience is marked BACKGROUND so crossfading can ask
+    which backgrounds are still playing instead of scanning every earlier one.
+    """
+    placements = []
+    for event in events:
+        sfx_path = get_sfx_path(event["effect"], event.get("description"))
+        asset_info = get_asset_info(sfx_path) if sfx_path else None
+        start_ms = int(event["start_time"] * 1000)
+        if not asset_info:
+            placements.append({"kind": SFX, "start": start_ms, "end": start_ms})
+            continue
+        kind = BACKGROUND if is_background_noise(asset_info) else SFX
+        placements.append({"kind": kind, "start": start_ms, "end": start_ms + asset_info["duration_ms"],
+                           "source": event["effect"]})
+    return Timeline.build(placements)
+
+def background_fadeouts(placements, event_id, start_ms, faded):
+    """
+    Backgrounds placed before event_id that are still playing at start_ms: each is faded
+    out once, and returned as (effect, fadeout_start, needs_fade).
+    """
+    fadeouts = []
+    for bg in placements.active_at(start_ms, BACKGROUND):
+        if bg.id >= event_id or bg.id in faded:
+            continue
+        faded.add(bg.id)
+        fadeout_start = max(start_ms - CROSSFADE_DURATION, int(bg.start))
+        # only fade if more than the crossfade is left to play
+        fadeouts.append((bg.source, fadeout_start, bg.end - fadeout_start > CROSSFADE_DURATION))
+    return fadeouts
+
+def apply_crossfading(sfx_audio, event, effect_audio, placements, faded, event_id, start_ms):
     """
     Apply crossfading logic for background sounds.
-    Returns the modified sfx_audio and updated active_backgrounds list.
+    Returns the modified sfx_audio; faded collects the backgrounds already faded out.
     """
-    # Check for overlapping background sounds
-    current_time = start_ms
-    
     # Fade out any overlapping background sounds
-    for bg in active_backgrounds[:]:
-        if bg['end_time'] > current_time:
-            # Calculate fadeout position
-            fadeout_start = max(current_time - CROSSFADE_DURATION, bg['start_time'])
-            original_end = bg['end_time']
-            
-            # Apply fadeout
-            remaining_duration = original_end - fadeout_start
-            if remaining_duration > CROSSFADE_DURATION:
-                sfx_audio = sfx_audio.fade(
-                    start=fadeout_start,
-                    duration=CROSSFADE_DURATION,
-                    to_gain=-120.0  # Fade to silence
-                )
-            active_backgrounds.remove(bg)
-            print(f"Faded out background: {bg['effect']} at {fadeout_start}ms")
+    for effect, fadeout_start, needs_fade in background_fadeouts(placements, event_id, start_ms, faded):
+        if needs_fade:
+            sfx_audio = sfx_audio.fade(
+                start=fadeout_start,
+                duration=CROSSFADE_DURATION,
+                to_gain=-120.0  # Fade to silence
+            )
+        print(f"Faded out background: {effect} at {fadeout_start}ms")
     
     # Add new background sound with fadein
     effect_audio = effect_audio.fade_in(CROSSFADE_DURATION)
     sfx_audio = sfx_audio.overlay(effect_audio, position=start_ms)
-    
-    # Track this background sound
-    active_backgrounds.append({
-        'effect': event['effect'],
-        'start_time': start_ms,
-        'end_time': start_ms + len(effect_audio),
-    })
     print(f"Added background: {event['effect']} at {start_ms}ms")
     
-    return sfx_audio, active_backgrounds
+    return sfx_audio
 
 def calculate_average_volume(events):
     """
-    Calculate the average volume of all sound effects.
-    Returns tuple of (average_volume, valid_effects_count)
+    Calculate the average loudness of all sound effects from the asset index.
+    Returns tuple of (average_lufs, valid_effects_count)
     """
     total_volume = 0
     valid_effects = 0
 
     for event in events:
-        sfx_mp3 = f"data/sfx/{event['effect']}.mp3"
-        sfx_wav = f"data/sfx/{event['effect']}.wav"
-        sfx_path = sfx_mp3 if os.path.exists(sfx_mp3) else sfx_wav
+        sfx_path = get_sfx_path(event['effect'], event.get('description'))
         
         try:
-            if os.path.exists(sfx_path):
-                effect_audio = AudioSegment.from_file(sfx_path)
-                total_volume += effect_audio.dBFS
+            if sfx_path:
+                asset_info = get_asset_info(sfx_path)
+                total_volume += asset_info["lufs"]
                 valid_effects += 1
-                print(f"Original volume for {event['effect']}: {effect_audio.dBFS:.1f} dBFS")
+                print(f"Original loudness for {event['effect']}: {asset_info['lufs']:.1f} LUFS")
         except Exception as e:
             print(f"Error analyzing sound effect {event['effect']}: {str(e)}")
     
     if valid_effects > 0:
         average_volume = total_volume / valid_effects
-        print(f"\nAverage effect volume: {average_volume:.1f} dBFS")
+        print(f"\nAverage effect loudness: {average_volume:.1f} LUFS")
         return average_volume, valid_effects
     return 0, 0
 
-def normalize_audio(effect_audio, target_dbfs):
+def normalize_audio(effect_audio, target_lufs, asset_info):
     """
-    Normalize audio to target dBFS level.
+    Normalize audio to target integrated loudness using its ingest metadata,
+    limiting the gain so the peak stays under PEAK_CEILING_DBFS.
     Returns normalized audio segment.
     """
-    volume_change = target_dbfs - effect_audio.dBFS
+    volume_change = normalization_gain(target_lufs, asset_info)
     return effect_audio.apply_gain(volume_change), volume_change
 
+def normalization_gain(target_lufs, asset_info):
+    """Gain in dB that brings an asset to target_lufs without pushing its peak over PEAK_CEILING_DBFS."""
+    return min(target_lufs - asset_info["lufs"], PEAK_CEILING_DBFS - asset_info["peak_dbfs"])
+
 def create_sfx(show_id, sfx_model=SFXModel.ELEVENLABS_API):
     print("\nCreating sound effects for show:", show_id)
 
     os.makedirs(DEBUG_AUDIO_FOLDER, exist_ok=True)
 
     # Get show data from database
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT event_timing FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-    result = cursor.fetchone()
-    
-    if not result:
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+
+    if not event_timing:
         raise ValueError(f"Show {show_id} not found")
-        
-    event_timing = json.loads(result[0])
+
     total_duration = event_timing['total_dialogue_duration']
 
     # Initialize empty audio
     sfx_audio = AudioSegment.silent(duration=total_duration * 1000)
 
-    # Set target volume level for normalization
-    target_dbfs = -40
-
     events = event_timing.get("sound_effect_timing", [])
     
     # Validate and generate missing sound effects
@@ -236,40 +285,38 @@ def create_sfx(show_id, sfx_model=SFXModel.ELEVENLABS_API):
     if missing_effects:
         generate_ai_sfx(missing_effects, sfx_model=sfx_model)
     
-    # Calculate average volume
-    target_dbfs = -40
+    # Calculate average loudness from the asset index
     average_volume, valid_effects = calculate_average_volume(events)
     if valid_effects > 0:
-        print(f"Target volume: {target_dbfs} dBFS")
+        print(f"Target loudness: {TARGET_LUFS} LUFS")
 
     # Process and position effects
-    active_backgrounds = []
+    placements = build_placement_timeline(events)
+    faded = set()
 
-    for event in events:
-        sfx_mp3 = f"data/sfx/{event['effect']}.mp3"
-        sfx_wav = f"data/sfx/{event['effect']}.wav"
-        sfx_path = sfx_mp3 if os.path.exists(sfx_mp3) else sfx_wav
+    for event_id, event in enumerate(events):
+        sfx_path = get_sfx_path(event['effect'], event.get('description'))
         
         try:
-            if os.path.exists(sfx_path):
+            if sfx_path:
+                asset_info = get_asset_info(sfx_path)
                 effect_audio = AudioSegment.from_file(sfx_path)
-                duration = len(effect_audio) / 1000.0  # Convert to seconds
                 
                 # Normalize the audio
-                effect_audio, volume_change = normalize_audio(effect_audio, target_dbfs)
+                effect_audio, volume_change = normalize_audio(effect_audio, TARGET_LUFS, asset_info)
                 print(f"Normalized {event['effect']}: {volume_change:.1f}dB adjustment")
 
                 start_ms = int(event["start_time"] * 1000)
                 
-                if is_background_noise(duration, event['effect']):
-                    sfx_audio, active_backgrounds = apply_crossfading(
-                        sfx_audio, event, effect_audio, active_backgrounds, start_ms
+                if is_background_noise(asset_info):
+                    sfx_audio = apply_crossfading(
+                        sfx_audio, event, effect_audio, placements, faded, event_id, start_ms
                     )
                 else:
                     sfx_audio = sfx_audio.overlay(effect_audio, position=start_ms)
                     print(f"Added sound effect: {event['effect']} at {start_ms}ms")
             else:
-                print(f"Sound effect file not found: {sfx_path}")
+                print(f"Sound effect file not found: {event['effect']}")
         except Exception as e:
             print(f"Error processing sound effect {event['effect']}: {str(e)}")
 
@@ -277,6 +324,7 @@ def create_sfx(show_id, sfx_model=SFXModel.ELEVENLABS_API):
     mp3_buffer = BytesIO()
     sfx_audio.export(mp3_buffer, format="mp3")
     mp3_binary = mp3_buffer.getvalue()
+    peaks = compute_peaks(sfx_audio)
 
     # Save for debugging
     debug_mp3_path = os.path.join(DEBUG_AUDIO_FOLDER, f"{show_id}_sfx.mp3")
@@ -284,12 +332,11 @@ def create_sfx(show_id, sfx_model=SFXModel.ELEVENLABS_API):
     print(f"🔍 Debug MP3 saved: {debug_mp3_path}")
 
     try:
-        cursor.execute(f"UPDATE {TABLE_NAME} SET sfx_audio = ? WHERE id = ?", (mp3_binary, show_id))
-        conn.commit()
+        with get_connection() as conn:
+            repository.save_audio(conn, show_id, "sfx", mp3_binary)
+            repository.save_peaks(conn, show_id, "sfx", peaks)
         print(f"✅ Database updated: show_id {show_id} → (BLOB data stored)")
     except Exception as e:
         print(f"❌ Database update failed: {str(e)}")
-    finally:
-        conn.close()
 
     return f"SFX stored as BLOB for show_id {show_id}, and saved to {debug_mp3_path}"
@@ -0,0 +1,180 @@
+"""
+Search over the SFX library, so an effect the LLM names differently from the file we
+already have ("creaking_door" vs door_creak.wav) reuses that file instead of paying
+for a new generation.
+
+Every file in data/sfx is a document made of
+- its name,
+- its description from data/sfx_descriptions.json ({"door_creak": "an old wooden door creaks open"}), if any,
+- audio features from the asset index ("background ambience" for long steady files, "short" for one-shots).
+
+Documents and queries (effect name + the script's description of it) are TF-IDF vectors
+of words and character trigrams, compared by cosine similarity and scaled by the share
+of the effect name's words the document contains. The best match counts when it scores
+at least SFX_MATCH_THRESHOLD.
+
+Usage:
+    python -m audio_generation.sfx_search creaking_door "a door slowly opens"
+"""
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from audio_generation.assets import get_asset_info
+
+SFX_FOLDER = "data/sfx"
+SFX_DESCRIPTIONS_PATH = "data/sfx_descriptions.json"
+SFX_EXTENSIONS = (".mp3", ".wav")
+SFX_MATCH_THRESHOLD = float(os.getenv("SFX_MATCH_THRESHOLD", "0.5"))
+SFX_SEARCH_ENABLED = os.getenv("SFX_SEARCH", "1") != "0"
+
+DESCRIPTION_WEIGHT = 0.5  # names are what the LLM and the library agree on most
+FEATURE_WEIGHT = 0.3
+SHORT_EFFECT_SECONDS = 2.0
+STOP_WORDS = {"a", "an", "the", "of", "on", "in", "at", "to", "and", "with", "from", "into", "sound", "effect"}
+
+_index = None
+_index_lock = threading.Lock()
+_reported = set()
+
+
+def _words(text):
+    words = []
+    for word in re.split(r"[^a-z0-9]+", (text or "").lower()):
+        if not word or word in STOP_WORDS:
+            continue
+        # crude stemming, enough for creaking/creaks/creak and humming/hum
+        for suffix in ("ing", "ed", "es", "s"):
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+                    word = word[:-1]
+                break
+        words.append(word)
+    return words
+
+
+def _features(text, weight=1.0):
+    """Weighted counts of words and character trigrams of text."""
+    features = Counter()
+    for word in _words(text):
+        features[f"w:{word}"] += weight
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            features[f"c:{padded[i:i + 3]}"] += weight
+    return features
+
+
+def _audio_features(path):
+    info = get_asset_info(path)
+    if info["is_background"]:
+        return "background ambience ambient loop"
+    if info["duration"] < SHORT_EFFECT_SECONDS:
+        return "short hit"
+    return ""
+
+
+def _library_signature():
+    try:
+        names = tuple(sorted(name for name in os.listdir(SFX_FOLDER) if name.endswith(SFX_EXTENSIONS)))
+    except FileNotFoundError:
+        names = ()
+    try:
+        descriptions_mtime = os.path.getmtime(SFX_DESCRIPTIONS_PATH)
+    except OSError:
+        descriptions_mtime = None
+    return names, descriptions_mtime
+
+
+def _load_descriptions():
+    try:
+        with open(SFX_DESCRIPTIONS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _vectorize(features, idf):
+    vector = {feature: count * idf.get(feature, 0.0) for feature, count in features.items()}
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {feature: value / norm for feature, value in vector.items()} if norm else {}
+
+
+def _build_index(signature):
+    names, _ = signature
+    descriptions = _load_descriptions()
+    documents = {}
+    words = {}
+    for filename in names:
+        effect = os.path.splitext(filename)[0]
+        if effect in documents:  # mp3 and wav of the same effect
+            continue
+        features = _features(effect.replace("_", " "))
+        features.update(_features(descriptions.get(effect, ""), DESCRIPTION_WEIGHT))
+        try:
+            features.update(_features(_audio_features(os.path.join(SFX_FOLDER, filename)), FEATURE_WEIGHT))
+        except Exception as e:
+            print(f"⚠️ No audio features for {filename}: {str(e)}")
+        documents[effect] = features
+        words[effect] = {feature for feature in features if feature.startswith("w:")}
+
+    document_frequency = Counter(feature for features in documents.values() for feature in features)
+    idf = {feature: math.log((1 + len(documents)) / (1 + df)) + 1 for feature, df in document_frequency.items()}
+    vectors = {effect: _vectorize(features, idf) for effect, features in documents.items()}
+    return {"signature": signature, "idf": idf, "vectors": vectors, "words": words, "matches": {}}
+
+
+def _get_index():
+    """The library index, rebuilt when files are added or descriptions change."""
+    global _index
+    signature = _library_signature()
+    with _index_lock:
+        if _index is None or _index["signature"] != signature:
+            _index = _build_index(signature)
+        return _index
+
+
+def search_sfx(effect, description=None, limit=5):
+    """Library effects most similar to effect (and its description), as [(name, score)] best first."""
+    index = _get_index()
+    query = _features(effect.replace("_", " "))
+    query.update(_features(description, DESCRIPTION_WEIGHT))
+    query = _vectorize(query, index["idf"])
+    # cosine similarity, scaled by how much of the effect's name the document covers,
+    # so door_slam does not match door_creak on "door" alone
+    name_words = {f"w:{word}" for word in _words(effect.replace("_", " "))}
+    scores = []
+    for name, vector in index["vectors"].items():
+        similarity = sum(value * vector.get(feature, 0.0) for feature, value in query.items())
+        coverage = len(name_words & index["words"][name]) / len(name_words) if name_words else 1.0
+        scores.append((name, similarity * coverage))
+    scores.sort(key=lambda item: item[1], reverse=True)
+    return [(name, score) for name, score in scores[:limit] if score > 0]
+
+
+def find_similar_sfx(effect, description=None, threshold=None):
+    """Name of the best library match for effect above the threshold, or None."""
+    if not SFX_SEARCH_ENABLED:
+        return None
+    threshold = SFX_MATCH_THRESHOLD if threshold is None else threshold
+    index = _get_index()
+    key = (effect, description or "", threshold)
+    if key not in index["matches"]:
+        results = search_sfx(effect, description, limit=1)
+        index["matches"][key] = results[0][0] if results and results[0][1] >= threshold else None
+        if index["matches"][key] and (effect, index["matches"][key]) not in _reported:
+            _reported.add((effect, index["matches"][key]))
+            print(f"🔎 Using library effect {index['matches'][key]} for {effect} (similarity {results[0][1]:.2f})")
+    return index["matches"][key]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m audio_generation.sfx_search EFFECT [DESCRIPTION]")
+        sys.exit(1)
+    for name, score in search_sfx(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None):
+        marker = "✅" if score >= SFX_MATCH_THRESHOLD else "  "
+        print(f"{marker} {score:.2f}  {name}")
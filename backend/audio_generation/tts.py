@@ -1,17 +1,50 @@
 import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
-from elevenlabs import save
+from providers import load_provider
+from rate_limit import call_with_rate_limit, current_lane, run_in_lane
+from audio_generation.assets import ingest_asset
+from audio_generation.tts_backends import TTSBackend, PiperBackend, TTS_BACKEND
 import re
 
+TTS_MODEL = "eleven_multilingual_v2"
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))  # voices rendered in parallel
 
-def generate_tts(text, speaker, voice, emotion="neutral"):
+
+@lru_cache(maxsize=1)
+def get_elevenlabs_client():
     load_dotenv()
-    api_key = os.getenv("ELEVENLABS_API_KEY")
-    client = ElevenLabs(api_key=api_key)
+    ElevenLabs = load_provider("elevenlabs")
+    return ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+
+
+@lru_cache(maxsize=None)
+def resolve_voice_id(voice):
+    """
+    Map a voice name from the script (e.g. "Emily") to an ElevenLabs voice id.
+    client.generate() does this lookup with an extra API call on every line, so cache it.
+    """
+    is_voice_id = load_provider("elevenlabs", "elevenlabs.client:is_voice_id")
+    if is_voice_id(voice):
+        return voice
+    voices = call_with_rate_limit("elevenlabs", get_elevenlabs_client().voices.get_all, show_legacy=True).voices
+    voice_id = next((v.voice_id for v in voices if v.name == voice), None)
+    if voice_id is None:
+        raise ValueError(f"Voice {voice} not found.")
+    return voice_id
 
-    filename = get_tts_filename(text, speaker, voice, emotion)
-    directory = "data/dialogue"
+
+def generate_tts(text, speaker, voice, emotion="neutral", previous_text=None, next_text=None, filename=None):
+    """
+    Render one line to data/dialogue (or filename), unless it is already cached there.
+    previous_text / next_text are passed to ElevenLabs request stitching so
+    consecutive lines of the same voice keep a consistent delivery.
+    """
+    filename = filename or get_tts_filename(text, speaker, voice, emotion)
+    directory = os.path.dirname(filename)
 
     # Create directories if they don't exist
     os.makedirs(directory, exist_ok=True)
@@ -22,54 +55,183 @@ def generate_tts(text, speaker, voice, emotion="neutral"):
         return filename
 
     print(f"generating {filename}")
-    audio = client.generate(text=text, voice=voice)
-    save(audio, filename)
+    stitching = {}
+    if previous_text:
+        stitching["previous_text"] = previous_text
+    if next_text:
+        stitching["next_text"] = next_text
+
+    default_voice = load_provider("elevenlabs", "elevenlabs.client:DEFAULT_VOICE")
+    save = load_provider("elevenlabs", "elevenlabs:save")
+    voice_id = resolve_voice_id(voice)
+
+    def request():
+        # the response streams while it is saved, so the save is part of the rate limited call
+        audio = get_elevenlabs_client().text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=TTS_MODEL,
+            voice_settings=default_voice.settings,
+            **stitching
+        )
+        save(audio, filename)
+
+    call_with_rate_limit("elevenlabs", request)
     print(f"Audio saved: {filename}")
+    ingest_asset(filename)
     return filename
 
 
-def generate_tts_files(script_data: dict) -> list:
-    """Generate audio files from script data."""
+def collect_tts_requests(script_data: dict, backend: TTSBackend = None) -> list:
+    """List the TTS requests needed for every dialogue line in a parsed script, in script order."""
+    backend = backend or get_tts_backend()
     events = script_data.get("events", [])
     characters = script_data.get("characters", [])
 
-    generated_files = []
-    os.makedirs("data/dialogue", exist_ok=True)
-    print(f"Generating TTS for events: {len(events)}")
-    
+    requests = []
     for event in events:
-        print(event)
         if event["type"] != "dialogue":
             continue
-        line = event
-        speaker_name = line["speaker"]
+        speaker_name = event["speaker"]
         character = characters.get(speaker_name)
 
         if not character:
             continue
 
         voice = character["elevenlabs_voice"]
-        text = line["line"]
-        emotion = line["emotion"]
+        text = event["line"]
+        emotion = event["emotion"]
+        requests.append({
+            "file": get_tts_filename(text, speaker_name, voice, emotion, backend.directory, backend.extension),
+            "character": speaker_name,
+            "line": text,
+            "emotion": emotion,
+            "voice": voice
+        })
+
+    return requests
+
+
+def plan_tts_requests(script_data: dict, backend: TTSBackend = None) -> dict:
+    """
+    Collect the unique (text, voice, emotion) requests of a script and group them by voice.
+    Lines repeated in the script (refrains, catchphrases) are rendered once and fanned back
+    out to every event. Each request carries the neighbouring lines of the same voice as
+    stitching context.
+    """
+    backend = backend or get_tts_backend()
+    events = collect_tts_requests(script_data, backend)
+
+    unique = {}
+    for event in events:
+        key = (event["line"], event["voice"], event["emotion"])
+        request = unique.setdefault(key, dict(event))
+        # every event for this key shares the first request's file
+        event["file"] = request["file"]
+
+    by_voice = defaultdict(list)
+    for request in unique.values():
+        by_voice[request["voice"]].append(request)
+
+    for requests in by_voice.values():
+        for i, request in enumerate(requests):
+            request["previous_text"] = requests[i - 1]["line"] if i > 0 else None
+            request["next_text"] = requests[i + 1]["line"] if i + 1 < len(requests) else None
+
+    cached = [request for request in unique.values() if os.path.exists(request["file"])]
+
+    return {
+        "backend": backend.name,
+        "events": events,
+        "by_voice": dict(by_voice),
+        "unique_count": len(unique),
+        "cached_count": len(cached),
+    }
 
-        filename = generate_tts(text, speaker_name, voice, emotion)
-        if filename:
-            generated_files.append({
-                "file": filename,
-                "character": speaker_name,
-                "line": text,
-                "emotion": emotion,
-                "voice": voice
-            })
 
-    return generated_files
+def run_tts_plan(plan: dict, backend: TTSBackend = None) -> dict:
+    """
+    Render the missing requests of a plan with the backend it was planned for.
+    Returns request statistics.
+    """
+    started = time.time()
+    backend = backend or get_tts_backend(plan["backend"])
+    api_calls = backend.render([request for requests in plan["by_voice"].values() for request in requests])
 
+    lines = len(plan["events"])
+    unique_count = plan["unique_count"]
+    return {
+        "lines": lines,
+        "unique_requests": unique_count,
+        "deduplicated": lines - unique_count,
+        "cache_hits": plan["cached_count"],
+        "cache_hit_rate": round(plan["cached_count"] / unique_count, 3) if unique_count else 1.0,
+        "backend": backend.name,
+        "api_calls": api_calls,
+        "voices": len(plan["by_voice"]),
+        "elapsed_seconds": round(time.time() - started, 2),
+    }
 
-def get_tts_filename(text, speaker, voice, emotion):
+
+def generate_tts_files(script_data: dict, backend_name: str = None) -> list:
+    """Generate audio files from script data."""
+    backend = get_tts_backend(backend_name)
+    os.makedirs(backend.directory, exist_ok=True)
+
+    plan = plan_tts_requests(script_data, backend)
+    print(f"Generating TTS ({backend.name}) for dialogue lines: {len(plan['events'])} "
+          f"({plan['unique_count']} unique across {len(plan['by_voice'])} voices)")
+
+    stats = run_tts_plan(plan, backend)
+    print(f"TTS: {stats['api_calls']} lines synthesised, {stats['deduplicated']} duplicate lines, "
+          f"cache hit rate {stats['cache_hit_rate']:.0%}, {stats['elapsed_seconds']}s")
+
+    return [event for event in plan["events"] if os.path.exists(event["file"])]
+
+
+def get_tts_filename(text, speaker, voice, emotion, directory="data/dialogue", extension="mp3"):
     # TODO use hashes here
     words = text.split()[:5]
     filename_base = "_".join(words).lower()
     filename_base = re.sub(r"[^a-z0-9_]", "", filename_base)
-    directory = "data/dialogue"
-    filename = f"{directory}/{speaker}_{emotion}_{filename_base}_{voice}.mp3"
+    filename = f"{directory}/{speaker}_{emotion}_{filename_base}_{voice}.{extension}"
     return filename
+
+
+class ElevenLabsBackend(TTSBackend):
+    """Remote rendering through the ElevenLabs API. Voices run in parallel, the lines of one voice in script order."""
+    name = "elevenlabs"
+
+    def render(self, requests):
+        by_voice = defaultdict(list)
+        for request in requests:
+            by_voice[request["voice"]].append(request)
+
+        def render_voice(requests):
+            calls = 0
+            for request in requests:
+                if os.path.exists(request["file"]):
+                    continue
+                generate_tts(
+                    request["line"], request["character"], request["voice"], request["emotion"],
+                    previous_text=request["previous_text"], next_text=request["next_text"],
+                    filename=request["file"]
+                )
+                calls += 1
+            return calls
+
+        lane = current_lane()
+        with ThreadPoolExecutor(max_workers=TTS_CONCURRENCY) as executor:
+            return sum(executor.map(lambda voice_requests: run_in_lane(lane, render_voice, voice_requests),
+                                    by_voice.values()))
+
+
+TTS_BACKENDS = {backend.name: backend for backend in (ElevenLabsBackend, PiperBackend)}
+
+
+def get_tts_backend(name=None) -> TTSBackend:
+    """The named TTS backend, or the deployment's TTS_BACKEND."""
+    name = name or TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}'. Choose from: {', '.join(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name]()
@@ -0,0 +1,154 @@
+"""
+TTS backends. A backend renders the requests of a TTS plan (see tts.plan_tts_requests)
+to files and says where its files live, so lines rendered by different engines never
+share a cache entry.
+
+ElevenLabs (tts.ElevenLabsBackend) is the remote default. PiperBackend renders on the
+CPU with Piper voices: every worker process of a persistent pool keeps the voice models
+it has loaded, and lines are sent to the workers in batches, so a show costs a handful
+of process round trips and no network at all.
+
+Voices come from characters[...].elevenlabs_voice, mapped to Piper models by
+data/tts_voices.json:
+    {"Emily": {"model": "en_US-amy-medium"}, "Charlie": {"model": "en_GB-alan-medium"},
+     "*": {"model": "en_US-libritts_r-medium", "speaker_id": 12}}
+A model is an .onnx path, or a name looked up in PIPER_MODEL_DIR; "*" is the fallback.
+"""
+import abc
+import json
+import multiprocessing
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from audio_generation.assets import ingest_asset
+from providers import load_provider
+
+TTS_BACKEND = os.getenv("TTS_BACKEND", "elevenlabs")
+TTS_VOICE_MAP_PATH = "data/tts_voices.json"
+PIPER_MODEL_DIR = os.getenv("PIPER_MODEL_DIR", "data/voices")
+PIPER_WORKERS = int(os.getenv("PIPER_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PIPER_BATCH_SIZE = int(os.getenv("PIPER_BATCH_SIZE", "8"))  # lines per worker task
+
+# Piper has no emotion control, so emotions only nudge the speaking rate
+EMOTION_LENGTH_SCALE = {
+    "excited": 0.9, "urgent": 0.88, "alarmed": 0.9, "angry": 0.92, "frightened": 0.92,
+    "sad": 1.12, "melancholy": 1.15, "tender": 1.08, "calm": 1.05, "mysterious": 1.08,
+}
+
+
+class TTSBackend(abc.ABC):
+    """Interface of a TTS engine."""
+    name = None
+    directory = "data/dialogue"
+    extension = "mp3"
+    batched = False  # renders a whole plan at once rather than line by line
+
+    @abc.abstractmethod
+    def render(self, requests):
+        """Render every request whose file does not exist yet. Returns the number of lines synthesised."""
+
+
+@lru_cache(maxsize=1)
+def load_voice_map():
+    try:
+        with open(TTS_VOICE_MAP_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def resolve_piper_voice(voice):
+    """(model path, speaker id) for a script voice name."""
+    voice_map = load_voice_map()
+    entry = voice_map.get(voice) or voice_map.get("*")
+    if not entry:
+        raise ValueError(f"No Piper voice mapped for '{voice}' (and no '*' fallback) in {TTS_VOICE_MAP_PATH}")
+    model = entry["model"]
+    if not model.endswith(".onnx"):
+        model = os.path.join(PIPER_MODEL_DIR, f"{model}.onnx")
+    return model, entry.get("speaker_id")
+
+
+# worker process state: model path -> loaded PiperVoice, kept for the life of the worker
+_worker_voices = {}
+
+
+def _worker_voice(model):
+    voice = _worker_voices.get(model)
+    if voice is None:
+        PiperVoice = load_provider("piper")
+        voice = PiperVoice.load(model)
+        _worker_voices[model] = voice
+    return voice
+
+
+def _synthesize_batch(batch):
+    """Render a batch of lines in a worker process. Returns the files written."""
+    written = []
+    for line in batch:
+        voice = _worker_voice(line["model"])
+        tmp_path = f"{line['file']}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as wav_file:
+            if hasattr(voice, "synthesize_wav"):  # piper-tts >= 1.3
+                SynthesisConfig = load_provider("piper", "piper:SynthesisConfig")
+                config = SynthesisConfig(speaker_id=line["speaker_id"], length_scale=line["length_scale"])
+                voice.synthesize_wav(line["text"], wav_file, syn_config=config)
+            else:
+                voice.synthesize(line["text"], wav_file, speaker_id=line["speaker_id"],
+                                 length_scale=line["length_scale"])
+        os.replace(tmp_path, line["file"])
+        written.append(line["file"])
+    return written
+
+
+class PiperBackend(TTSBackend):
+    name = "piper"
+    directory = "data/dialogue/piper"
+    extension = "wav"
+    batched = True
+
+    _pool = None
+
+    @classmethod
+    def pool(cls):
+        # one pool for the life of the process, so workers keep their voices loaded between shows
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(max_workers=PIPER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return cls._pool
+
+    @classmethod
+    def shutdown(cls):
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
+
+    def render(self, requests):
+        os.makedirs(self.directory, exist_ok=True)
+        by_model = {}
+        for request in requests:
+            if os.path.exists(request["file"]):
+                continue
+            model, speaker_id = resolve_piper_voice(request["voice"])
+            by_model.setdefault(model, []).append({
+                "file": request["file"],
+                "text": request["line"],
+                "model": model,
+                "speaker_id": speaker_id,
+                "length_scale": EMOTION_LENGTH_SCALE.get(request["emotion"].lower(), 1.0),
+            })
+        if not by_model:
+            return 0
+
+        # lines of one model stay together, so each worker only loads the voices it is sent
+        batches = [lines[i:i + PIPER_BATCH_SIZE] for lines in by_model.values()
+                   for i in range(0, len(lines), PIPER_BATCH_SIZE)]
+        started = time.time()
+        rendered = 0
+        for written in self.pool().map(_synthesize_batch, batches):
+            for path in written:
+                ingest_asset(path)
+            rendered += len(written)
+        print(f"🗣️ Piper rendered {rendered} lines in {len(batches)} batches, {time.time() - started:.1f}s")
+        return rendered
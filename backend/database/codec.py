@@ -0,0 +1,107 @@
+"""
+Storage codec for the JSON documents kept on a show (parsed_script, event_timing).
+
+Documents are written as msgpack, compressed with zstd when the zstandard package is
+installed (zlib otherwise) once they are big enough for it to pay off, behind a small
+header so the format can change later:
+
+    b"AD", format version u8, serialization u8 (json, msgpack), compression u8 (none, zlib, zstd), payload
+
+Rows written before this codec existed hold plain JSON text and are still read
+transparently, so nothing has to be migrated.
+"""
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # documents are stored as (compressed) JSON behind the same header instead
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_MAGIC = b"AD"
+CODEC_VERSION = 1
+HEADER_SIZE = 5
+
+# serialisation
+JSON = 0
+MSGPACK = 1
+# compression
+UNCOMPRESSED = 0
+ZLIB = 1
+ZSTD = 2
+
+COMPRESS_MIN_BYTES = 1024  # below this the compression frame costs more than it saves
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+
+def _json_dumps(document) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(document)
+    return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_document(document) -> bytes:
+    """Serialise a JSON-compatible document for storage."""
+    if msgpack is not None:
+        serialization, payload = MSGPACK, msgpack.packb(document, use_bin_type=True)
+    else:
+        serialization, payload = JSON, _json_dumps(document)
+
+    compression = UNCOMPRESSED
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        if zstandard is not None:
+            payload, compression = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload), ZSTD
+        else:
+            payload, compression = zlib.compress(payload, ZLIB_LEVEL), ZLIB
+    return CODEC_MAGIC + bytes([CODEC_VERSION, serialization, compression]) + payload
+
+
+def decode_document(data):
+    """Read a stored document: codec output, or legacy JSON text/bytes. None stays None."""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        return _json_loads(data)
+
+    data = bytes(data)
+    if not data.startswith(CODEC_MAGIC):
+        return _json_loads(data)
+
+    version, serialization, compression = data[2], data[3], data[4]
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported document format version {version}")
+    payload = data[HEADER_SIZE:]
+
+    if compression == ZLIB:
+        payload = zlib.decompress(payload)
+    elif compression == ZSTD:
+        if zstandard is None:
+            raise ValueError("Document is zstd compressed but the zstandard package is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif compression != UNCOMPRESSED:
+        raise ValueError(f"Unknown document compression {compression}")
+
+    if serialization == JSON:
+        return _json_loads(payload)
+    if serialization == MSGPACK:
+        if msgpack is None:
+            raise ValueError("Document is stored as msgpack but the msgpack package is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    raise ValueError(f"Unknown document serialization {serialization}")
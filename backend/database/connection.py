@@ -0,0 +1,130 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from database.constants import DB_FILE
+from database.schema import ensure_schema
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = 30  # seconds to wait for a free connection
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+
+
+class ConnectionPool:
+    """
+    Small pool of SQLite connections shared by the API and the renderers.
+
+    A connection is only ever used by the thread that checked it out, so
+    connections are opened with check_same_thread=False and handed between
+    threads (FastAPI's threadpool, BackgroundTasks). Keeping connections
+    open also keeps sqlite3's per-connection prepared statement cache warm.
+    """
+
+    def __init__(self, db_file, size=POOL_SIZE):
+        self.db_file = db_file
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._after_commit = {}  # id of a checked-out connection -> callbacks for its commit
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=POOL_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        # WAL lets readers (e.g. /get-audio) run while a renderer is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._schema_ready:
+            ensure_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError(f"No database connection available after {POOL_TIMEOUT}s")
+
+    def _release(self, conn):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the block.
+        Commits on success, rolls back on error, and always returns the
+        connection to the pool.
+        """
+        conn = self._acquire()
+        callbacks = self._after_commit[id(conn)] = []
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            del self._after_commit[id(conn)]
+            self._release(conn)
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, conn, callback):
+        """Run callback once conn's block commits (dropped on rollback); right away for other connections."""
+        callbacks = self._after_commit.get(id(conn))
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown and in forked workers)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+            conn.close()
+
+
+pool = ConnectionPool(DB_FILE)
+
+
+def get_connection():
+    """Context manager yielding a pooled connection, for use outside requests."""
+    return pool.connection()
+
+
+def after_commit(conn, callback):
+    pool.after_commit(conn, callback)
+
+
+def get_db():
+    """FastAPI dependency: one pooled connection per request."""
+    with pool.connection() as conn:
+        yield conn
@@ -1,4 +1,5 @@
 import os
 
 DB_FILE = os.path.join(os.path.dirname(__file__), "database.db")
-TABLE_NAME = "shows"
\ No newline at end of file
+TABLE_NAME = "shows"
+JOBS_TABLE = "render_jobs"
@@ -0,0 +1,165 @@
+"""
+Render job queue, shared by the worker.py processes on the API's host (the database is
+WAL-mode SQLite, which only processes on one machine can share safely).
+
+A worker claims the most urgent queued job together with a lease, renews the lease
+with heartbeats while it works and finishes the job with complete_job / fail_job.
+A job whose lease runs out (its worker crashed or lost the database) goes back to
+the queue on the next claim, until it has been attempted max_attempts times.
+
+Every function takes a connection and is a single statement or two, so a claim
+is atomic without holding a transaction open while a job runs. A worker runs a job
+inside holding_lease(), and whatever persists the job's output calls check_lease() in
+the same transaction, so a worker that lost its lease can't overwrite anything.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+from database.constants import JOBS_TABLE
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_LEASE_SECONDS = 60
+
+_lease = threading.local()
+JOB_COLUMNS = ("id", "kind", "payload", "status", "priority", "attempts", "max_attempts", "lease_owner",
+               "lease_expires", "result", "error", "created_at", "started_at", "finished_at")
+
+
+def _job(row) -> dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def enqueue_job(conn: sqlite3.Connection, kind: str, payload: dict, priority: int = 0, max_attempts: int = 3) -> str:
+    """Queue a job; lower priority values are claimed first. Returns the job id."""
+    job_id = uuid.uuid4().hex
+    conn.execute(
+        f"INSERT INTO {JOBS_TABLE} (id, kind, payload, status, priority, max_attempts, created_at) "
+        f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (job_id, kind, json.dumps(payload), QUEUED, priority, max_attempts, time.time())
+    )
+    return job_id
+
+
+def requeue_expired(conn: sqlite3.Connection) -> int:
+    """Return jobs with expired leases to the queue (or fail them when out of attempts)."""
+    now = time.time()
+    conn.execute(
+        f"UPDATE {JOBS_TABLE} SET status = ?, error = 'lease expired', finished_at = ?, lease_owner = NULL, "
+        f"lease_token = NULL WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+        (FAILED, now, RUNNING, now)
+    )
+    return conn.execute(
+        f"UPDATE {JOBS_TABLE} SET status = ?, lease_owner = NULL, lease_token = NULL "
+        f"WHERE status = ? AND lease_expires < ?",
+        (QUEUED, RUNNING, now)
+    ).rowcount
+
+
+def claim_job(conn: sqlite3.Connection, worker_id: str, kinds: Optional[List[str]] = None,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[dict]:
+    """Lease the most urgent queued job (of the given kinds) to worker_id, or return None."""
+    requeue_expired(conn)
+    token = uuid.uuid4().hex
+    kind_filter = f"AND kind IN ({', '.join('?' for _ in kinds)})" if kinds else ""
+    now = time.time()
+    # one UPDATE picks and takes the job, so two workers can never claim the same one
+    claimed = conn.execute(
+        f"UPDATE {JOBS_TABLE} SET status = ?, lease_owner = ?, lease_token = ?, lease_expires = ?, "
+        f"attempts = attempts + 1, started_at = ? "
+        f"WHERE id = (SELECT id FROM {JOBS_TABLE} WHERE status = ? {kind_filter} "
+        f"ORDER BY priority, created_at LIMIT 1) AND status = ?",
+        (RUNNING, worker_id, token, now + lease_seconds, now, QUEUED, *(kinds or ()), QUEUED)
+    ).rowcount
+    if not claimed:
+        return None
+    row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM {JOBS_TABLE} WHERE lease_token = ?", (token,)).fetchone()
+    return _job(row) if row else None
+
+
+def heartbeat(conn: sqlite3.Connection, job_id: str, worker_id: str,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+    """Extend the lease. False if the worker no longer holds it (it expired and was requeued)."""
+    return conn.execute(
+        f"UPDATE {JOBS_TABLE} SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+        (time.time() + lease_seconds, job_id, worker_id, RUNNING)
+    ).rowcount == 1
+
+
+def lease_held(conn: sqlite3.Connection, job_id: str, worker_id: str) -> bool:
+    """Whether worker_id still holds a live lease on the job."""
+    return conn.execute(
+        f"SELECT 1 FROM {JOBS_TABLE} WHERE id = ? AND lease_owner = ? AND status = ? AND lease_expires >= ?",
+        (job_id, worker_id, RUNNING, time.time())
+    ).fetchone() is not None
+
+
+class LeaseLost(Exception):
+    """The job's lease expired or passed to another worker, so its output must not be stored."""
+
+
+@contextmanager
+def holding_lease(job_id: str, worker_id: str):
+    """Run the calling thread's work on behalf of a leased job (see check_lease)."""
+    previous = getattr(_lease, "job", None)
+    _lease.job = (job_id, worker_id)
+    try:
+        yield
+    finally:
+        _lease.job = previous
+
+
+def check_lease(conn: sqlite3.Connection) -> None:
+    """
+    Raise LeaseLost if the calling thread works for a job whose lease it no longer holds.
+    Call it in the transaction that stores the job's output, so the check and the write commit together.
+    """
+    job = getattr(_lease, "job", None)
+    if job and not lease_held(conn, *job):
+        raise LeaseLost(f"Lost the lease on job {job[0]}")
+
+
+def complete_job(conn: sqlite3.Connection, job_id: str, worker_id: str, result=None) -> bool:
+    """Mark the job done. Ignored (False) if its lease has passed to another worker."""
+    return conn.execute(
+        f"UPDATE {JOBS_TABLE} SET status = ?, result = ?, finished_at = ?, lease_owner = NULL, lease_token = NULL "
+        f"WHERE id = ? AND lease_owner = ? AND status = ?",
+        (DONE, json.dumps(result), time.time(), job_id, worker_id, RUNNING)
+    ).rowcount == 1
+
+
+def fail_job(conn: sqlite3.Connection, job_id: str, worker_id: str, error: str) -> bool:
+    """Requeue the job for another attempt, or fail it for good once it is out of attempts."""
+    return conn.execute(
+        f"UPDATE {JOBS_TABLE} SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, error = ?, "
+        f"finished_at = CASE WHEN attempts >= max_attempts THEN ? END, lease_owner = NULL, lease_token = NULL "
+        f"WHERE id = ? AND lease_owner = ? AND status = ?",
+        (FAILED, QUEUED, error, time.time(), job_id, worker_id, RUNNING)
+    ).rowcount == 1
+
+
+def get_job(conn: sqlite3.Connection, job_id: str) -> Optional[dict]:
+    row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM {JOBS_TABLE} WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+
+def queue_stats(conn: sqlite3.Connection) -> dict:
+    """Number of jobs per status, and how many running jobs hold a live lease."""
+    stats = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+    for status, count in conn.execute(f"SELECT status, COUNT(*) FROM {JOBS_TABLE} GROUP BY status"):
+        stats[status] = count
+    stats["workers"] = conn.execute(
+        f"SELECT COUNT(DISTINCT lease_owner) FROM {JOBS_TABLE} WHERE status = ? AND lease_expires >= ?",
+        (RUNNING, time.time())
+    ).fetchone()[0]
+    return stats
@@ -0,0 +1,286 @@
+import datetime
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from database.codec import encode_document, decode_document
+from database.constants import TABLE_NAME
+from database.schema import LISTING_COLUMNS
+from database.connection import after_commit
+from database import jobs
+from timeline import Timeline
+import audio_cache
+
+AUDIO_TYPES = ("dialogue", "music", "sfx")
+DOCUMENT_CACHE_SIZE = 256
+
+# per process: (show_id, column) -> (revision, decoded document), so the endpoints and the
+# three renderers don't decode the same document again while its row is unchanged
+_document_cache = OrderedDict()
+_document_cache_lock = threading.Lock()
+
+
+def _audio_column(audio_type: str) -> str:
+    if audio_type not in AUDIO_TYPES:
+        raise ValueError(f"Audio type '{audio_type}' is not supported")
+    return f"{audio_type}_audio"
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+def _get_document(conn: sqlite3.Connection, show_id: int, column: str):
+    """
+    Decoded parsed_script / event_timing, from the cache when the row's revision has not
+    moved. The returned document is shared between callers and must not be modified.
+    """
+    row = conn.execute(f"SELECT revision FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    if not row:
+        return None
+    revision = row[0] or 0
+    key = (show_id, column)
+    with _document_cache_lock:
+        cached = _document_cache.get(key)
+        if cached and cached[0] == revision:
+            _document_cache.move_to_end(key)
+            return cached[1]
+
+    data = conn.execute(f"SELECT {column} FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()[0]
+    if not data:
+        return None
+    document = decode_document(data)
+    with _document_cache_lock:
+        _document_cache[key] = (revision, document)
+        _document_cache.move_to_end(key)
+        while len(_document_cache) > DOCUMENT_CACHE_SIZE:
+            _document_cache.popitem(last=False)
+    return document
+
+
+def create_show(conn: sqlite3.Connection, name: str, original_script: str, script_hash: str) -> int:
+    """Insert an uploaded script and return the new show id."""
+    cursor = conn.execute(
+        f"INSERT INTO {TABLE_NAME} (name, original_script, parsed_script, script_hash, status, updated_at) "
+        f"VALUES (?, ?, ?, ?, 'uploaded', ?)",
+        (name, original_script, encode_document({}), script_hash, _now())
+    )
+    return cursor.lastrowid
+
+
+def create_or_find_show(conn: sqlite3.Connection, name: str, original_script: str,
+                        script_hash: str) -> Tuple[int, bool]:
+    """
+    (show id, created) for an uploaded script: a new show, or the one that already holds the
+    same script content. The unique script_hash index settles concurrent uploads of one script.
+    """
+    cursor = conn.execute(
+        f"INSERT INTO {TABLE_NAME} (name, original_script, parsed_script, script_hash, status, updated_at) "
+        f"VALUES (?, ?, ?, ?, 'uploaded', ?) ON CONFLICT DO NOTHING",
+        (name, original_script, encode_document({}), script_hash, _now())
+    )
+    if cursor.rowcount:
+        return cursor.lastrowid, True
+    return find_show_by_script_hash(conn, script_hash), False
+
+
+def find_show_by_script_hash(conn: sqlite3.Connection, script_hash: str) -> Optional[int]:
+    """Id of an existing show with the same script content, or None."""
+    row = conn.execute(
+        f"SELECT id FROM {TABLE_NAME} WHERE script_hash = ? ORDER BY id LIMIT 1", (script_hash,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_original_script(conn: sqlite3.Connection, show_id: int) -> Optional[str]:
+    """Return the uploaded script text, or None if the show does not exist."""
+    row = conn.execute(f"SELECT original_script FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    return row[0] if row else None
+
+
+def get_parsed_script(conn: sqlite3.Connection, show_id: int) -> Optional[dict]:
+    """Return the LLM-parsed script, or None if the show has not been processed."""
+    return _get_document(conn, show_id, "parsed_script")
+
+
+def save_parsed_script(conn: sqlite3.Connection, show_id: int, parsed_script: dict) -> None:
+    conn.execute(
+        f"UPDATE {TABLE_NAME} SET parsed_script = ?, status = 'parsed', updated_at = ?, "
+        f"revision = COALESCE(revision, 0) + 1 WHERE id = ?",
+        (encode_document(parsed_script), _now(), show_id)
+    )
+
+
+def get_event_timing(conn: sqlite3.Connection, show_id: int) -> Optional[dict]:
+    """Return the timing report produced by /analyze-timing, or None."""
+    return _get_document(conn, show_id, "event_timing")
+
+
+def save_event_timing(conn: sqlite3.Connection, show_id: int, event_timing: dict) -> None:
+    """Store the timing report together with its interval-indexed timeline."""
+    conn.execute(
+        f"UPDATE {TABLE_NAME} SET event_timing = ?, timeline = ?, duration = ?, status = 'timed', updated_at = ?, "
+        f"revision = COALESCE(revision, 0) + 1 WHERE id = ?",
+        (encode_document(event_timing), Timeline.from_event_timing(event_timing).to_bytes(),
+         event_timing.get("total_dialogue_duration"), _now(), show_id)
+    )
+
+
+def get_timeline(conn: sqlite3.Connection, show_id: int) -> Optional[Timeline]:
+    """
+    Return the show's timeline, or None if timing has not been analysed. Shows timed
+    before the timeline column existed get theirs built and stored on first read.
+    """
+    row = conn.execute(f"SELECT timeline FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    if row and row[0]:
+        return Timeline.from_bytes(row[0])
+
+    event_timing = get_event_timing(conn, show_id)
+    if not event_timing:
+        return None
+    timeline = Timeline.from_event_timing(event_timing)
+    conn.execute(f"UPDATE {TABLE_NAME} SET timeline = ? WHERE id = ?", (timeline.to_bytes(), show_id))
+    return timeline
+
+
+def get_audio(conn: sqlite3.Connection, show_id: int, audio_type: str) -> Optional[bytes]:
+    """Return the rendered MP3 for one stem (dialogue, music, sfx), or None."""
+    column = _audio_column(audio_type)
+    row = conn.execute(f"SELECT {column} FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    if not row or not row[0]:
+        return None
+    return row[0]
+
+
+def get_audio_with_version(conn: sqlite3.Connection, show_id: int, audio_type: str) -> Optional[tuple]:
+    """(MP3, version, degraded) of one stem, or None. See get_audio_version."""
+    column = _audio_column(audio_type)
+    row = conn.execute(
+        f"SELECT {column}, {column}_hash, {column}_degraded FROM {TABLE_NAME} WHERE id = ?", (show_id,)
+    ).fetchone()
+    if not row or not row[0]:
+        return None
+    return row[0], (row[1], row[2]), row[2]
+
+
+def get_audio_sizes(conn: sqlite3.Connection, show_id: int) -> dict:
+    """audio_type -> MP3 size of the show's rendered stems, without reading the BLOBs."""
+    row = conn.execute(
+        f"SELECT {', '.join(f'{t}_audio_size' for t in AUDIO_TYPES)} FROM {TABLE_NAME} WHERE id = ?", (show_id,)
+    ).fetchone()
+    return {audio_type: size for audio_type, size in zip(AUDIO_TYPES, row or ()) if size}
+
+
+def get_audio_version(conn: sqlite3.Connection, show_id: int, audio_type: str) -> Optional[tuple]:
+    """(hash, degraded) of one stem: a cached copy is current while this is unchanged."""
+    column = _audio_column(audio_type)
+    row = conn.execute(f"SELECT {column}_hash, {column}_degraded FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    return tuple(row) if row else None
+
+
+def get_audio_degraded(conn: sqlite3.Connection, show_id: int, audio_type: str) -> Optional[str]:
+    column = _audio_column(audio_type)
+    row = conn.execute(f"SELECT {column}_degraded FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    return row[0] if row else None
+
+
+def set_audio_degraded(conn: sqlite3.Connection, show_id: int, audio_type: str, degraded: Optional[str]) -> None:
+    """Record what the stem's latest master render was turned into ("draft"), or None when it rendered as asked."""
+    column = _audio_column(audio_type)
+    jobs.check_lease(conn)
+    conn.execute(f"UPDATE {TABLE_NAME} SET {column}_degraded = ? WHERE id = ?", (degraded, show_id))
+    after_commit(conn, lambda: audio_cache.invalidate((show_id, audio_type)))
+
+
+def get_audio_hash(conn: sqlite3.Connection, show_id: int, audio_type: str) -> Optional[str]:
+    column = _audio_column(audio_type)
+    row = conn.execute(f"SELECT {column}_hash FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    return row[0] if row else None
+
+
+def save_audio(conn: sqlite3.Connection, show_id: int, audio_type: str, audio: bytes) -> None:
+    """
+    Store a stem together with its size and hash, so listings never need to read the BLOB.
+    Raises jobs.LeaseLost, before writing anything, when rendered by a worker that lost its job's lease.
+    """
+    column = _audio_column(audio_type)
+    jobs.check_lease(conn)
+    conn.execute(
+        f"UPDATE {TABLE_NAME} SET {column} = ?, {column}_size = ?, {column}_hash = ?, updated_at = ? WHERE id = ?",
+        (audio, len(audio), hashlib.sha256(audio).hexdigest(), _now(), show_id)
+    )
+    stems_rendered = " + ".join(f"({t}_audio_size IS NOT NULL)" for t in AUDIO_TYPES)
+    conn.execute(
+        f"UPDATE {TABLE_NAME} SET status = CASE WHEN {stems_rendered} = {len(AUDIO_TYPES)} "
+        f"THEN 'rendered' ELSE 'rendering' END WHERE id = ?",
+        (show_id,)
+    )
+    # only once the new stem is visible, or a /get-audio miss could cache the old one as current
+    after_commit(conn, lambda: audio_cache.invalidate((show_id, audio_type)))
+
+
+def get_peaks(conn: sqlite3.Connection, show_id: int, audio_type: str) -> Optional[bytes]:
+    """Return the binary waveform peaks stored alongside a stem, or None."""
+    _audio_column(audio_type)
+    column = f"{audio_type}_peaks"
+    row = conn.execute(f"SELECT {column} FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    if not row or not row[0]:
+        return None
+    return row[0]
+
+
+def save_peaks(conn: sqlite3.Connection, show_id: int, audio_type: str, peaks: bytes) -> None:
+    _audio_column(audio_type)
+    conn.execute(f"UPDATE {TABLE_NAME} SET {audio_type}_peaks = ? WHERE id = ?", (peaks, show_id))
+
+
+def show_exists(conn: sqlite3.Connection, show_id: int) -> bool:
+    row = conn.execute(f"SELECT 1 FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()
+    return row is not None
+
+
+def list_shows(conn: sqlite3.Connection, limit: int = 50, after: Optional[int] = None) -> List[dict]:
+    """
+    Lightweight show summaries in id order, starting after the given id (keyset pagination).
+    Only reads the listing columns, which the covering index answers without touching the table.
+    """
+    rows = conn.execute(
+        f"SELECT {', '.join(LISTING_COLUMNS)} FROM {TABLE_NAME} INDEXED BY idx_{TABLE_NAME}_listing "
+        f"WHERE id > ? ORDER BY id LIMIT ?",
+        (after or 0, limit)
+    ).fetchall()
+
+    return [_summary(dict(zip(LISTING_COLUMNS, row))) for row in rows]
+
+
+def get_show(conn: sqlite3.Connection, show_id: int) -> Optional[dict]:
+    """A show's summary plus its script and decoded documents, without any audio."""
+    row = conn.execute(
+        f"SELECT {', '.join(LISTING_COLUMNS)}, original_script FROM {TABLE_NAME} WHERE id = ?", (show_id,)
+    ).fetchone()
+    if not row:
+        return None
+    show = _summary(dict(zip(LISTING_COLUMNS, row)))
+    show["original_script"] = row[-1]
+    show["parsed_script"] = get_parsed_script(conn, show_id)
+    show["event_timing"] = get_event_timing(conn, show_id)
+    return show
+
+
+def _summary(record: dict) -> dict:
+    return {
+        "id": record["id"],
+        "name": record["name"],
+        "status": record["status"] or "uploaded",
+        "duration": record["duration"],
+        "updated_at": record["updated_at"],
+        "stems": {
+            audio_type: {
+                "size": record[f"{audio_type}_audio_size"],
+                "hash": record[f"{audio_type}_audio_hash"],
+            }
+            for audio_type in AUDIO_TYPES
+            if record[f"{audio_type}_audio_size"] is not None
+        },
+    }
@@ -0,0 +1,155 @@
+import hashlib
+import sqlite3
+from database.codec import decode_document
+from database.constants import TABLE_NAME, JOBS_TABLE
+
+# columns added after the original table (created by the frontend upload route)
+ADDED_COLUMNS = {
+    "dialogue_peaks": "BLOB",
+    "music_peaks": "BLOB",
+    "sfx_peaks": "BLOB",
+    # listing metadata, kept up to date by database.repository so /shows never reads BLOBs
+    "status": "TEXT",
+    "updated_at": "TEXT",
+    "duration": "REAL",
+    "dialogue_audio_size": "INTEGER",
+    "dialogue_audio_hash": "TEXT",
+    "music_audio_size": "INTEGER",
+    "music_audio_hash": "TEXT",
+    "sfx_audio_size": "INTEGER",
+    "sfx_audio_hash": "TEXT",
+    "script_hash": "TEXT",  # content hash of original_script, to dedupe uploads
+    "timeline": "BLOB",  # interval-indexed event_timing, see timeline.py
+    "revision": "INTEGER DEFAULT 0",  # bumped on every parsed_script / event_timing write, keys the decode cache
+    # "draft" when the stem's latest master render was turned into a draft for lack of memory (admission.py)
+    "dialogue_audio_degraded": "TEXT",
+    "music_audio_degraded": "TEXT",
+    "sfx_audio_degraded": "TEXT",
+}
+
+LISTING_COLUMNS = (
+    "id", "name", "status", "updated_at", "duration",
+    "dialogue_audio_size", "dialogue_audio_hash",
+    "music_audio_size", "music_audio_hash",
+    "sfx_audio_size", "sfx_audio_hash",
+)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create the shows table if needed and add any columns this backend version relies on."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            original_script TEXT,
+            parsed_script JSON,
+            event_timing JSON,
+            dialogue_audio BLOB,
+            music_audio BLOB,
+            sfx_audio BLOB
+        )
+    """)
+
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+    added = [column for column in ADDED_COLUMNS if column not in existing]
+    for column in added:
+        conn.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {column} {ADDED_COLUMNS[column]}")
+
+    # covering index: the show listing is answered from the index alone, in id order
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_listing ON {TABLE_NAME} ({', '.join(LISTING_COLUMNS)})")
+
+    # render jobs claimed by worker.py processes, see database/jobs.py
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority INTEGER DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            max_attempts INTEGER DEFAULT 3,
+            lease_owner TEXT,
+            lease_token TEXT,
+            lease_expires REAL,
+            result TEXT,
+            error TEXT,
+            created_at REAL,
+            started_at REAL,
+            finished_at REAL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{JOBS_TABLE}_claim ON {JOBS_TABLE} (status, priority, created_at)")
+
+    if "status" in added:
+        backfill_listing_metadata(conn)
+    if "script_hash" in added:
+        for show_id, original_script in conn.execute(f"SELECT id, original_script FROM {TABLE_NAME}").fetchall():
+            if original_script:
+                conn.execute(f"UPDATE {TABLE_NAME} SET script_hash = ? WHERE id = ?",
+                             (script_content_hash(original_script), show_id))
+    ensure_unique_script_hash(conn)
+    conn.commit()
+
+
+def ensure_unique_script_hash(conn: sqlite3.Connection) -> None:
+    """
+    One show per script content, so concurrent uploads of the same script can't both insert.
+    Duplicates stored before the index existed keep their rows, but only the oldest keeps the hash.
+    """
+    index = f"idx_{TABLE_NAME}_script_hash_unique"
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone():
+        return
+    conn.execute(f"DROP INDEX IF EXISTS idx_{TABLE_NAME}_script_hash")
+    conn.execute(
+        f"UPDATE {TABLE_NAME} SET script_hash = NULL WHERE script_hash IS NOT NULL AND id NOT IN "
+        f"(SELECT MIN(id) FROM {TABLE_NAME} WHERE script_hash IS NOT NULL GROUP BY script_hash)"
+    )
+    conn.execute(f"CREATE UNIQUE INDEX {index} ON {TABLE_NAME} (script_hash) WHERE script_hash IS NOT NULL")
+
+
+def script_content_hash(text: str) -> str:
+    """Content hash used to spot the same script uploaded twice, ignoring whitespace differences."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def show_status(has_parsed_script, has_timing, stems_rendered):
+    if stems_rendered == 3:
+        return "rendered"
+    if stems_rendered:
+        return "rendering"
+    if has_timing:
+        return "timed"
+    if has_parsed_script:
+        return "parsed"
+    return "uploaded"
+
+
+def backfill_listing_metadata(conn: sqlite3.Connection) -> None:
+    """One-off pass filling the listing columns for rows written before they existed."""
+    show_ids = [row[0] for row in conn.execute(f"SELECT id FROM {TABLE_NAME}")]
+    for show_id in show_ids:
+        parsed_script, event_timing = conn.execute(
+            f"SELECT parsed_script, event_timing FROM {TABLE_NAME} WHERE id = ?", (show_id,)
+        ).fetchone()
+        updates = {}
+        stems_rendered = 0
+        for audio_type in ("dialogue", "music", "sfx"):
+            audio = conn.execute(f"SELECT {audio_type}_audio FROM {TABLE_NAME} WHERE id = ?", (show_id,)).fetchone()[0]
+            if audio:
+                stems_rendered += 1
+                updates[f"{audio_type}_audio_size"] = len(audio)
+                updates[f"{audio_type}_audio_hash"] = hashlib.sha256(audio).hexdigest()
+
+        try:
+            has_parsed_script = bool(decode_document(parsed_script))
+        except ValueError:
+            has_parsed_script = bool(parsed_script)
+        if event_timing:
+            try:
+                updates["duration"] = decode_document(event_timing).get("total_dialogue_duration")
+            except (TypeError, ValueError):
+                pass
+        updates["status"] = show_status(has_parsed_script, bool(event_timing), stems_rendered)
+
+        assignments = ", ".join(f"{column} = ?" for column in updates)
+        conn.execute(f"UPDATE {TABLE_NAME} SET {assignments} WHERE id = ?", (*updates.values(), show_id))
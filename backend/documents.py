@@ -0,0 +1,54 @@
+import os
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SUPPORTED_EXTENSIONS = (".docx", ".pdf")
+
+
+def extract_docx_text(path: str) -> str:
+    """
+    Raw text of a .docx, one paragraph per block like mammoth's extractRawText.
+    document.xml is parsed incrementally, so large documents are never held as one tree.
+    """
+    paragraphs = []
+    with zipfile.ZipFile(path) as docx:
+        with docx.open("word/document.xml") as document:
+            parts = []
+            for event, element in iterparse(document, events=("end",)):
+                tag = element.tag
+                if tag == f"{WORD_NAMESPACE}t":
+                    parts.append(element.text or "")
+                elif tag == f"{WORD_NAMESPACE}tab":
+                    parts.append("\t")
+                elif tag in (f"{WORD_NAMESPACE}br", f"{WORD_NAMESPACE}cr"):
+                    parts.append("\n")
+                elif tag == f"{WORD_NAMESPACE}p":
+                    paragraphs.append("".join(parts))
+                    parts = []
+                    element.clear()
+    return "".join(f"{paragraph}\n\n" for paragraph in paragraphs)
+
+
+def extract_pdf_text(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ValueError("PDF upload needs the pypdf package (pip install pypdf)")
+
+    reader = PdfReader(path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_document_text(path: str) -> str:
+    """Extract the script text of an uploaded document, with runs of blank lines collapsed."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".docx":
+        text = extract_docx_text(path)
+    elif extension == ".pdf":
+        text = extract_pdf_text(path)
+    else:
+        raise ValueError(f"Unsupported document type '{extension}'. Upload one of: {', '.join(SUPPORTED_EXTENSIONS)}")
+    return re.sub(r"\n{3,}", "\n\n", text)
+
@@ -0,0 +1,94 @@
+"""
+Compare stored size and load time of parsed_script / event_timing documents:
+the old json.dumps text against the database.codec format, and a repeated
+repository read served from the per-process decode cache.
+
+Run from the backend folder:
+    python experiments/bench_codec.py [--scale 50] [--repeat 200]
+
+--scale repeats the sample script's events (and a matching synthetic timing report)
+to stand in for a long show.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import sqlite3
+from database import codec, repository
+from database.schema import ensure_schema
+
+SCRIPT_PATH = "data/scripts/script_1.json"
+
+
+def scaled_documents(scale):
+    with open(SCRIPT_PATH, "r", encoding="utf-8") as f:
+        script = json.load(f)
+    events = script.get("events", []) * scale
+
+    dialogue_timing, sound_effect_timing, t = [], [], 0.0
+    for i, event in enumerate(events):
+        if event.get("type") == "dialogue":
+            duration = 1.5 + len(event.get("line", "")) / 15
+            dialogue_timing.append({
+                "file": f"data/dialogue/{event.get('character', 'narrator')}_{i:06d}.mp3",
+                "start_time": t, "duration": duration, "end_time": t + duration,
+                "character": event.get("character"), "line": event.get("line"), "emotion": event.get("emotion"),
+            })
+            t += duration
+        else:
+            sound_effect_timing.append({
+                "effect": event.get("effect"), "description": event.get("description", ""),
+                "start_time": t, "end_time": t + 10, "duration": 10, "position": "continuous",
+                "crossfade_duration": 2.0, "prev_dialogue": None, "next_dialogue": None,
+            })
+    timing = {"dialogue_timing": dialogue_timing, "sound_effect_timing": sound_effect_timing,
+              "total_dialogue_duration": t, "analysis_timestamp": "2025-01-01T00:00:00"}
+    return {"parsed_script": {**script, "events": events}, "event_timing": timing}
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document storage formats")
+    parser.add_argument("--scale", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"msgpack: {codec.msgpack is not None}, orjson: {codec.orjson is not None}, "
+          f"zstandard: {codec.zstandard is not None}")
+    conn = sqlite3.connect(":memory:")
+    ensure_schema(conn)
+    show_id = repository.create_show(conn, "bench", "", "bench")
+    documents = scaled_documents(args.scale)
+    repository.save_parsed_script(conn, show_id, documents["parsed_script"])
+    repository.save_event_timing(conn, show_id, documents["event_timing"])
+    readers = {"parsed_script": repository.get_parsed_script, "event_timing": repository.get_event_timing}
+
+    for name, document in documents.items():
+        legacy = json.dumps(document)
+        stored = codec.encode_document(document)
+        assert codec.decode_document(stored) == json.loads(legacy)
+
+        legacy_load = best_of(args.repeat, lambda: json.loads(legacy))
+        codec_load = best_of(args.repeat, lambda: codec.decode_document(stored))
+        cached_load = best_of(args.repeat, lambda: readers[name](conn, show_id))
+        print(f"\n{name}")
+        print(f"  json text : {len(legacy):>10,} bytes  load {legacy_load * 1000:8.3f} ms")
+        print(f"  codec     : {len(stored):>10,} bytes  load {codec_load * 1000:8.3f} ms  "
+              f"({len(legacy) / len(stored):.1f}x smaller)")
+        print(f"  repository read, row unchanged (decode cache)        {cached_load * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
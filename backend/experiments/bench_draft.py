@@ -0,0 +1,42 @@
+"""
+Draft vs master render time for each stem of a show. The master stems are re-rendered
+(and stored again), so run it on a show whose stems can be regenerated.
+
+Run from the backend folder:
+    python experiments/bench_draft.py SHOW_ID [--types dialogue sfx music]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import admission
+from audio_generation.create_audio import create_audio
+from database.repository import AUDIO_TYPES
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark draft against master renders")
+    parser.add_argument("show_id", type=int)
+    parser.add_argument("--types", nargs="+", default=list(AUDIO_TYPES), choices=list(AUDIO_TYPES))
+    args = parser.parse_args()
+    admission.RENDER_MEMORY_BUDGET = 0  # measure the paths asked for, not what admission switches to
+
+    for audio_type in args.types:
+        # warm the asset index and music library first, so neither run pays for ingest
+        create_audio(args.show_id, audio_type, quality="draft")
+        draft = timed(create_audio, args.show_id, audio_type, quality="draft")
+        master = timed(create_audio, args.show_id, audio_type)
+        print(f"{audio_type:<9} master {master:7.2f}s  draft {draft:7.2f}s  speed-up {master / draft:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Startup cost of the API process: time to import main.py, peak RSS afterwards, and
+which heavy SDKs got imported on the way.
+
+Each measurement runs in a fresh interpreter. Run from the backend folder:
+    python experiments/bench_startup.py [--repeat 5] [--enabled all "claude,elevenlabs"]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+HEAVY_MODULES = ("torch", "audiocraft", "elevenlabs", "langchain", "langchain_community",
+                 "langchain_anthropic", "langchain_ollama", "openai", "transformers")
+
+PROBE = f"""
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "heavy": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(enabled):
+    env = dict(os.environ, ENABLED_PROVIDERS=enabled)
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API startup time and memory")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--enabled", nargs="+", default=["all"],
+                        help="ENABLED_PROVIDERS settings to compare")
+    args = parser.parse_args()
+
+    for enabled in args.enabled:
+        runs = [measure(enabled) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = statistics.median(run["rss_mb"] for run in runs)
+        heavy = ", ".join(runs[0]["heavy"]) or "none"
+        print(f"ENABLED_PROVIDERS={enabled:<24} import main: {seconds:6.2f}s  peak RSS: {rss:7.1f} MB  "
+              f"SDKs imported: {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Throughput of the TTS backends on a script: every unique line is rendered into a
+fresh temporary folder (so nothing comes from the dialogue cache) and the run reports
+wall time, lines per second and the real-time factor (seconds of speech per second).
+
+Run from the backend folder:
+    python experiments/bench_tts.py [--script data/scripts/script_1.json] [--backends piper elevenlabs]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from audio_generation.assets import get_asset_info
+from audio_generation.tts import get_tts_backend, plan_tts_requests, run_tts_plan, TTS_BACKENDS
+from audio_generation.tts_backends import PiperBackend
+
+
+def bench(backend_name, script_data):
+    backend = get_tts_backend(backend_name)
+    with tempfile.TemporaryDirectory(prefix=f"tts_{backend_name}_") as directory:
+        backend.directory = directory
+        plan = plan_tts_requests(script_data, backend)
+        started = time.perf_counter()
+        stats = run_tts_plan(plan, backend)
+        elapsed = time.perf_counter() - started
+
+        files = {event["file"] for event in plan["events"] if os.path.exists(event["file"])}
+        speech_seconds = sum(get_asset_info(path)["duration"] for path in files)
+    return {
+        "backend": backend_name,
+        "lines": stats["api_calls"],
+        "seconds": elapsed,
+        "lines_per_second": stats["api_calls"] / elapsed if elapsed else 0.0,
+        "real_time_factor": speech_seconds / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TTS backends")
+    parser.add_argument("--script", default="data/scripts/script_1.json")
+    parser.add_argument("--backends", nargs="+", default=["piper"], choices=list(TTS_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=1, help="repeat the script's events to make it longer")
+    args = parser.parse_args()
+
+    with open(args.script, "r", encoding="utf-8") as f:
+        script_data = json.load(f)
+    # numbered copies, so repeats are new lines rather than deduplicated ones
+    script_data["events"] = [
+        {**event, "line": f"{event['line']} ({i + 1})" if i else event["line"]} if event["type"] == "dialogue" else event
+        for i in range(args.repeat) for event in script_data["events"]
+    ]
+
+    try:
+        for backend_name in args.backends:
+            result = bench(backend_name, script_data)
+            print(f"{result['backend']:<12} {result['lines']:>4} lines in {result['seconds']:7.2f}s  "
+                  f"{result['lines_per_second']:6.2f} lines/s  real-time factor {result['real_time_factor']:6.2f}x")
+    finally:
+        PiperBackend.shutdown()
+
+
+if __name__ == "__main__":
+    main()
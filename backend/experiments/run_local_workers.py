@@ -0,0 +1,76 @@
+"""
+Scale-out check for the render queue: queue the same batch of stem renders for 1, 2, 4...
+local worker processes and report how throughput grows.
+
+Every worker runs in its own empty working folder with its own data/ directory, so it
+only has the database and a temporary filesystem artifact store to work from.
+
+Run from the backend folder:
+    python experiments/run_local_workers.py 1 2 --type sfx --quality draft --repeat 4 --workers 1 2 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import artifact_store
+from database.connection import get_connection
+from database import jobs
+
+
+def run(show_ids, audio_type, quality, repeat, workers, store_root):
+    from worker import enqueue_audio_job
+
+    job_ids = [enqueue_audio_job(show_id, audio_type, quality=quality)
+               for _ in range(repeat) for show_id in show_ids]
+    env = dict(os.environ, ARTIFACT_STORE=store_root, PYTHONPATH=BACKEND_DIR)
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="workers_") as machines:
+        processes = []
+        for i in range(workers):
+            machine = os.path.join(machines, f"worker_{i}")
+            os.makedirs(os.path.join(machine, "data"))
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(BACKEND_DIR, "worker.py"), "--id", f"local-{i}",
+                 "--exit-when-idle", "--poll", "0.2"],
+                cwd=machine, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+        for process in processes:
+            process.wait()
+    elapsed = time.perf_counter() - started
+
+    with get_connection() as conn:
+        statuses = [jobs.get_job(conn, job_id)["status"] for job_id in job_ids]
+    done = statuses.count(jobs.DONE)
+    return {"workers": workers, "jobs": len(job_ids), "done": done, "seconds": elapsed,
+            "jobs_per_minute": done / elapsed * 60 if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure render throughput against the number of workers")
+    parser.add_argument("show_ids", type=int, nargs="+")
+    parser.add_argument("--type", default="sfx", choices=["dialogue", "sfx", "music"])
+    parser.add_argument("--quality", default="draft", choices=["master", "draft"])
+    parser.add_argument("--repeat", type=int, default=4, help="times each show's stem is queued")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="artifacts_") as store_root:
+        # the API side publishes inputs into the same stand-in store the workers read from
+        artifact_store.ARTIFACT_STORE = store_root
+        baseline = None
+        for workers in args.workers:
+            result = run(args.show_ids, args.type, args.quality, args.repeat, workers, store_root)
+            baseline = baseline or result["jobs_per_minute"]
+            print(f"{result['workers']:>2} workers: {result['done']}/{result['jobs']} jobs in {result['seconds']:7.1f}s  "
+                  f"{result['jobs_per_minute']:6.1f} jobs/min  "
+                  f"({result['jobs_per_minute'] / baseline if baseline else 0:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Literal
+import hashlib
 import json
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_community.chat_models import ChatOpenAI
-from langchain_ollama import OllamaLLM
-from langchain.schema import HumanMessage, SystemMessage
+from providers import load_provider
+from rate_limit import call_with_rate_limit
+
+LLM_CACHE_DIR = "data/llm_cache"
+
 
 class ScriptRequest(BaseModel):
     script_text: str
@@ -19,18 +20,21 @@ class GenerateAudioRequest(BaseModel):
     script: dict
 
 def get_llm(provider: str, model: str):
-    """Factory function to create the appropriate LLM client."""
+    """Factory function to create the appropriate LLM client. Its SDK is imported on first use."""
     if provider == "openai":
+        ChatOpenAI = load_provider("openai")
         return ChatOpenAI(
             model=model,
             api_key=os.getenv("OPENAI_API_KEY")
         )
     elif provider == "claude":
+        ChatAnthropic = load_provider("claude")
         return ChatAnthropic(
             model=model,  # e.g. "claude-3-opus-20240229"
             anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
         )
     elif provider == "ollama":
+        OllamaLLM = load_provider("ollama")
         return OllamaLLM(
             model=model, 
             base_url="http://localhost:11434"
@@ -38,14 +42,67 @@ def get_llm(provider: str, model: str):
     else:
         raise ValueError(f"Unsupported provider: {provider}")
 
+def _parse_cache_path(script_text: str, provider: str, model: str) -> str:
+    key = hashlib.sha256(f"{provider}\0{model}\0{script_text}".encode("utf-8")).hexdigest()
+    return os.path.join(LLM_CACHE_DIR, f"{key}.json")
+
+
+def _warmed_marker_path(script_text: str, provider: str, model: str) -> str:
+    return _parse_cache_path(script_text, provider, model)[:-len(".json")] + ".warmed"
+
+
+def get_cached_parse(script_text: str, provider: str, model: str):
+    """Previously parsed result for this exact script, provider and model, or None."""
+    try:
+        with open(_parse_cache_path(script_text, provider, model), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _store_cached_parse(script_text: str, provider: str, model: str, parsed: dict) -> None:
+    os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+    path = _parse_cache_path(script_text, provider, model)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(parsed, file)
+    os.replace(tmp_path, path)
+
+
+def warm_parse_cache(script_text: str, provider: str, model: str) -> None:
+    """Parse a freshly uploaded script in the background so the first /process call is a cache hit."""
+    try:
+        parse_script_with_llm(script_text, dummy=False, provider=provider, model=model, use_cache=True)
+        with open(_warmed_marker_path(script_text, provider, model), "w"):
+            pass
+        print(f"🔥 Parse cache warmed for {provider} {model}")
+    except Exception as e:
+        print(f"❌ Parse cache warm-up failed: {e}")
+
+
+def take_warmed_parse(script_text: str, provider: str, model: str):
+    """
+    The parse warm_parse_cache prepared for this script, or None. Each warm-up is used once,
+    so processing the script again asks the LLM again.
+    """
+    try:
+        os.remove(_warmed_marker_path(script_text, provider, model))
+    except FileNotFoundError:
+        return None
+    return get_cached_parse(script_text, provider, model)
+
+
 def parse_script_with_llm(
     script_text: str, 
     dummy: bool = True, 
     provider: str = "openai",
-    model: str = "gpt-4-0125-preview"
+    model: str = "gpt-4-0125-preview",
+    use_cache: bool = False
 ) -> dict:
     """
     Parse an unstructured film script with llms to json structured data.
+    Results are cached per script, provider and model in LLM_CACHE_DIR; with use_cache a
+    cached result is returned instead of asking the LLM again.
     """
     if dummy:
         try:
@@ -56,6 +113,12 @@ def parse_script_with_llm(
         except json.JSONDecodeError as e:
             raise HTTPException(status_code=500, detail=f"Invalid JSON in dummy file: {str(e)}")
 
+    if use_cache:
+        cached = get_cached_parse(script_text, provider, model)
+        if cached is not None:
+            print(f"Using cached parse for {provider} {model}")
+            return cached
+
     system_prompt = "You are an AI that extracts structured data from show scripts."
     
     user_prompt = f"""
@@ -81,19 +144,23 @@ def parse_script_with_llm(
     try:
         load_dotenv()
         llm = get_llm(provider, model)
+        HumanMessage = load_provider(provider, "langchain.schema:HumanMessage")
+        SystemMessage = load_provider(provider, "langchain.schema:SystemMessage")
         
         messages = [
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_prompt)
         ]
         
-        response = llm.invoke(messages)
+        response = call_with_rate_limit(provider, llm.invoke, messages)
         print(response)
 
         # OllamaLLM returns string directly, while others return a message with .content
         response_text = response if isinstance(response, str) else response.content
 
-        return json.loads(response_text)
+        parsed = json.loads(response_text)
+        _store_cached_parse(script_text, provider, model, parsed)
+        return parsed
         
         
     except json.JSONDecodeError as e:
@@ -5,20 +5,47 @@ from audio_generation.music import create_music
 from audio_generation.sfx import create_sfx
 from audio_generation.dialogue import create_dialogue
 from timing import analyze_script_timing
-from llm_parsing import parse_script_with_llm
-from io import BytesIO
+from llm_parsing import parse_script_with_llm, warm_parse_cache, take_warmed_parse
+from documents import extract_document_text, SUPPORTED_EXTENSIONS
 import sqlite3
-from database.constants import TABLE_NAME, DB_FILE
-import json
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from database.connection import get_db, get_connection, pool
+from database.schema import script_content_hash
+from database import repository
+from database.repository import AUDIO_TYPES
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor
 import datetime
-from fastapi.responses import StreamingResponse
-from audio_generation.create_audio import create_audio
+import multiprocessing
+import os
+import shutil
+import uuid
+from fastapi.responses import Response, FileResponse
+from audio_generation.peaks import decode_peaks, select_level, slice_level_blob, DEFAULT_MAX_PEAKS
+from audio_generation.create_audio import create_audio, QUALITIES
+from audio_generation.mixdown import create_mixdown, get_mixdown_path
+from audio_generation.draft import get_draft_path, DRAFT_MEDIA_TYPE
+from timeline import KIND_NAMES
+from providers import is_enabled
+from audio_generation.tts import TTS_BACKENDS
+from audio_generation.tts_backends import PiperBackend
+from pipeline import start_pipeline_run, execute_pipeline_run, PIPELINE_RUNS
+import audio_cache
+import admission
+from admission import admission_stats, submit_render
+from database import jobs
+from worker import enqueue_audio_job, enqueue_mixdown_job
+import warmup
+from warmup import InteractiveWorkMiddleware, start_warmup, WARMUP_AFTER_PARSE
 
 app = FastAPI()
 
+UPLOAD_FOLDER = "data/uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# document extraction is CPU bound, so it runs off the event loop in its own processes
+extract_pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Change this to specific origins in production
@@ -26,6 +53,16 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
 )
+app.add_middleware(InteractiveWorkMiddleware)
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    pool.close_all()
+    extract_pool.shutdown(wait=False)
+    PiperBackend.shutdown()
+    warmup.shutdown()
+    admission.shutdown()
 
 
 class ScriptRequest(BaseModel):
@@ -33,13 +70,85 @@ class ScriptRequest(BaseModel):
     model: str = "llama3"
 
 
+class PipelineRequest(BaseModel):
+    show_ids: List[int]
+    provider: Provider = Provider.OPENAI
+    model: Optional[str] = None
+    dummy: bool = False
+    reparse: bool = False
+    tts_backend: Optional[str] = None
+
+
+@app.post("/upload")
+def upload_script(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    warm: bool = Query(False, description="parse the script in the background so /process is a cache hit"),
+    provider: Provider = Query(Provider.OPENAI),
+    model: Optional[str] = Query(None)
+):
+    """Upload a .docx or .pdf script and create a show from its text. Identical scripts are not stored twice."""
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type. Upload one of: {', '.join(SUPPORTED_EXTENSIONS)}")
+
+    model = model or ModelConfig.get_default_model(provider)
+    if not ModelConfig.is_valid_model(provider, model):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid model for provider {provider}. Available models: {ModelConfig.AVAILABLE_MODELS[provider]}"
+        )
+
+    # sync, so the file copy, the wait for the extraction and the database write run in the threadpool
+    # stream the upload to disk in chunks rather than buffering the whole document
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    upload_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}{extension}")
+    try:
+        with open(upload_path, "wb") as upload:
+            shutil.copyfileobj(file.file, upload, UPLOAD_CHUNK_SIZE)
+
+        text = extract_pool.submit(extract_document_text, upload_path).result()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error processing file: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error processing file")
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="No text found in the uploaded document")
+
+    content_hash = script_content_hash(text)
+    with get_connection() as conn:
+        show_id, created = repository.create_or_find_show(conn, file.filename, text, content_hash)
+
+    if warm:
+        background_tasks.add_task(warm_parse_cache, text, provider.value, model)
+
+    return {
+        "message": "File uploaded and processed successfully" if created else "Script already uploaded",
+        "id": show_id,
+        "duplicate": not created
+    }
+
+
 @app.post("/process/{show_id}")
-async def process_show_script(
+def process_show_script(
     show_id: int,
     dummy: int = Query(0),
     provider: Provider = Query(Provider.OPENAI),
-    model: Optional[str] = Query(None)
+    model: Optional[str] = Query(None),
+    refresh: bool = Query(False, description="re-run the LLM even when /upload?warm=true already parsed this script"),
+    warm: Optional[bool] = Query(None, description="prefetch TTS, SFX and music once parsed; defaults to WARMUP_AFTER_PARSE"),
+    tts_backend: Optional[str] = Query(None, description="TTS backend the warm-up renders with")
 ):
+    # sync, so the LLM call runs in the threadpool; connections are only held around reads and writes
+    if not dummy and not is_enabled(provider.value):
+        raise HTTPException(status_code=400, detail=f"Provider {provider.value} is not enabled on this server")
+    if tts_backend is not None and tts_backend not in TTS_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Invalid TTS backend. Choose from {', '.join(TTS_BACKENDS)}.")
     if model is None:
         model = ModelConfig.get_default_model(provider)
     elif not ModelConfig.is_valid_model(provider, model):
@@ -48,87 +157,75 @@ async def process_show_script(
             detail=f"Invalid model for provider {provider}. Available models: {ModelConfig.AVAILABLE_MODELS[provider]}"
         )
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    try:
-
-        cursor.execute(f"SELECT id, original_script FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-        row = cursor.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="Show not found")
-        
-        script_id, original_script = row
+    with get_connection() as conn:
+        original_script = repository.get_original_script(conn, show_id)
+    if original_script is None:
+        raise HTTPException(status_code=404, detail="Show not found")
 
-        try:
-            print(f'Starting parse of {show_id} with {provider} model {model}')
+    try:
+        print(f'Starting parse of {show_id} with {provider} model {model}')
+        # the parse an /upload?warm=true prepared is used once; any other call asks the LLM
+        processed_script = None if dummy or refresh else take_warmed_parse(original_script, provider.value, model)
+        if processed_script is None:
             processed_script = parse_script_with_llm(
                 original_script,
                 dummy=bool(dummy),
                 provider=provider.value,
                 model=model
             )
-        except Exception as e:
-            print(f"Error processing script: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error processing script: {str(e)}")
-        
-
-        metadata = {
-            **processed_script,
-            "processing_metadata": {
-                "provider": provider.value,
-                "model": model,
-                "processed_at": str(datetime.datetime.now())
-            }
-        }
-        # store the processeed script
+    except Exception as e:
+        print(f"Error processing script: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing script: {str(e)}")
 
-        cursor.execute(
-            f"UPDATE {TABLE_NAME} SET parsed_script = ? WHERE id = ?",
-            (json.dumps(metadata), script_id)
-        )
-        
-        conn.commit()
-        
-        return {
-            "message": "Script processed successfully",
-            "show_id": script_id,
+    metadata = {
+        **processed_script,
+        "processing_metadata": {
             "provider": provider.value,
             "model": model,
-            "processed_script": processed_script
+            "processed_at": str(datetime.datetime.now())
         }
+    }
 
+    # store the processeed script
+    try:
+        with get_connection() as conn:
+            repository.save_parsed_script(conn, show_id, metadata)
     except Exception as e:
         print(f"Database error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing script: {str(e)}")
-    finally:
-        conn.close()
+
+    if warm or (warm is None and WARMUP_AFTER_PARSE):
+        # runs on the warm-up thread, not as a background task, so it yields to this very request
+        start_warmup(show_id, processed_script, tts_backend)
+
+    return {
+        "message": "Script processed successfully",
+        "show_id": show_id,
+        "provider": provider.value,
+        "model": model,
+        "processed_script": processed_script
+    }
 
 @app.post("/analyze-timing/{show_id}")
-async def analyze_timing(show_id: int):
+def analyze_timing(
+    show_id: int,
+    tts_backend: Optional[str] = Query(None, description="elevenlabs or piper; defaults to TTS_BACKEND")
+):
     """Analyze timing for dialogue and sound effects for a show and store in database."""
-    
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    if tts_backend is not None and tts_backend not in TTS_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Invalid TTS backend. Choose from {', '.join(TTS_BACKENDS)}.")
 
-    try:
-        cursor.execute(f"SELECT parsed_script FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-        row = cursor.fetchone()
-        
-        if not row or not row[0]:
-            raise HTTPException(status_code=404, detail="Parsed script not found for this show_id")
+    with get_connection() as conn:
+        parsed_script = repository.get_parsed_script(conn, show_id)
+    if not parsed_script:
+        raise HTTPException(status_code=404, detail="Parsed script not found for this show_id")
 
-        parsed_script = json.loads(row[0])
+    try:
+        timing_report = analyze_script_timing(parsed_script, tts_backend)
 
-        timing_report = analyze_script_timing(parsed_script)
-        
         # update show record with timing info
-
-        cursor.execute(
-            f"UPDATE {TABLE_NAME} SET event_timing = ? WHERE id = ?",
-            (json.dumps(timing_report), show_id)
-        )
-        conn.commit()
+        with get_connection() as conn:
+            repository.save_event_timing(conn, show_id, timing_report)
 
         return {
             "message": "Timing analysis completed successfully",
@@ -139,59 +236,293 @@ async def analyze_timing(show_id: int):
     except Exception as e:
         print(f"Error analyzing timing: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing timing: {str(e)}")
-    
-    finally:
-        conn.close()
 
 @app.post("/generate-audio/{show_id}")
-async def generate_audio(background_tasks: BackgroundTasks, show_id: int, type: str = Query("dialogue")):
-    if type not in ["dialogue", "music", "sfx"]:
+def generate_audio(
+    show_id: int,
+    type: str = Query("dialogue"),
+    parallel: bool = Query(False, description="render dialogue/sfx in time slices across a process pool"),
+    quality: str = Query("master", description="draft renders a quick low-rate Opus preview"),
+    queue: bool = Query(False, description="hand the render to the worker.py processes instead of this server")
+):
+    if type not in AUDIO_TYPES:
         raise HTTPException(status_code=400, detail="Invalid audio type. Choose from dialogue, music, or sfx.")
+    if quality not in QUALITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid quality. Choose from {', '.join(QUALITIES)}.")
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute(f"SELECT parsed_script FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-    row = cursor.fetchone()
-    conn.close()
-
-    if not row or not row[0]:
+    with get_connection() as conn:
+        parsed_script = repository.get_parsed_script(conn, show_id)
+    if not parsed_script:
         raise HTTPException(status_code=404, detail="Parsed script not found for this show_id")
 
-    parsed_script = json.loads(row[0])
+    if queue:
+        # sync endpoint: publishing the inputs hashes files, so it runs in the threadpool, not on the event loop
+        job_id = enqueue_audio_job(show_id, type, parallel, quality)
+        return {"message": f"{type} generation queued", "show_id": show_id, "job_id": job_id}
 
-    # run audio generation as a background task
-    background_tasks.add_task(create_audio, show_id, type)
+    # run audio generation on the render threads, so a render queued for memory holds none of the request threads
+    submit_render(create_audio, show_id, type, parallel, quality)
 
     return {"message": f"{type} generation started", "show_id": show_id}
 
 
+@app.get("/shows")
+async def list_shows(
+    limit: int = Query(50, gt=0, le=500),
+    after: Optional[int] = Query(None, description="id of the last show on the previous page"),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    """Paginated show summaries (no scripts or audio) for the sidebar."""
+    shows = repository.list_shows(conn, limit=limit, after=after)
+    next_cursor = shows[-1]["id"] if len(shows) == limit else None
+    return {"shows": shows, "next_cursor": next_cursor}
+
+
+@app.get("/shows/{show_id}")
+async def get_show(show_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    """One show with its script, parsed script and timing decoded, for the show page (no audio)."""
+    show = repository.get_show(conn, show_id)
+    if not show:
+        raise HTTPException(status_code=404, detail="Show not found")
+    return show
+
+
 @app.get("/get-audio/{show_id}")
-async def get_audio(show_id: int, type: str = Query("dialogue")):
-    """Endpoint to retrieve the MP3 audio for a show (dialogue, music, sfx)."""
-    if type not in ["dialogue", "music", "sfx"]:
+def get_audio(show_id: int, type: str = Query("dialogue"), quality: str = Query("master")):
+    """
+    Endpoint to retrieve the MP3 audio for a show (dialogue, music, sfx).
+    Served from the in-process audio cache - concurrent requests for a stem that is not
+    cached yet share one database read, and hits don't touch the database at all.
+    quality=draft returns the Opus draft from data/drafts. When the latest master render was
+    turned into a draft for lack of memory, the X-Render-Degraded header (or the 404) says so;
+    the flag is cached with the stem.
+    """
+    if type not in AUDIO_TYPES:
         raise HTTPException(status_code=400, detail="Invalid audio type. Choose from dialogue, music, or sfx.")
+    if quality not in QUALITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid quality. Choose from {', '.join(QUALITIES)}.")
+    if quality == "draft":
+        return _draft_response(show_id, type)
+
+    def load():
+        with get_connection() as conn:
+            return repository.get_audio_with_version(conn, show_id, type)
+
+    def current_version():
+        with get_connection() as conn:
+            return repository.get_audio_version(conn, show_id, type)
+
+    audio, degraded = audio_cache.get_audio((show_id, type), load, current_version)
+    if not audio:
+        with get_connection() as conn:
+            degraded = repository.get_audio_degraded(conn, show_id, type)
+        detail = f"{type} audio not found for this show_id"
+        if degraded:
+            detail += "; it was over the render memory budget and rendered as a draft (quality=draft)"
+        raise HTTPException(status_code=404, detail=detail)
+
+    headers = {"Content-Disposition": f'inline; filename="show_{show_id}_{type}.mp3"'}
+    if degraded:
+        headers["X-Render-Degraded"] = degraded  # this is an older master; the latest render is a draft
+    return Response(audio, media_type="audio/mpeg", headers=headers)
+
+
+def _draft_response(show_id, audio_type):
+    path = get_draft_path(show_id, audio_type)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"No {audio_type} draft for this show_id")
+    return FileResponse(path, media_type=DRAFT_MEDIA_TYPE, filename=os.path.basename(path))
+
+
+@app.post("/mixdown/{show_id}")
+def generate_mixdown(
+    show_id: int,
+    quality: str = Query("master"),
+    queue: bool = Query(False, description="hand the mixdown to the worker.py processes")
+):
+    """Mix the rendered stems (or with quality=draft, the draft stems) into one file."""
+    if quality not in QUALITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid quality. Choose from {', '.join(QUALITIES)}.")
+    if queue:
+        job_id = enqueue_mixdown_job(show_id, quality)
+        return {"message": "mixdown queued", "show_id": show_id, "quality": quality, "job_id": job_id}
+    submit_render(create_mixdown, show_id, quality)
+    return {"message": "mixdown started", "show_id": show_id, "quality": quality}
+
+
+@app.get("/mixdown/{show_id}")
+async def get_mixdown(show_id: int, quality: str = Query("master")):
+    if quality not in QUALITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid quality. Choose from {', '.join(QUALITIES)}.")
+    if quality == "draft":
+        return _draft_response(show_id, "full_show")
+    path = get_mixdown_path(show_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No mixdown for this show_id")
+    return FileResponse(path, media_type="audio/mpeg", filename=os.path.basename(path))
+
+
+@app.get("/jobs/{job_id}")
+async def get_render_job(job_id: str, conn: sqlite3.Connection = Depends(get_db)):
+    """Status of a job queued with queue=true."""
+    job = jobs.get_job(conn, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/metrics/jobs")
+async def get_job_metrics(conn: sqlite3.Connection = Depends(get_db)):
+    """Jobs per status in the render queue, and how many workers hold a live lease."""
+    return jobs.queue_stats(conn)
+
+
+@app.get("/warmup/{show_id}")
+async def get_warmup(show_id: int):
+    """Progress of the show's latest cache warm-up."""
+    status = warmup.WARMUPS.get(show_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No warm-up for this show_id")
+    return {"show_id": show_id, "interactive_requests": warmup.interactive_requests(), **status}
+
+
+@app.get("/metrics/render-memory")
+async def get_render_memory_metrics():
+    """Memory budget of this server's renders: estimated usage, what is running and how many wait."""
+    return admission_stats()
+
+
+@app.get("/metrics/audio-cache")
+async def get_audio_cache_metrics():
+    """Hit rate, coalesced requests and size of the /get-audio cache in this process."""
+    return audio_cache.cache_stats()
+
+
+@app.get("/peaks/{show_id}")
+async def get_peaks(
+    show_id: int,
+    type: str = Query("dialogue"),
+    format: str = Query("json"),
+    max_peaks: int = Query(DEFAULT_MAX_PEAKS, gt=0),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    """
+    Waveform peaks of a stem at the finest resolution with at most max_peaks points.
+    format=json returns interleaved min/max values in [-1, 1] that WaveSurfer can draw
+    directly, format=binary returns the same level as compact int8 pairs.
+    """
+    if type not in AUDIO_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid audio type. Choose from dialogue, music, or sfx.")
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="Invalid format. Choose from json or binary.")
+
+    blob = repository.get_peaks(conn, show_id, type)
+    if not blob:
+        raise HTTPException(status_code=404, detail=f"{type} peaks not found for this show_id")
+
+    peaks = decode_peaks(blob)
+    level = select_level(peaks, max_peaks)
+
+    if format == "binary":
+        return Response(
+            slice_level_blob(blob, level["samples_per_peak"]),
+            media_type="application/octet-stream",
+            headers={"Cache-Control": "no-cache"}
+        )
+
+    return {
+        "show_id": show_id,
+        "type": type,
+        "sample_rate": peaks["sample_rate"],
+        "duration": peaks["total_samples"] / peaks["sample_rate"],
+        "samples_per_peak": level["samples_per_peak"],
+        "data": [round(value / 127, 3) for value in level["data"].tolist()],
+    }
+
+
+@app.get("/timeline/{show_id}")
+async def get_timeline(
+    show_id: int,
+    format: str = Query("json"),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    """
+    The show's dialogue and sound effect intervals. format=json returns the columns and
+    interval tree arrays the player searches on seek, format=binary the stored blob.
+    """
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="Invalid format. Choose from json or binary.")
+
+    timeline = repository.get_timeline(conn, show_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Timing not found for this show_id")
+
+    if format == "binary":
+        return Response(timeline.to_bytes(), media_type="application/octet-stream")
+    return {"show_id": show_id, **timeline.to_json()}
+
+
+@app.get("/timeline/{show_id}/active")
+async def get_active_events(
+    show_id: int,
+    t: float = Query(..., description="time in seconds"),
+    until: Optional[float] = Query(None, description="end of a window; events overlapping [t, until) are returned"),
+    kind: Optional[str] = Query(None),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    """Events playing at time t, or overlapping the window [t, until)."""
+    if kind is not None and kind not in KIND_NAMES:
+        raise HTTPException(status_code=400, detail=f"Invalid kind. Choose from {', '.join(KIND_NAMES)}.")
+
+    timeline = repository.get_timeline(conn, show_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Timing not found for this show_id")
+
+    kind_id = KIND_NAMES.index(kind) if kind is not None else None
+    events = timeline.active_at(t, kind_id) if until is None else timeline.in_window(t, until, kind_id)
+    return {"show_id": show_id, "events": [event.to_dict() for event in events]}
+
+
+@app.post("/pipeline")
+async def start_pipeline(request: PipelineRequest, background_tasks: BackgroundTasks):
+    """Parse, time, render and mix down a batch of shows (e.g. a season) as one job."""
+    if not request.show_ids:
+        raise HTTPException(status_code=400, detail="show_ids must not be empty")
+    if not request.dummy and not is_enabled(request.provider.value):
+        raise HTTPException(status_code=400, detail=f"Provider {request.provider.value} is not enabled on this server")
+
+    if request.tts_backend is not None and request.tts_backend not in TTS_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Invalid TTS backend. Choose from {', '.join(TTS_BACKENDS)}.")
+
+    model = request.model or ModelConfig.get_default_model(request.provider)
+    if not ModelConfig.is_valid_model(request.provider, model):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid model for provider {request.provider}. Available models: {ModelConfig.AVAILABLE_MODELS[request.provider]}"
+        )
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    column_name = f"{type}_audio"  # Fetch from dynamic column name
+    run_id = start_pipeline_run(request.show_ids)
+    background_tasks.add_task(
+        execute_pipeline_run, run_id, request.show_ids,
+        provider=request.provider.value, model=model, dummy=request.dummy, reparse=request.reparse,
+        tts_backend=request.tts_backend
+    )
 
-    cursor.execute(f"SELECT {column_name} FROM {TABLE_NAME} WHERE id = ?", (show_id,))
-    row = cursor.fetchone()
-    conn.close()
+    return {"message": "Pipeline started", "run_id": run_id, "show_ids": request.show_ids}
 
-    if not row or not row[0]:
-        raise HTTPException(status_code=404, detail=f"{type} audio not found for this show_id")
 
-    # Convert BLOB data back to an MP3 file stream
-    audio_stream = BytesIO(row[0])
-    
-    return StreamingResponse(audio_stream, media_type="audio/mpeg", headers={"Content-Disposition": f'inline; filename="show_{show_id}_{type}.mp3"'})
+@app.get("/pipeline/{run_id}")
+async def get_pipeline_run(run_id: str):
+    """Return the status and throughput report of a pipeline run."""
+    run = PIPELINE_RUNS.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Pipeline run not found")
+    return {"run_id": run_id, **run}
 
 
 @app.get("/llm-config")
 async def get_llm_config():
-    """Return available providers and their models"""
+    """Return the providers enabled on this server and their models"""
     return {
         "providers": [
             {
@@ -201,5 +532,6 @@ async def get_llm_config():
                 "defaultModel": ModelConfig.DEFAULT_MODELS[provider]
             }
             for provider in Provider
+            if is_enabled(provider.value)
         ]
     }
@@ -0,0 +1,292 @@
+"""
+Batch pipeline for rendering many shows (e.g. a whole season) in one go.
+
+Each show runs parse -> timing -> stems -> mixdown. The steps are scheduled as a
+DAG across all shows, so one episode's stems render while another is still being
+parsed. TTS lines and sound effects that appear in several episodes are
+generated once and shared.
+
+Usage:
+    python pipeline.py 1 2 3 --provider openai
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+from database.connection import get_connection
+from database import repository
+from database.repository import AUDIO_TYPES
+from llm_config import Provider, ModelConfig
+from llm_parsing import parse_script_with_llm
+from timing import analyze_script_timing
+from audio_generation.tts import plan_tts_requests, run_tts_plan, generate_tts, get_tts_backend, TTS_BACKENDS
+from audio_generation.sfx import validate_sound_effects, generate_ai_sfx, SFXModel
+from audio_generation.create_audio import create_audio
+from audio_generation.mixdown import create_mixdown
+from rate_limit import run_in_lane, BATCH
+
+IO_WORKERS = int(os.getenv("PIPELINE_IO_WORKERS", "8"))
+CPU_WORKERS = int(os.getenv("PIPELINE_CPU_WORKERS", str(os.cpu_count() or 1)))
+
+# reports of pipeline runs started through the API, keyed by run id
+PIPELINE_RUNS: Dict[str, dict] = {}
+
+
+class Task:
+    """A node in the pipeline DAG."""
+
+    def __init__(self, key, fn, args=(), deps=(), pool="io", show_ids=(), on_done=None):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.deps = set(deps)
+        self.pool = pool  # "io" for network bound work, "cpu" for audio rendering
+        self.show_ids = set(show_ids)
+        self.on_done: Optional[Callable] = on_done
+
+
+class PipelineRunner:
+    """
+    Runs a DAG of Tasks on a thread pool (API calls) and a process pool (rendering).
+    Tasks are keyed, so adding a task that already exists only records the extra
+    show depending on it - this is how shared TTS lines and SFX are deduplicated.
+    A task's on_done callback may add further tasks once its result is known.
+    Tasks call the external APIs in the runner's rate limit lane (batch by default),
+    so they queue behind requests from the UI.
+    """
+
+    def __init__(self, io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS, lane=BATCH):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.lane = lane
+        self.tasks: Dict[str, Task] = {}
+        self.done = set()
+        self.failed: Dict[str, str] = {}
+        self.show_errors: Dict[int, str] = {}
+        self.deduped = 0
+
+    def add(self, task: Task):
+        existing = self.tasks.get(task.key)
+        if existing:
+            existing.show_ids |= task.show_ids
+            self.deduped += 1
+            return existing
+        self.tasks[task.key] = task
+        return task
+
+    def _ready(self, pending):
+        ready = []
+        for key in list(pending):
+            task = self.tasks[key]
+            blocked = [dep for dep in task.deps if dep in self.failed]
+            if blocked:
+                self._fail(task, f"dependency {blocked[0]} failed")
+                pending.discard(key)
+            elif task.deps <= self.done:
+                ready.append(task)
+                pending.discard(key)
+        return ready
+
+    def _fail(self, task, error):
+        self.failed[task.key] = error
+        for show_id in task.show_ids:
+            self.show_errors.setdefault(show_id, f"{task.key}: {error}")
+
+    def run(self):
+        # spawn rather than fork so render processes never inherit pooled SQLite connections
+        context = multiprocessing.get_context("spawn")
+        with ThreadPoolExecutor(self.io_workers) as io_pool, \
+                ProcessPoolExecutor(self.cpu_workers, mp_context=context) as cpu_pool:
+            pools = {"io": io_pool, "cpu": cpu_pool}
+            running = {}
+            while True:
+                pending = {key for key in self.tasks if key not in self.done and key not in self.failed
+                           and key not in running.values()}
+                for task in self._ready(pending):
+                    future = pools[task.pool].submit(run_in_lane, self.lane, task.fn, *task.args)
+                    running[future] = task.key
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = self.tasks[running.pop(future)]
+                    try:
+                        result = future.result()
+                        if task.on_done:
+                            task.on_done(result)
+                        self.done.add(task.key)
+                    except Exception as e:
+                        print(f"❌ Pipeline task {task.key} failed: {str(e)}")
+                        self._fail(task, str(e))
+
+
+def parse_show(show_id, provider, model, dummy=False, use_cache=True):
+    """Parse a show's script with the LLM and store it, like POST /process."""
+    with get_connection() as conn:
+        original_script = repository.get_original_script(conn, show_id)
+
+    if original_script is None:
+        raise ValueError(f"Show {show_id} not found")
+
+    processed_script = parse_script_with_llm(original_script, dummy=dummy, provider=provider, model=model,
+                                             use_cache=use_cache)
+    metadata = {
+        **processed_script,
+        "processing_metadata": {
+            "provider": provider,
+            "model": model,
+            "processed_at": str(datetime.datetime.now())
+        }
+    }
+    with get_connection() as conn:
+        repository.save_parsed_script(conn, show_id, metadata)
+    return metadata
+
+
+def analyze_show_timing(show_id, parsed_script, tts_backend=None):
+    """Run timing analysis for a show and store it, like POST /analyze-timing."""
+    timing_report = analyze_script_timing(parsed_script, tts_backend)
+    with get_connection() as conn:
+        repository.save_event_timing(conn, show_id, timing_report)
+    return timing_report
+
+
+def run_pipeline(
+    show_ids: List[int],
+    provider: str = Provider.OPENAI.value,
+    model: Optional[str] = None,
+    dummy: bool = False,
+    reparse: bool = False,
+    sfx_model: SFXModel = SFXModel.ELEVENLABS_API,
+    tts_backend: Optional[str] = None,
+) -> dict:
+    """
+    Render every show in show_ids end to end and return a throughput report.
+    Shows that already have a parsed script are not re-parsed unless reparse is set, which
+    also bypasses the LLM parse cache.
+    """
+    model = model or ModelConfig.get_default_model(Provider(provider))
+    backend = get_tts_backend(tts_backend)
+    runner = PipelineRunner()
+    started = time.time()
+
+    def add_timing_stage(show_id, parsed_script):
+        tts_keys = []
+        plan = plan_tts_requests(parsed_script, backend)
+        if backend.batched:
+            # a local engine renders the whole plan in batches on its own process pool
+            key = f"tts:{backend.name}:{show_id}"
+            tts_keys.append(key)
+            runner.add(Task(key, run_tts_plan, args=(plan,), show_ids=[show_id]))
+        else:
+            for requests in plan["by_voice"].values():
+                for request in requests:
+                    key = f"tts:{request['file']}"
+                    tts_keys.append(key)
+                    runner.add(Task(
+                        key, generate_tts,
+                        args=(request["line"], request["character"], request["voice"], request["emotion"],
+                              request["previous_text"], request["next_text"]),
+                        show_ids=[show_id],
+                    ))
+
+        runner.add(Task(
+            f"timing:{show_id}", analyze_show_timing, args=(show_id, parsed_script, backend.name),
+            deps=tts_keys, pool="cpu", show_ids=[show_id],
+            on_done=lambda timing_report: add_render_stage(show_id, timing_report),
+        ))
+
+    def add_render_stage(show_id, timing_report):
+        sfx_keys = []
+        for effect in validate_sound_effects(timing_report.get("sound_effect_timing", [])):
+            key = f"sfx:{effect}"
+            sfx_keys.append(key)
+            runner.add(Task(key, generate_ai_sfx, args=([effect], sfx_model), show_ids=[show_id]))
+
+        stem_keys = []
+        for audio_type in AUDIO_TYPES:
+            key = f"{audio_type}:{show_id}"
+            stem_keys.append(key)
+            runner.add(Task(
+                key, create_audio, args=(show_id, audio_type),
+                deps=sfx_keys if audio_type == "sfx" else (), pool="cpu", show_ids=[show_id],
+            ))
+
+        runner.add(Task(
+            f"mixdown:{show_id}", create_mixdown, args=(show_id,),
+            deps=stem_keys, pool="cpu", show_ids=[show_id],
+        ))
+
+    for show_id in show_ids:
+        parsed_script = None
+        if not reparse:
+            with get_connection() as conn:
+                parsed_script = repository.get_parsed_script(conn, show_id)
+
+        if parsed_script and parsed_script.get("events"):
+            add_timing_stage(show_id, parsed_script)
+        else:
+            runner.add(Task(
+                f"parse:{show_id}", parse_show, args=(show_id, provider, model, dummy, not reparse), show_ids=[show_id],
+                on_done=lambda parsed, show_id=show_id: add_timing_stage(show_id, parsed),
+            ))
+
+    runner.run()
+
+    elapsed = time.time() - started
+    completed = [show_id for show_id in show_ids if f"mixdown:{show_id}" in runner.done]
+    report = {
+        "show_ids": show_ids,
+        "completed": completed,
+        "failed": runner.show_errors,
+        "tasks_run": len(runner.done),
+        "tasks_deduplicated": runner.deduped,
+        "elapsed_seconds": round(elapsed, 2),
+        "episodes_per_hour": round(len(completed) / (elapsed / 3600), 2) if elapsed > 0 else 0.0,
+    }
+    print(f"\n📦 Pipeline finished: {len(completed)}/{len(show_ids)} shows in {elapsed:.1f}s "
+          f"({report['episodes_per_hour']} episodes/hour, {runner.deduped} shared tasks deduplicated)")
+    return report
+
+
+def start_pipeline_run(show_ids) -> str:
+    """Register a run so its progress can be polled from the API."""
+    run_id = uuid.uuid4().hex
+    PIPELINE_RUNS[run_id] = {"status": "queued", "show_ids": show_ids}
+    return run_id
+
+
+def execute_pipeline_run(run_id, show_ids, **kwargs):
+    PIPELINE_RUNS[run_id]["status"] = "running"
+    try:
+        report = run_pipeline(show_ids, **kwargs)
+        PIPELINE_RUNS[run_id] = {"status": "completed", **report}
+    except Exception as e:
+        print(f"❌ Pipeline run {run_id} failed: {str(e)}")
+        PIPELINE_RUNS[run_id] = {"status": "failed", "show_ids": show_ids, "error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a batch of shows end to end.")
+    parser.add_argument("show_ids", type=int, nargs="+")
+    parser.add_argument("--provider", default=Provider.OPENAI.value, choices=[p.value for p in Provider])
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--dummy", action="store_true", help="use the dummy parsed script instead of the LLM")
+    parser.add_argument("--reparse", action="store_true", help="re-parse shows that already have a parsed script")
+    parser.add_argument("--tts-backend", default=None, choices=list(TTS_BACKENDS),
+                        help="TTS engine for dialogue (defaults to TTS_BACKEND)")
+    args = parser.parse_args()
+
+    run_pipeline(args.show_ids, provider=args.provider, model=args.model, dummy=args.dummy, reparse=args.reparse,
+                 tts_backend=args.tts_backend)
+
+
+if __name__ == "__main__":
+    main()
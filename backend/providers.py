@@ -0,0 +1,82 @@
+"""
+Registry of the external model backends: LLMs for parsing, TTS and SFX generation.
+
+Nothing here imports a backend's SDK. Each provider names the module it lives in and
+is imported on first use, so the API process (and every worker) only pays for the
+providers a request actually touches - audiocraft alone pulls in torch.
+
+ENABLED_PROVIDERS limits a deployment to some providers, e.g.
+    ENABLED_PROVIDERS=claude,elevenlabs
+Unset (or "all") enables every provider.
+"""
+import importlib
+import os
+import threading
+
+LLM = "llm"
+TTS = "tts"
+SFX = "sfx"
+
+# name -> kinds of work it does, and its default "module:attribute"
+PROVIDERS = {
+    "openai": {"kinds": (LLM,), "symbol": "langchain_community.chat_models:ChatOpenAI"},
+    "claude": {"kinds": (LLM,), "symbol": "langchain_anthropic:ChatAnthropic"},
+    "ollama": {"kinds": (LLM,), "symbol": "langchain_ollama:OllamaLLM"},
+    "elevenlabs": {"kinds": (TTS, SFX), "symbol": "elevenlabs.client:ElevenLabs"},
+    "audiocraft": {"kinds": (SFX,), "symbol": "audiocraft.models:AudioGen"},
+    "piper": {"kinds": (TTS,), "symbol": "piper.voice:PiperVoice"},
+}
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def _enabled_names():
+    setting = os.getenv("ENABLED_PROVIDERS", "").strip().lower()
+    if not setting or setting == "all":
+        return set(PROVIDERS)
+    names = {name.strip() for name in setting.split(",") if name.strip()}
+    unknown = names - set(PROVIDERS)
+    if unknown:
+        print(f"⚠️ Unknown providers in ENABLED_PROVIDERS: {', '.join(sorted(unknown))}")
+    return names & set(PROVIDERS)
+
+
+def is_enabled(name):
+    return name in _enabled_names()
+
+
+def enabled_providers(kind=None):
+    """Enabled provider names, optionally only those doing one kind of work (LLM, TTS, SFX)."""
+    return [name for name, provider in PROVIDERS.items()
+            if name in _enabled_names() and (kind is None or kind in provider["kinds"])]
+
+
+def load_provider(name, symbol=None):
+    """
+    Import and return an attribute of a provider's SDK, e.g. load_provider("elevenlabs") for the
+    client class or load_provider("elevenlabs", "elevenlabs:save"). Raises ValueError if the
+    provider is unknown or disabled in this deployment.
+    """
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown provider: {name}")
+    if not is_enabled(name):
+        raise ValueError(f"Provider '{name}' is not enabled (ENABLED_PROVIDERS={os.getenv('ENABLED_PROVIDERS')})")
+
+    symbol = symbol or PROVIDERS[name]["symbol"]
+    loaded = _loaded.get(symbol)
+    if loaded is not None:
+        return loaded
+
+    module_name, attribute = symbol.split(":")
+    with _load_lock:
+        if symbol not in _loaded:
+            module = importlib.import_module(module_name)
+            _loaded[symbol] = getattr(module, attribute)
+            print(f"📦 Loaded {symbol} for provider {name}")
+    return _loaded[symbol]
+
+
+def loaded_symbols():
+    """Which provider symbols this process has imported so far."""
+    return sorted(_loaded)
@@ -0,0 +1,264 @@
+"""
+Rate limiting for the external APIs (ElevenLabs TTS and SFX, the LLM providers),
+shared by every process on the machine through a small SQLite store.
+
+Each provider + API key has
+- a token bucket (requests per second with a burst),
+- a concurrency limit, held as leases that expire if their process dies,
+- a pause: a 429 blocks the key for every process until its Retry-After has passed
+  and halves the bucket's rate, which then recovers a little with every success.
+
+Callers waiting on the same key are served by priority lane - interactive requests
+from the UI before batch pipeline work before background prefetching. The lane is a
+context variable, set with `priority_lane(...)`.
+
+Limits can be overridden per provider, e.g. RATE_LIMIT_ELEVENLABS="rate=3,burst=6,concurrency=5".
+"""
+import contextvars
+import datetime
+import email.utils
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "data/rate_limits.db")
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") != "0"
+
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+LANE_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+# requests per second, burst size, concurrent requests
+DEFAULT_LIMITS = {
+    "elevenlabs": {"rate": 2.0, "burst": 4, "concurrency": 4},
+    "openai": {"rate": 1.0, "burst": 3, "concurrency": 4},
+    "claude": {"rate": 0.5, "burst": 2, "concurrency": 2},
+    "ollama": {"rate": 100.0, "burst": 100, "concurrency": 1},  # local: one generation at a time
+}
+API_KEY_ENV = {"elevenlabs": "ELEVENLABS_API_KEY", "openai": "OPENAI_API_KEY", "claude": "ANTHROPIC_API_KEY"}
+
+LEASE_SECONDS = 600  # a lease outlives any single call; it only matters if a process dies holding it
+WAITER_STALE_SECONDS = 5  # a waiter that stopped polling no longer holds back lower lanes
+POLL_SECONDS = 0.25
+MIN_RATE_FRACTION = 0.05  # adaptive rate never drops below 5% of the configured rate
+RECOVERY_FRACTION = 0.05  # each success gives back 5% of the configured rate
+MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 2.0
+
+_lane = contextvars.ContextVar("rate_limit_lane", default=INTERACTIVE)
+_local = threading.local()
+
+
+class RateLimited(Exception):
+    """Raised by a wrapped call that was still throttled after MAX_RETRIES attempts."""
+
+
+@contextmanager
+def priority_lane(lane):
+    """Run the calls made inside the block in a priority lane (INTERACTIVE, BATCH or BACKGROUND)."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane():
+    return _lane.get()
+
+
+def run_in_lane(lane, fn, *args, **kwargs):
+    """fn(*args) in a lane - for executor workers, which don't inherit the caller's context."""
+    with priority_lane(lane):
+        return fn(*args, **kwargs)
+
+
+def limits_for(provider):
+    limits = dict(DEFAULT_LIMITS.get(provider, {"rate": 1.0, "burst": 1, "concurrency": 1}))
+    override = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+    if override:
+        for part in override.split(","):
+            name, _, value = part.partition("=")
+            if name.strip() in limits:
+                limits[name.strip()] = float(value)
+    return limits
+
+
+def _limit_key(provider, api_key=None):
+    api_key = api_key if api_key is not None else os.getenv(API_KEY_ENV.get(provider, ""), "")
+    fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12] if api_key else "default"
+    return f"{provider}:{fingerprint}"
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        os.makedirs(os.path.dirname(RATE_LIMIT_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(RATE_LIMIT_DB, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY, tokens REAL, rate REAL, updated REAL, blocked_until REAL)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS leases (
+            id TEXT PRIMARY KEY, key TEXT, lane INTEGER, expires REAL)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS waiters (
+            id TEXT PRIMARY KEY, key TEXT, lane INTEGER, heartbeat REAL)""")
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """An immediate (write-locked) transaction, so check-and-take is atomic across processes."""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _try_acquire(conn, key, limits, lane, waiter_id, cost, now):
+    """Take a token and a lease if this caller may go now. Returns (lease_id, None) or (None, seconds to wait)."""
+    conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+    conn.execute("DELETE FROM waiters WHERE heartbeat < ?", (now - WAITER_STALE_SECONDS,))
+
+    row = conn.execute("SELECT tokens, rate, updated, blocked_until FROM buckets WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        row = (limits["burst"], limits["rate"], now, 0.0)
+        conn.execute("INSERT INTO buckets VALUES (?, ?, ?, ?, ?)", (key, *row))
+    tokens, rate, updated, blocked_until = row
+    tokens = min(limits["burst"], tokens + (now - updated) * rate)
+
+    ahead = conn.execute(
+        "SELECT COUNT(*) FROM waiters WHERE key = ? AND lane < ? AND id != ?", (key, lane, waiter_id)
+    ).fetchone()[0]
+    active = conn.execute("SELECT COUNT(*) FROM leases WHERE key = ?", (key,)).fetchone()[0]
+
+    if now >= blocked_until and not ahead and active < limits["concurrency"] and tokens >= cost:
+        lease_id = uuid.uuid4().hex
+        conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE key = ?", (tokens - cost, now, key))
+        conn.execute("INSERT INTO leases VALUES (?, ?, ?, ?)", (lease_id, key, lane, now + LEASE_SECONDS))
+        conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+        return lease_id, None
+
+    conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE key = ?", (tokens, now, key))
+    conn.execute("INSERT OR REPLACE INTO waiters VALUES (?, ?, ?, ?)", (waiter_id, key, lane, now))
+    wait = max(blocked_until - now, (cost - tokens) / rate if tokens < cost else 0.0, 0.0)
+    return None, min(max(wait, 0.01), POLL_SECONDS)
+
+
+def acquire(provider, api_key=None, cost=1.0):
+    """Block until a request to provider may be made. Returns a lease for release()."""
+    key = _limit_key(provider, api_key)
+    if not RATE_LIMITS_ENABLED:
+        return (key, None)
+    limits = limits_for(provider)
+    lane = current_lane()
+    waiter_id = uuid.uuid4().hex
+    waited_since = time.time()
+    while True:
+        with _transaction() as conn:
+            lease_id, wait = _try_acquire(conn, key, limits, lane, waiter_id, cost, time.time())
+        if lease_id:
+            waited = time.time() - waited_since
+            if waited > 1:
+                print(f"⏳ {LANE_NAMES.get(lane, lane)} request to {provider} waited {waited:.1f}s for its rate limit")
+            return (key, lease_id)
+        time.sleep(wait)
+
+
+def release(lease):
+    key, lease_id = lease
+    if lease_id is None:
+        return
+    with _transaction() as conn:
+        conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+
+
+def report_success(provider, api_key=None):
+    """Win back some of the rate lost to earlier 429s."""
+    if not RATE_LIMITS_ENABLED:
+        return
+    configured = limits_for(provider)["rate"]
+    with _transaction() as conn:
+        conn.execute("UPDATE buckets SET rate = MIN(?, rate + ?) WHERE key = ? AND rate < ?",
+                     (configured, configured * RECOVERY_FRACTION, _limit_key(provider, api_key), configured))
+
+
+def report_throttled(provider, retry_after, api_key=None):
+    """Pause the key for every process and halve its rate."""
+    if not RATE_LIMITS_ENABLED:
+        return
+    minimum = limits_for(provider)["rate"] * MIN_RATE_FRACTION
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE buckets SET blocked_until = MAX(blocked_until, ?), rate = MAX(?, rate / 2), tokens = 0 "
+            "WHERE key = ?",
+            (time.time() + retry_after, minimum, _limit_key(provider, api_key))
+        )
+
+
+def _throttle_info(error):
+    """(is a 429, Retry-After seconds or None) from an SDK exception (httpx, openai, anthropic, elevenlabs)."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return False, None
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return True, float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return True, _retry_after_seconds(headers.get("retry-after"))
+
+
+def _retry_after_seconds(value):
+    """Seconds from a Retry-After header (delay seconds or an HTTP date), None if missing or malformed."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None  # raised for malformed dates since Python 3.10, None before
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)  # HTTP dates are GMT
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def call_with_rate_limit(provider, fn, *args, api_key=None, **kwargs):
+    """
+    Call fn(*args, **kwargs) within provider's limits. A 429 pauses the key for everyone
+    (for Retry-After, or an exponential backoff) and the call is retried.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        lease = acquire(provider, api_key)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            throttled, retry_after = _throttle_info(e)
+            if not throttled or attempt == MAX_RETRIES:
+                if throttled:
+                    raise RateLimited(f"{provider} still rate limited after {MAX_RETRIES} retries") from e
+                raise
+            retry_after = retry_after if retry_after is not None else DEFAULT_BACKOFF_SECONDS * 2 ** attempt
+            print(f"🚦 {provider} returned 429, pausing {retry_after:.1f}s (attempt {attempt + 1})")
+            report_throttled(provider, retry_after, api_key)
+        else:
+            report_success(provider, api_key)
+            return result
+        finally:
+            release(lease)
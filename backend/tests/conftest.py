@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.connection as database_connection
+from database.connection import ConnectionPool
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Run the test in an empty folder against a fresh database; returns the pool."""
+    monkeypatch.chdir(tmp_path)
+    test_pool = ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(database_connection, "pool", test_pool)
+    yield test_pool
+    test_pool.close_all()
@@ -0,0 +1,34 @@
+import pytest
+
+import admission
+from admission import choose_mode
+
+MB = 1024 * 1024
+ESTIMATES = {"sequential": 900 * MB, "parallel": 300 * MB, "draft": 50 * MB}
+
+
+def test_requested_mode_runs_when_it_fits():
+    assert choose_mode(ESTIMATES, "sequential", free=1000 * MB, budget=2000 * MB) == ("sequential", False)
+    assert choose_mode(ESTIMATES, "parallel", free=1000 * MB, budget=2000 * MB) == ("parallel", False)
+    assert choose_mode(ESTIMATES, "draft", free=100 * MB, budget=2000 * MB) == ("draft", False)
+
+
+def test_switches_to_parallel_when_only_that_fits_now():
+    assert choose_mode(ESTIMATES, "sequential", free=400 * MB, budget=2000 * MB) == ("parallel", False)
+
+
+def test_waits_for_the_smallest_same_output_mode():
+    assert choose_mode(ESTIMATES, "sequential", free=100 * MB, budget=2000 * MB) == ("parallel", True)
+    assert choose_mode({"sequential": 900 * MB, "draft": 50 * MB}, "sequential", free=100 * MB,
+                       budget=2000 * MB) == ("sequential", True)
+
+
+def test_never_switches_a_master_render_to_draft_by_default(monkeypatch):
+    monkeypatch.setattr(admission, "RENDER_DEGRADE_TO_DRAFT", False)
+    assert choose_mode(ESTIMATES, "sequential", free=100 * MB, budget=200 * MB) == ("parallel", True)
+
+
+@pytest.mark.parametrize("free, waits", [(100 * MB, False), (10 * MB, True)])
+def test_degrades_to_draft_when_no_master_render_fits_the_budget(monkeypatch, free, waits):
+    monkeypatch.setattr(admission, "RENDER_DEGRADE_TO_DRAFT", True)
+    assert choose_mode(ESTIMATES, "sequential", free=free, budget=200 * MB) == ("draft", waits)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from database import codec
+
+SMALL = {"title": "Pilot", "scenes": [], "duration": 1.5, "final": True, "notes": None}
+LARGE = {"dialogue_timing": [{"line": f"Line {i} ünïcode", "start_time": i * 1.25, "end_time": i * 1.25 + 1,
+                              "character": "NARRATOR", "file": f"data/dialogue/{i}.mp3"} for i in range(300)]}
+
+
+@pytest.mark.parametrize("serializer", ["msgpack", "json"])
+@pytest.mark.parametrize("compressor", ["zstd", "zlib"])
+@pytest.mark.parametrize("document", [SMALL, LARGE], ids=["small", "large"])
+def test_round_trip(monkeypatch, serializer, compressor, document):
+    if serializer == "json":
+        monkeypatch.setattr(codec, "msgpack", None)
+    elif codec.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    if compressor == "zlib":
+        monkeypatch.setattr(codec, "zstandard", None)
+    elif codec.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    data = codec.encode_document(document)
+    assert data.startswith(codec.CODEC_MAGIC)
+    assert data[3] == (codec.MSGPACK if serializer == "msgpack" else codec.JSON)
+    expected_compression = codec.ZSTD if compressor == "zstd" else codec.ZLIB
+    assert data[4] == (expected_compression if document is LARGE else codec.UNCOMPRESSED)
+    assert codec.decode_document(data) == document
+    assert codec.decode_document(memoryview(data)) == document
+
+
+def test_reads_legacy_json_rows():
+    assert codec.decode_document(None) is None
+    assert codec.decode_document(json.dumps(LARGE)) == LARGE
+    assert codec.decode_document(json.dumps(SMALL).encode("utf-8")) == SMALL
+
+
+def test_rejects_unknown_formats():
+    data = codec.encode_document(SMALL)
+    with pytest.raises(ValueError):
+        codec.decode_document(data[:2] + bytes([codec.CODEC_VERSION + 1]) + data[3:])
+    with pytest.raises(ValueError):
+        codec.decode_document(data[:4] + bytes([9]) + data[5:])
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from database import jobs, repository
+
+EXPIRED = -1  # a lease that is already over when it is granted
+
+
+def test_claims_most_urgent_job_of_the_requested_kinds(db):
+    with db.connection() as conn:
+        later = jobs.enqueue_job(conn, "audio", {"n": 1}, priority=5)
+        mixdown = jobs.enqueue_job(conn, "mixdown", {"n": 2}, priority=0)
+        urgent = jobs.enqueue_job(conn, "audio", {"n": 3}, priority=0)
+
+        assert jobs.claim_job(conn, "w1", ["audio"])["id"] == urgent
+        assert jobs.claim_job(conn, "w1", ["audio"])["id"] == later
+        assert jobs.claim_job(conn, "w1", ["audio"]) is None
+        assert jobs.claim_job(conn, "w1")["id"] == mixdown
+
+
+def test_expired_lease_is_requeued_and_its_worker_cannot_complete(db):
+    with db.connection() as conn:
+        job_id = jobs.enqueue_job(conn, "audio", {})
+        assert jobs.claim_job(conn, "slow", lease_seconds=EXPIRED)["attempts"] == 1
+        assert not jobs.lease_held(conn, job_id, "slow")
+
+        reclaimed = jobs.claim_job(conn, "fast")
+        assert reclaimed["id"] == job_id and reclaimed["attempts"] == 2
+
+        assert not jobs.heartbeat(conn, job_id, "slow")
+        assert not jobs.complete_job(conn, job_id, "slow", {"from": "slow"})
+        assert not jobs.fail_job(conn, job_id, "slow", "boom")
+        assert jobs.complete_job(conn, job_id, "fast", {"from": "fast"})
+
+        job = jobs.get_job(conn, job_id)
+        assert job["status"] == jobs.DONE and job["result"] == {"from": "fast"}
+
+
+def test_requeue_expired_fails_jobs_out_of_attempts(db):
+    with db.connection() as conn:
+        retried = jobs.enqueue_job(conn, "audio", {}, max_attempts=2)
+        spent = jobs.enqueue_job(conn, "mixdown", {}, max_attempts=1)
+        jobs.claim_job(conn, "w1", ["audio"], lease_seconds=0.05)
+        jobs.claim_job(conn, "w1", ["mixdown"], lease_seconds=0.05)
+        time.sleep(0.1)
+
+        assert jobs.requeue_expired(conn) == 1
+        assert jobs.get_job(conn, retried)["status"] == jobs.QUEUED
+        assert jobs.get_job(conn, spent)["status"] == jobs.FAILED
+        assert jobs.get_job(conn, spent)["error"] == "lease expired"
+
+
+def test_worker_that_lost_its_lease_cannot_store_a_stem(db):
+    with db.connection() as conn:
+        show_id = repository.create_show(conn, "test", "script", None)
+        job_id = jobs.enqueue_job(conn, "audio", {"show_id": show_id})
+        jobs.claim_job(conn, "slow", lease_seconds=EXPIRED)
+
+    with jobs.holding_lease(job_id, "slow"):
+        with pytest.raises(jobs.LeaseLost):
+            with db.connection() as conn:
+                repository.save_audio(conn, show_id, "sfx", b"stale")
+
+    with db.connection() as conn:
+        assert repository.get_audio(conn, show_id, "sfx") is None
+        jobs.claim_job(conn, "fast")
+    with jobs.holding_lease(job_id, "fast"):
+        with db.connection() as conn:
+            repository.save_audio(conn, show_id, "sfx", b"fresh")
+    with db.connection() as conn:
+        assert repository.get_audio(conn, show_id, "sfx") == b"fresh"
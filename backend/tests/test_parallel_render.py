@@ -0,0 +1,63 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+from pydub.generators import Sine, WhiteNoise
+
+from audio_generation.dialogue import create_dialogue
+from audio_generation.encoding import decode_pcm
+from audio_generation.parallel_render import create_stem_parallel
+from audio_generation.sfx import create_sfx
+from database import repository
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+TOTAL_SECONDS = 25.37
+
+
+def _write_clips():
+    os.makedirs("data/dialogue")
+    os.makedirs("data/sfx")
+    Sine(300).to_audio_segment(duration=2300, volume=-12).export("data/dialogue/a.wav", format="wav")
+    Sine(500, sample_rate=22050).to_audio_segment(duration=1700, volume=-12).export("data/dialogue/b.wav", format="wav")
+    Sine(800).to_audio_segment(duration=900, volume=-12).set_channels(2).export("data/sfx/door.wav", format="wav")
+    WhiteNoise().to_audio_segment(duration=8000, volume=-30).export("data/sfx/rain.wav", format="wav")
+
+
+def _timing():
+    clips = {"data/dialogue/a.wav": 2.3, "data/dialogue/b.wav": 1.7, "door": 0.9, "rain": 8.0}
+    dialogue = [{"file": "data/dialogue/a.wav", "start_time": 0.5}, {"file": "data/dialogue/b.wav", "start_time": 2.2},
+                {"file": "data/dialogue/b.wav", "start_time": 9.95}, {"file": "data/dialogue/a.wav", "start_time": 23.1}]
+    effects = [{"effect": "rain", "start_time": 1.0}, {"effect": "door", "start_time": 4.2},
+               {"effect": "rain", "start_time": 12.0}, {"effect": "door", "start_time": 19.99}]
+    for segment in dialogue:
+        segment["end_time"] = segment["start_time"] + clips[segment["file"]]
+    for effect in effects:
+        effect["end_time"] = effect["start_time"] + clips[effect["effect"]]
+    return {"total_dialogue_duration": TOTAL_SECONDS, "dialogue_timing": dialogue, "sound_effect_timing": effects}
+
+
+def _decoded(mp3_binary, channels):
+    with open("stem.mp3", "wb") as f:
+        f.write(mp3_binary)
+    return np.frombuffer(decode_pcm("stem.mp3", 44100, channels), dtype=np.int16).reshape(-1, channels)
+
+
+@pytest.mark.parametrize("audio_type, render, channels", [("dialogue", create_dialogue, 1), ("sfx", create_sfx, 2)])
+def test_parallel_render_matches_sequential(db, audio_type, render, channels):
+    _write_clips()
+    with db.connection() as conn:
+        show_id = repository.create_show(conn, "test", "script", None)
+        repository.save_event_timing(conn, show_id, _timing())
+
+    render(show_id)
+    with db.connection() as conn:
+        sequential = _decoded(repository.get_audio(conn, show_id, audio_type), channels)
+    create_stem_parallel(show_id, audio_type, workers=3)
+    with db.connection() as conn:
+        parallel = _decoded(repository.get_audio(conn, show_id, audio_type), channels)
+
+    assert len(sequential) == round(TOTAL_SECONDS * 44100)
+    assert len(parallel) == len(sequential)
+    assert np.abs(parallel.astype(int) - sequential.astype(int)).max() <= 2
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from pydub import AudioSegment
+
+from audio_generation.peaks import (BASE_SAMPLES_PER_PEAK, LEVEL_COUNT, LEVEL_FACTOR, PeakAccumulator,
+                                    compute_peaks, decode_peaks, encode_peaks, select_level, slice_level_blob)
+
+
+def _segment(samples):
+    """int16 samples shaped (frames, channels) -> AudioSegment at 44.1 kHz."""
+    return AudioSegment(data=samples.astype("<i2").tobytes(), sample_width=2, frame_rate=44100,
+                        channels=samples.shape[1])
+
+
+def _expected_level(samples, samples_per_peak):
+    """Quantised (min, max) pairs of every samples_per_peak frames, across channels."""
+    values = samples.astype(np.float32) / 32768
+    pairs = []
+    for start in range(0, len(values), samples_per_peak):
+        bucket = values[start:start + samples_per_peak]
+        pairs += [bucket.min(), bucket.max()]
+    return np.clip(np.round(np.array(pairs) * 127), -128, 127).astype(np.int8)
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(3)
+    frames = 300 * BASE_SAMPLES_PER_PEAK + 77  # a partial bucket at the end
+    envelope = np.linspace(0.05, 1.0, frames)[:, None]
+    return (rng.uniform(-1, 1, (frames, 2)) * envelope * 32767).astype(np.int16)
+
+
+def test_round_trip_matches_brute_force(samples):
+    peaks = decode_peaks(compute_peaks(_segment(samples)))
+    assert peaks["sample_rate"] == 44100
+    assert peaks["total_samples"] == len(samples)
+    assert len(peaks["levels"]) == LEVEL_COUNT
+    for level, factor in zip(peaks["levels"], (LEVEL_FACTOR ** i for i in range(LEVEL_COUNT))):
+        assert level["samples_per_peak"] == BASE_SAMPLES_PER_PEAK * factor
+        expected = _expected_level(samples, level["samples_per_peak"])
+        assert level["count"] == len(expected) // 2
+        np.testing.assert_array_equal(level["data"], expected)
+
+
+@pytest.mark.parametrize("chunk_frames", [1, 100, BASE_SAMPLES_PER_PEAK, 1000, 44100])
+def test_chunked_accumulation_matches_one_pass(samples, chunk_frames):
+    accumulator = PeakAccumulator(44100)
+    for start in range(0, len(samples), chunk_frames):
+        accumulator.add(_segment(samples[start:start + chunk_frames]))
+    assert encode_peaks(accumulator) == compute_peaks(_segment(samples))
+
+
+def test_single_level_blob_and_selection(samples):
+    data = compute_peaks(_segment(samples))
+    peaks = decode_peaks(data)
+    assert select_level(peaks, max_peaks=100)["count"] <= 100
+    assert select_level(peaks, max_peaks=1) is peaks["levels"][-1]
+
+    level = peaks["levels"][1]
+    single = decode_peaks(slice_level_blob(data, level["samples_per_peak"]))
+    assert len(single["levels"]) == 1
+    np.testing.assert_array_equal(single["levels"][0]["data"], level["data"])
+    with pytest.raises(ValueError):
+        slice_level_blob(data, 3)
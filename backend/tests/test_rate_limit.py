@@ -0,0 +1,103 @@
+import email.utils
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from rate_limit import BACKGROUND, BATCH, INTERACTIVE
+
+LIMITS = {"rate": 100.0, "burst": 100, "concurrency": 1}
+
+
+@pytest.fixture(autouse=True)
+def limiter(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_DB", str(tmp_path / "rate_limits.db"))
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "_local", threading.local())
+    monkeypatch.setenv("RATE_LIMIT_TESTAPI", "rate=100,burst=100,concurrency=1")
+
+
+def _try(lane, waiter_id):
+    with rate_limit._transaction() as conn:
+        lease_id, _ = rate_limit._try_acquire(conn, "testapi:default", LIMITS, lane, waiter_id, 1.0, time.time())
+    return lease_id
+
+
+def _release(lease_id):
+    rate_limit.release(("testapi:default", lease_id))
+
+
+def test_waiting_callers_are_served_by_lane():
+    holder = _try(BATCH, "holder")
+    assert holder
+    assert _try(BACKGROUND, "background") is None
+    assert _try(BATCH, "batch") is None
+    assert _try(INTERACTIVE, "interactive") is None
+    _release(holder)
+
+    # the slot is free, but a lower lane must let every higher lane that is waiting go first
+    assert _try(BACKGROUND, "background") is None
+    assert _try(BATCH, "batch") is None
+    interactive = _try(INTERACTIVE, "interactive")
+    assert interactive
+    _release(interactive)
+
+    assert _try(BACKGROUND, "background") is None
+    _release(_try(BATCH, "batch"))
+    assert _try(BACKGROUND, "background")
+
+
+class Throttled(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("429")
+        self.headers = {"retry-after": retry_after}
+
+
+def test_429_pauses_the_key_and_halves_its_rate():
+    calls = []
+
+    def flaky():
+        calls.append(time.time())
+        if len(calls) == 1:
+            raise Throttled("0.5")
+        return "ok"
+
+    assert rate_limit.call_with_rate_limit("testapi", flaky) == "ok"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.5
+
+    with rate_limit._transaction() as conn:
+        rate = conn.execute("SELECT rate FROM buckets WHERE key = 'testapi:default'").fetchone()[0]
+    # halved by the 429, then given back RECOVERY_FRACTION of the configured rate by the success
+    assert rate == pytest.approx(100 / 2 + 100 * rate_limit.RECOVERY_FRACTION)
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        rate_limit.call_with_rate_limit("testapi", broken)
+    assert len(calls) == 1
+
+
+def test_retry_after_parsing(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    assert rate_limit._retry_after_seconds(None) is None
+    assert rate_limit._retry_after_seconds("soon") is None
+    assert rate_limit._retry_after_seconds("-3") == 0.0
+    assert rate_limit._retry_after_seconds("2.5") == 2.5
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert rate_limit._retry_after_seconds(in_a_minute) == pytest.approx(60, abs=2)
+    # a date without a zone (-0000) is GMT, not local time
+    naive = email.utils.formatdate(time.time() + 60).rsplit(" ", 1)[0] + " -0000"
+    assert rate_limit._retry_after_seconds(naive) == pytest.approx(60, abs=2)
+    monkeypatch.undo()
+    time.tzset()
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from timeline import BACKGROUND, DIALOGUE, SFX, Timeline
+
+
+def _random_events(rng, count):
+    events = []
+    for i in range(count):
+        start = rng.choice([rng.uniform(0, 100), round(rng.uniform(0, 100))])  # some ties on whole seconds
+        length = rng.choice([0.0, rng.uniform(0, 2), rng.uniform(0, 40)])  # zero-length, short and long events
+        events.append({"kind": rng.choice((DIALOGUE, SFX, BACKGROUND)), "start": start, "end": start + length,
+                       "source": f"clip{i % 7}"})
+    return events
+
+
+def _brute_force(timeline, window_start, window_end):
+    return [p for p in range(len(timeline)) if timeline.start[p] < window_end and timeline.end[p] > window_start]
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 10, 257])
+def test_overlapping_matches_brute_force(count):
+    rng = random.Random(count)
+    timeline = Timeline.build(_random_events(rng, count))
+    windows = [(-10, 0), (0, 0), (100, 200), (-1, 1000)]
+    windows += [(a, a + rng.choice([0.001, 1, 5, 30])) for a in (rng.uniform(-5, 140) for _ in range(200))]
+    windows += [(timeline.start[p], timeline.end[p]) for p in range(len(timeline))]
+    for window_start, window_end in windows:
+        assert timeline._overlapping(window_start, window_end) == _brute_force(timeline, window_start, window_end)
+
+
+def test_queries_and_bytes_round_trip():
+    rng = random.Random(7)
+    events = _random_events(rng, 50)
+    timeline = Timeline.build(events)
+    restored = Timeline.from_bytes(timeline.to_bytes())
+
+    for t in (0, 12.5, 50, 99.9):
+        expected = {i for i, e in enumerate(events) if e["start"] <= t < e["end"]}
+        assert {e.id for e in timeline.active_at(t)} == expected
+        assert {e.id for e in restored.active_at(t)} == expected
+    assert [e.to_dict() for e in restored] == [e.to_dict() for e in timeline]
+    assert restored.ids_in_window(10, 20) == timeline.ids_in_window(10, 20)
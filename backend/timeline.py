@@ -0,0 +1,240 @@
+"""
+Typed timeline of a show: every dialogue line and sound effect as an interval, stored
+column-wise in arrays with a shared string table, plus a static interval tree so
+"what is active at t" and "what overlaps [start, end)" are O(log n + matches)
+instead of a scan over event_timing.
+
+The tree is implicit: events are sorted by start time and the node for a range is
+its midpoint, so the only extra storage is the largest end time of each subtree.
+
+Binary layout (little endian):
+    b"ADTL", version u8, event count u32, string count u32
+    then per string: byte length u32, utf-8 bytes
+    then the columns, count values each: start f64, end f64, max end f64, id u32,
+    kind u8, source u32, text u32, speaker u32, emotion u32
+"""
+import math
+import struct
+import sys
+from array import array
+
+TIMELINE_MAGIC = b"ADTL"
+TIMELINE_VERSION = 1
+
+DIALOGUE = 0
+SFX = 1
+BACKGROUND = 2  # a sound effect that is ambience and gets crossfaded
+KIND_NAMES = ("dialogue", "sfx", "background")
+
+NO_STRING = 0xFFFFFFFF
+STRING_COLUMNS = ("source", "text", "speaker", "emotion")
+COLUMN_TYPES = (("start", "d"), ("end", "d"), ("max_end", "d"), ("id", "I"), ("kind", "B"),
+                ("source", "I"), ("text", "I"), ("speaker", "I"), ("emotion", "I"))
+
+
+class TimelineEvent:
+    """One event, materialised from the timeline's columns on demand."""
+    __slots__ = ("id", "kind", "start", "end", "source", "text", "speaker", "emotion")
+
+    def __init__(self, id, kind, start, end, source, text, speaker, emotion):
+        self.id = id
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.source = source
+        self.text = text
+        self.speaker = speaker
+        self.emotion = emotion
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def to_dict(self):
+        return {"id": self.id, "kind": KIND_NAMES[self.kind], "start": self.start, "end": self.end,
+                "source": self.source, "text": self.text, "speaker": self.speaker, "emotion": self.emotion}
+
+    def __repr__(self):
+        return f"TimelineEvent({self.id}, {KIND_NAMES[self.kind]}, {self.start:.3f}-{self.end:.3f}, {self.source!r})"
+
+
+class Timeline:
+    """
+    Immutable, interval-indexed set of events. Build it with Timeline.build(), from
+    event_timing with Timeline.from_event_timing(), or from bytes with Timeline.from_bytes().
+    Times are in whatever unit the events were given in (seconds for event_timing).
+    """
+    __slots__ = ("strings",) + tuple(name for name, _ in COLUMN_TYPES)
+
+    def __init__(self, strings, columns):
+        self.strings = strings
+        for name, typecode in COLUMN_TYPES:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def build(cls, events):
+        """
+        events: iterable of dicts with start, end and kind, plus optional source, text,
+        speaker and emotion strings. An event's id is its position in the iterable.
+        """
+        events = list(events)
+        strings, string_ids = [], {}
+
+        def intern(value):
+            if value is None:
+                return NO_STRING
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(value)
+            return string_ids[value]
+
+        order = sorted(range(len(events)), key=lambda i: (events[i]["start"], i))
+        columns = {name: array(typecode) for name, typecode in COLUMN_TYPES}
+        for i in order:
+            event = events[i]
+            columns["start"].append(float(event["start"]))
+            columns["end"].append(float(max(event["end"], event["start"])))
+            columns["id"].append(i)
+            columns["kind"].append(event["kind"])
+            for name in STRING_COLUMNS:
+                columns[name].append(intern(event.get(name)))
+
+        columns["max_end"] = array("d", columns["end"])
+        _fill_max_end(columns["end"], columns["max_end"], 0, len(events))
+        return cls(strings, columns)
+
+    @classmethod
+    def from_event_timing(cls, event_timing, background_effects=()):
+        """
+        Timeline of a timing report. Sound effects flagged "background" by the timing
+        analysis, or named in background_effects, are marked BACKGROUND.
+        """
+        events = []
+        for segment in event_timing.get("dialogue_timing", []):
+            events.append({"kind": DIALOGUE, "start": segment["start_time"], "end": segment["end_time"],
+                           "source": segment["file"], "text": segment.get("line"),
+                           "speaker": segment.get("character"), "emotion": segment.get("emotion")})
+        for effect in event_timing.get("sound_effect_timing", []):
+            kind = BACKGROUND if effect.get("background") or effect["effect"] in background_effects else SFX
+            events.append({"kind": kind, "start": effect["start_time"], "end": effect["end_time"],
+                           "source": effect["effect"], "text": effect.get("description") or None})
+        return cls.build(events)
+
+    def __len__(self):
+        return len(self.start)
+
+    def event(self, position):
+        """The event at a position in start order."""
+        strings = self.strings
+        values = [self.source[position], self.text[position], self.speaker[position], self.emotion[position]]
+        source, text, speaker, emotion = (None if v == NO_STRING else strings[v] for v in values)
+        return TimelineEvent(self.id[position], self.kind[position], self.start[position], self.end[position],
+                             source, text, speaker, emotion)
+
+    def __iter__(self):
+        return (self.event(position) for position in range(len(self)))
+
+    def _overlapping(self, window_start, window_end):
+        """Positions of the events with start < window_end and end > window_start, in start order."""
+        start, end, max_end = self.start, self.end, self.max_end
+        found = []
+        stack = [(0, len(start))]
+        while stack:
+            low, high = stack.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if max_end[middle] <= window_start:
+                continue  # everything in this subtree has ended
+            stack.append((low, middle))
+            if start[middle] < window_end:
+                if end[middle] > window_start:
+                    found.append(middle)
+                stack.append((middle + 1, high))  # later subtrees start even later
+        found.sort()
+        return found
+
+    def active_at(self, t, kind=None):
+        """Events with start <= t < end."""
+        return [self.event(p) for p in self._overlapping(t, math.nextafter(t, math.inf))
+                if kind is None or self.kind[p] == kind]
+
+    def in_window(self, window_start, window_end, kind=None):
+        """Events overlapping [window_start, window_end), in start order."""
+        return [self.event(p) for p in self._overlapping(window_start, window_end)
+                if kind is None or self.kind[p] == kind]
+
+    def ids_in_window(self, window_start, window_end):
+        """Just the ids of the events overlapping [window_start, window_end), without building records."""
+        return {self.id[p] for p in self._overlapping(window_start, window_end)}
+
+    def to_bytes(self):
+        encoded = [s.encode("utf-8") for s in self.strings]
+        parts = [TIMELINE_MAGIC, struct.pack("<BII", TIMELINE_VERSION, len(self), len(encoded))]
+        for data in encoded:
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+        for name, typecode in COLUMN_TYPES:
+            column = getattr(self, name)
+            if sys.byteorder == "big":
+                column = array(typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != TIMELINE_MAGIC:
+            raise ValueError("Not a timeline blob")
+        version, count, string_count = struct.unpack_from("<BII", data, 4)
+        if version != TIMELINE_VERSION:
+            raise ValueError(f"Unsupported timeline version {version}")
+
+        offset = 4 + struct.calcsize("<BII")
+        strings = []
+        for _ in range(string_count):
+            (length,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            strings.append(bytes(data[offset:offset + length]).decode("utf-8"))
+            offset += length
+
+        columns = {}
+        for name, typecode in COLUMN_TYPES:
+            column = array(typecode)
+            size = column.itemsize * count
+            column.frombytes(bytes(data[offset:offset + size]))
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns[name] = column
+            offset += size
+        return cls(strings, columns)
+
+    def to_json(self):
+        """Column-wise form for the UI, which runs the same tree search (see frontend/lib/timeline.ts)."""
+        return {
+            "version": TIMELINE_VERSION,
+            "kinds": list(KIND_NAMES),
+            "strings": self.strings,
+            **{name: getattr(self, name).tolist() for name, _ in COLUMN_TYPES},
+        }
+
+
+def _fill_max_end(end, max_end, low, high):
+    """Largest end time in each implicit subtree, bottom up."""
+    stack = [(low, high, False)]
+    while stack:
+        low, high, children_done = stack.pop()
+        if low >= high:
+            continue
+        middle = (low + high) // 2
+        if not children_done:
+            stack.append((low, high, True))
+            stack.append((low, middle, False))
+            stack.append((middle + 1, high, False))
+            continue
+        value = end[middle]
+        if low < middle:
+            value = max(value, max_end[(low + middle) // 2])
+        if middle + 1 < high:
+            value = max(value, max_end[(middle + 1 + high) // 2])
+        max_end[middle] = value
@@ -1,21 +1,22 @@
-from pydub import AudioSegment
 import json
 import os
 from audio_generation.tts import generate_tts_files
+from audio_generation.assets import get_asset_info
+from audio_generation.sfx import get_sfx_path
 import datetime
 
-def analyze_script_timing(script_data: dict) -> dict:
+def analyze_script_timing(script_data: dict, tts_backend: str = None) -> dict:
     """
     Analyze the script timing and generate a report of dialogue and sound effect timings.
     Returns a dictionary containing timing information for both dialogue and sound effects.
+    tts_backend picks the TTS engine (see audio_generation.tts_backends), TTS_BACKEND by default.
     """
     # First generate all TTS files for dialogue
-    generated_files = generate_tts_files(script_data)
+    generated_files = generate_tts_files(script_data, tts_backend)
     
     events = script_data.get("events", [])
     
     # Track dialogue timing
-    dialogue_audio = AudioSegment.empty()
     dialogue_timestamps = []
     current_time_ms = 0
 
@@ -23,9 +24,10 @@ def analyze_script_timing(script_data: dict) -> dict:
     for file_data in generated_files:
         file_path = file_data["file"]
         if os.path.exists(file_path):
-            audio_segment = AudioSegment.from_mp3(file_path)
+            # durations come from the asset index, so cached lines are not decoded again
+            duration_ms = get_asset_info(file_path)["duration_ms"]
             start_time = current_time_ms / 1000
-            duration = len(audio_segment) / 1000
+            duration = duration_ms / 1000
             end_time = start_time + duration
 
             dialogue_timestamps.append({
@@ -46,8 +48,7 @@ def analyze_script_timing(script_data: dict) -> dict:
                 f"  Start: {start_time:.2f}s, Duration: {duration:.2f}s, End: {end_time:.2f}s"
             )
 
-            dialogue_audio += audio_segment
-            current_time_ms += len(audio_segment)
+            current_time_ms += duration_ms
 
     # Calculate total duration now
     total_duration = current_time_ms / 1000
@@ -144,6 +145,10 @@ def analyze_script_timing(script_data: dict) -> dict:
         # Calculate crossfade duration - 2 seconds or half the effect duration, whichever is shorter
         crossfade_duration = min(2.0, duration / 2) if next_sound_effect else 0.0
 
+        # ambience or one-shot, from the library file the effect resolves to (the timeline needs it)
+        sfx_path = get_sfx_path(effect["effect"], effect.get("description"))
+        background = bool(sfx_path and get_asset_info(sfx_path)["is_background"])
+
         sound_effect_timing.append(
             {
                 "effect": effect["effect"],
@@ -153,6 +158,7 @@ def analyze_script_timing(script_data: dict) -> dict:
                 "duration": duration,
                 "position": position,
                 "crossfade_duration": crossfade_duration,
+                "background": background,
                 "prev_dialogue": prev_dialogue["file"] if prev_dialogue else None,
                 "next_dialogue": next_dialogue["file"] if next_dialogue else None,
             }
@@ -0,0 +1,154 @@
+"""
+Speculative cache warming after a parse: once /process has stored a parsed script, a
+background thread renders the missing TTS lines, resolves (or generates) the missing sound
+effects and decodes the music the show is likely to use, so the /analyze-timing and
+/generate-audio calls that usually follow are mostly cache hits.
+
+Warm-up must never slow down the user. It runs on one thread, its API calls go through
+the BACKGROUND rate-limit lane, and between items it waits while any interactive request
+(every non-GET request, including its background tasks) or any render started by one is in flight.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import priority_lane, BACKGROUND
+from admission import renders_in_flight
+from audio_generation.assets import get_asset_info
+from audio_generation.tts import get_tts_backend, plan_tts_requests
+from audio_generation.sfx import get_sfx_path, generate_ai_sfx, SFXModel
+from audio_generation.music_library import best_tracks, scene_text, load_track
+
+WARMUP_AFTER_PARSE = os.getenv("WARMUP_AFTER_PARSE", "0") == "1"
+WARMUP_CHUNK = 4  # TTS requests rendered between two checks for interactive work
+WARMUP_YIELD_SECONDS = 0.5
+WARMUP_MAX_TRACKS = 3  # music candidates decoded when several tracks tie
+
+WARMUPS = {}  # show_id -> progress of its latest warm-up
+_warmup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+_active = 0
+_active_lock = threading.Lock()
+
+
+class InteractiveWorkMiddleware:
+    """ASGI middleware counting in-flight interactive requests (background tasks included)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+        with _active_lock:
+            _active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with _active_lock:
+                _active -= 1
+
+
+def interactive_requests():
+    return _active
+
+
+def wait_for_idle():
+    """Block while interactive requests or renders are running. Returns the seconds spent waiting."""
+    waited = 0.0
+    while _active > 0 or renders_in_flight() > 0:
+        time.sleep(WARMUP_YIELD_SECONDS)
+        waited += WARMUP_YIELD_SECONDS
+    return waited
+
+
+def warm_tts(plan, backend, status):
+    missing = [request for requests in plan["by_voice"].values() for request in requests
+               if not os.path.exists(request["file"])]
+    status["tts_missing"] = len(missing)
+    for i in range(0, len(missing), WARMUP_CHUNK):
+        status["yielded_seconds"] += wait_for_idle()
+        status["tts_rendered"] += backend.render(missing[i:i + WARMUP_CHUNK])
+
+    # durations for /analyze-timing come from the asset index
+    duration_ms = 0
+    for event in plan["events"]:
+        if os.path.exists(event["file"]):
+            duration_ms += get_asset_info(event["file"])["duration_ms"]
+    return duration_ms / 1000
+
+
+def warm_sfx(parsed_script, sfx_model, status):
+    effects = {}
+    for event in parsed_script.get("events", []):
+        if event.get("type") == "soundeffect" and event.get("effect"):
+            effects.setdefault(event["effect"], event.get("description"))
+
+    missing = []
+    for effect, description in effects.items():
+        status["yielded_seconds"] += wait_for_idle()
+        path = get_sfx_path(effect, description)
+        if path:
+            get_asset_info(path)
+        else:
+            missing.append(effect)
+    status["sfx_resolved"] = len(effects) - len(missing)
+    for effect in missing:
+        status["yielded_seconds"] += wait_for_idle()
+        generate_ai_sfx([effect], sfx_model)
+        path = get_sfx_path(effect)
+        if path:
+            get_asset_info(path)
+            status["sfx_generated"] += 1
+
+
+def warm_music(parsed_script, total_duration, status):
+    # the render picks at random among tied tracks, so every candidate is decoded
+    tracks = best_tracks(scene_text(parsed_script), total_duration=total_duration)
+    for track in tracks[:WARMUP_MAX_TRACKS]:
+        status["yielded_seconds"] += wait_for_idle()
+        load_track(track["path"])
+        status["music_decoded"] += 1
+
+
+def warm_show(show_id, parsed_script, tts_backend=None, sfx_model=SFXModel.ELEVENLABS_API):
+    """Prefetch everything the show's timing and renders will ask for. Returns the warm-up status."""
+    status = WARMUPS[show_id]
+    status.update(state="running", started_at=time.time())
+    try:
+        with priority_lane(BACKGROUND):
+            backend = get_tts_backend(tts_backend)
+            os.makedirs(backend.directory, exist_ok=True)
+            plan = plan_tts_requests(parsed_script, backend)
+            total_duration = warm_tts(plan, backend, status)
+            warm_sfx(parsed_script, sfx_model, status)
+            warm_music(parsed_script, total_duration, status)
+    except Exception as e:
+        status.update(state="failed", error=str(e))
+        print(f"❌ Warm-up of show {show_id} failed: {str(e)}")
+        return status
+
+    status.update(state="done", elapsed_seconds=round(time.time() - status["started_at"], 2))
+    print(f"🔥 Warmed show {show_id}: {status['tts_rendered']} TTS lines, {status['sfx_resolved']} effects "
+          f"resolved, {status['sfx_generated']} generated, {status['music_decoded']} music tracks decoded "
+          f"in {status['elapsed_seconds']}s ({status['yielded_seconds']:.1f}s yielded)")
+    return status
+
+
+def start_warmup(show_id, parsed_script, tts_backend=None):
+    """Queue a warm-up for the show unless one is already pending. Returns its status."""
+    status = WARMUPS.get(show_id)
+    if status and status["state"] in ("queued", "running"):
+        return status
+    status = WARMUPS[show_id] = {
+        "state": "queued", "tts_missing": 0, "tts_rendered": 0, "sfx_resolved": 0, "sfx_generated": 0,
+        "music_decoded": 0, "yielded_seconds": 0.0,
+    }
+    _warmup_pool.submit(warm_show, show_id, parsed_script, tts_backend)
+    return status
+
+
+def shutdown():
+    _warmup_pool.shutdown(wait=False, cancel_futures=True)
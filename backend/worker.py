@@ -0,0 +1,194 @@
+"""
+Render worker: claims jobs from the shared queue (database/jobs.py) and runs them.
+
+Start as many as the host allows - each claims one job at a time under a lease it
+renews with heartbeats, so a crashed worker's job is picked up by another once the
+lease runs out. Input files (TTS clips, the SFX and music libraries) are fetched from
+the artifact store, so a worker doesn't need the API's data folder.
+
+Workers must run on the API's host: the queue and the stems live in the API's SQLite
+database, which is opened in WAL mode and cannot be shared over a network filesystem.
+
+Usage:
+    python worker.py [--kinds audio mixdown] [--lease 60] [--exit-when-idle]
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+
+from database.connection import get_connection
+from database import jobs, repository
+from artifact_store import publish, publish_folder, ensure_local, sync_folder
+from audio_generation.create_audio import create_audio
+from admission import admitted_mode
+from audio_generation.mixdown import create_mixdown
+from audio_generation.draft import get_draft_path
+from audio_generation.music_library import MUSIC_DIR
+from audio_generation.sfx_search import SFX_FOLDER
+from database.repository import AUDIO_TYPES
+
+WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "60"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1.0"))
+
+
+def publish_show_inputs(show_id, audio_type):
+    """Publish what rendering audio_type needs from this machine: dialogue clips, or the SFX / music library."""
+    if audio_type == "dialogue":
+        with get_connection() as conn:
+            event_timing = repository.get_event_timing(conn, show_id) or {}
+        for segment in event_timing.get("dialogue_timing", []):
+            publish(segment["file"])
+    elif audio_type == "sfx":
+        publish_folder(SFX_FOLDER)
+    elif audio_type == "music":
+        publish_folder(MUSIC_DIR)
+
+
+def fetch_show_inputs(show_id, audio_type, event_timing):
+    if audio_type == "dialogue":
+        missing = [segment["file"] for segment in event_timing.get("dialogue_timing", [])
+                   if not ensure_local(segment["file"])]
+        if missing:
+            print(f"⚠️ {len(missing)} dialogue clips are in neither the local cache nor the artifact store")
+    elif audio_type == "sfx":
+        sync_folder(SFX_FOLDER)
+    elif audio_type == "music":
+        sync_folder(MUSIC_DIR)
+
+
+def enqueue_audio_job(show_id, audio_type, parallel=False, quality="master", priority=0):
+    """Queue a stem render for the workers, publishing its inputs first. Returns the job id."""
+    publish_show_inputs(show_id, audio_type)
+    with get_connection() as conn:
+        return jobs.enqueue_job(conn, "audio", {"show_id": show_id, "audio_type": audio_type,
+                                                "parallel": parallel, "quality": quality}, priority=priority)
+
+
+def enqueue_mixdown_job(show_id, quality="master", priority=0):
+    if quality == "draft":
+        for audio_type in AUDIO_TYPES:
+            publish(get_draft_path(show_id, audio_type))
+    with get_connection() as conn:
+        return jobs.enqueue_job(conn, "mixdown", {"show_id": show_id, "quality": quality}, priority=priority)
+
+
+def run_audio_job(payload):
+    show_id, audio_type = payload["show_id"], payload["audio_type"]
+    quality = payload.get("quality", "master")
+    with get_connection() as conn:
+        event_timing = repository.get_event_timing(conn, show_id)
+    if not event_timing:
+        raise ValueError(f"Show {show_id} has no timing")
+
+    fetch_show_inputs(show_id, audio_type, event_timing)
+    # a master stem is stored by the render itself, which checks the lease in the same transaction
+    create_audio(show_id, audio_type, payload.get("parallel", False), quality)
+    degraded = quality != "draft" and admitted_mode() == "draft"
+    if degraded:
+        quality = "draft"  # too big for the host's memory budget as a master render
+
+    with get_connection() as conn:
+        jobs.check_lease(conn)  # nothing below is published for a job another worker now owns
+        audio_hash = repository.get_audio_hash(conn, show_id, audio_type)
+    if audio_type == "sfx":
+        publish_folder(SFX_FOLDER)  # effects generated during the render
+    if quality == "draft":
+        result = {"path": get_draft_path(show_id, audio_type), "digest": publish(get_draft_path(show_id, audio_type))}
+        if degraded:
+            result["degraded_to"] = "draft"
+        return result
+    # the database is the one copy of a master stem
+    return {"hash": audio_hash}
+
+
+def run_mixdown_job(payload):
+    show_id, quality = payload["show_id"], payload.get("quality", "master")
+    if quality == "draft":
+        for audio_type in AUDIO_TYPES:
+            ensure_local(get_draft_path(show_id, audio_type))
+    path = create_mixdown(show_id, quality)
+    with get_connection() as conn:
+        jobs.check_lease(conn)
+    return {"path": path, "digest": publish(path)}
+
+
+JOB_HANDLERS = {"audio": run_audio_job, "mixdown": run_mixdown_job}
+
+
+def _keep_leased(job_id, worker_id, lease_seconds, stop):
+    """Heartbeat thread: renew the lease every third of its length until the job ends."""
+    while not stop.wait(lease_seconds / 3):
+        try:
+            with get_connection() as conn:
+                if not jobs.heartbeat(conn, job_id, worker_id, lease_seconds):
+                    print(f"⚠️ Lost the lease on job {job_id}; its result will be discarded")
+                    return
+        except Exception as e:
+            print(f"⚠️ Heartbeat for job {job_id} failed: {str(e)}")
+
+
+def run_job(job, worker_id, lease_seconds=WORKER_LEASE_SECONDS):
+    print(f"🛠️ {worker_id} running {job['kind']} job {job['id']} (attempt {job['attempts']}): {job['payload']}")
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_leased, args=(job["id"], worker_id, lease_seconds, stop), daemon=True)
+    heartbeat.start()
+    started = time.time()
+    try:
+        with jobs.holding_lease(job["id"], worker_id):
+            result = JOB_HANDLERS[job["kind"]](job["payload"])
+    except jobs.LeaseLost:
+        print(f"⚠️ Job {job['id']} lost its lease before its output was stored; result discarded")
+        return False
+    except Exception as e:
+        traceback.print_exc()
+        with get_connection() as conn:
+            jobs.fail_job(conn, job["id"], worker_id, str(e))
+        print(f"❌ Job {job['id']} failed: {str(e)}")
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    with get_connection() as conn:
+        completed = jobs.complete_job(conn, job["id"], worker_id, result)
+    print(f"✅ Job {job['id']} done in {time.time() - started:.1f}s" if completed
+          else f"⚠️ Job {job['id']} finished after its lease expired; result discarded")
+    return completed
+
+
+def run_worker(worker_id=None, kinds=None, lease_seconds=WORKER_LEASE_SECONDS, poll_seconds=WORKER_POLL_SECONDS,
+               exit_when_idle=False):
+    """Claim and run jobs until stopped (or, with exit_when_idle, until the queue is empty). Returns the jobs run."""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    kinds = kinds or list(JOB_HANDLERS)
+    print(f"👷 Worker {worker_id} waiting for {', '.join(kinds)} jobs")
+    ran = 0
+    while True:
+        with get_connection() as conn:
+            job = jobs.claim_job(conn, worker_id, kinds, lease_seconds)
+        if job is None:
+            if exit_when_idle:
+                return ran
+            time.sleep(poll_seconds)
+            continue
+        run_job(job, worker_id, lease_seconds)
+        ran += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run render jobs from the shared queue.")
+    parser.add_argument("--id", default=None, help="worker name (defaults to host:pid)")
+    parser.add_argument("--kinds", nargs="+", default=None, choices=list(JOB_HANDLERS))
+    parser.add_argument("--lease", type=int, default=WORKER_LEASE_SECONDS, help="lease length in seconds")
+    parser.add_argument("--poll", type=float, default=WORKER_POLL_SECONDS, help="seconds between polls when idle")
+    parser.add_argument("--exit-when-idle", action="store_true", help="stop once the queue is empty")
+    args = parser.parse_args()
+
+    run_worker(args.id, args.kinds, args.lease, args.poll, args.exit_when_idle)
+
+
+if __name__ == "__main__":
+    main()
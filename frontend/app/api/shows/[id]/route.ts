@@ -1,15 +1,21 @@
-import { getShowById } from "@/lib/db";
 import { NextResponse } from "next/server";
 
+const BACKEND_URL = 'http://127.0.0.1:8000'
+
+// parsed_script and event_timing are stored in the backend's binary document format,
+// so the show page reads them decoded from the backend instead of from the database
 export async function GET(
   request: Request,
   { params }: { params: { id: string } }
 ) {
-  const show = await getShowById(Number(params.id));
-  
-  if (!show) {
+  const response = await fetch(`${BACKEND_URL}/shows/${Number(params.id)}`, { cache: 'no-store' })
+
+  if (response.status === 404) {
     return new NextResponse("Not found", { status: 404 });
   }
+  if (!response.ok) {
+    return NextResponse.json({ error: 'Failed to fetch show' }, { status: 500 })
+  }
 
-  return NextResponse.json(show);
+  return NextResponse.json(await response.json());
 }
@@ -1,23 +1,17 @@
-import { NextResponse } from 'next/server'
-import sqlite3 from 'sqlite3'
-import { open } from 'sqlite'
+import { NextRequest, NextResponse } from 'next/server'
 
-// # NOT USED
+const BACKEND_URL = 'http://127.0.0.1:8000'
 
-const DB_PATH = '/Users/brett/projects/audio-drama-app/backend/database/database.db'
-const TABLE_NAME = 'shows' // Replace with your actual table name
-
-export async function GET() {
+// Show summaries come from the backend's paginated /shows listing, which never reads scripts or audio
+export async function GET(request: NextRequest) {
   try {
-    const db = await open({
-      filename: DB_PATH,
-      driver: sqlite3.Database
+    const response = await fetch(`${BACKEND_URL}/shows?${request.nextUrl.searchParams.toString()}`, {
+      cache: 'no-store',
     })
-
-    const shows = await db.all(`SELECT * FROM ${TABLE_NAME}`)
-    await db.close()
-
-    return NextResponse.json(shows)
+    if (!response.ok) {
+      throw new Error(`Backend responded with ${response.status}`)
+    }
+    return NextResponse.json(await response.json())
   } catch (error) {
     console.error('Database error:', error)
     return NextResponse.json({ error: 'Failed to fetch shows' }, { status: 500 })
@@ -1,12 +1,8 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { promises as fs } from 'fs'
-import path from 'path'
-import mammoth from 'mammoth'
-import sqlite3 from 'sqlite3'
-import { open } from 'sqlite'
 
-import { DB_FILE, TABLE_NAME } from '@/lib/db'
+const BACKEND_URL = 'http://127.0.0.1:8000'
 
+// Extraction, dedupe and storage happen in the backend's /upload ingest endpoint
 export async function POST(request: NextRequest) {
   const formData = await request.formData()
   const file = formData.get('file') as File
@@ -16,46 +12,19 @@ export async function POST(request: NextRequest) {
   }
 
   try {
-    const bytes = await file.arrayBuffer()
-    const buffer = Buffer.from(bytes)
-
-    // Convert .docx to text
-    const resultDoc = await mammoth.extractRawText({ buffer })
-    const text = resultDoc.value.replace(/\n{3,}/g, '\n\n');
-
-    // Save to SQLite database
-    const db = await open({
-      filename: DB_FILE,
-      driver: sqlite3.Database
+    const response = await fetch(`${BACKEND_URL}/upload?${request.nextUrl.searchParams.toString()}`, {
+      method: 'POST',
+      body: formData,
     })
+    const result = await response.json()
 
-    await db.exec(`
-      CREATE TABLE IF NOT EXISTS ${TABLE_NAME} (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        original_script TEXT,
-        parsed_script JSON,
-        event_timing JSON,
-        dialogue_audio BLOB,
-        music_audio BLOB,
-        sfx_audio BLOB
-      )
-    `)
-
-    const result = await db.run(
-      `INSERT INTO ${TABLE_NAME} (name, original_script, parsed_script) VALUES (?, ?, ?)`,
-      [file.name, text, JSON.stringify({})]
-    )
+    if (!response.ok) {
+      return NextResponse.json({ error: result.detail || 'Error processing file' }, { status: response.status })
+    }
 
-    const id = result.lastID
-    await db.close()
-
-    return NextResponse.json({ 
-      message: 'File uploaded and processed successfully',
-      id: id 
-    })
+    return NextResponse.json(result)
   } catch (error) {
     console.error('Error processing file:', error)
     return NextResponse.json({ error: 'Error processing file' }, { status: 500 })
   }
-}
\ No newline at end of file
+}
@@ -2,7 +2,6 @@
 
 import { useState, useEffect, useRef } from "react";
 import { notFound } from "next/navigation";
-import { getShowById } from "@/lib/db";
 import {
   Accordion,
   AccordionItem,
@@ -16,12 +15,14 @@ import TimingButton from "./TimingButton";
 import WaveformPane2 from "@/components/WaveformPane2";
 import TimingPane from "@/components/TimingPane";
 import CharacterAvatars from "@/components/CharacterAvatars";
+import { activeAt, fetchTimeline, TimelineData } from "@/lib/timeline";
 
 export default function Viewshow({ params }: { params: { id: string } }) {
   const [currentTime, setCurrentTime] = useState(0);
   const seekToRef = useRef<((time: number) => void) | null>(null);
   const [show, setShow] = useState<any>(null);
   const [loading, setLoading] = useState(true);
+  const [timeline, setTimeline] = useState<TimelineData | null>(null);
 
   useEffect(() => {
     const fetchShow = async () => {
@@ -42,6 +43,10 @@ export default function Viewshow({ params }: { params: { id: string } }) {
     fetchShow();
   }, [params.id]);
 
+  useEffect(() => {
+    fetchTimeline(params.id).then(setTimeline).catch(() => setTimeline(null));
+  }, [params.id, show?.updated_at]);
+
   const refreshShow = async () => {
     try {
       const response = await fetch(`/api/shows/${params.id}`);
@@ -69,18 +74,15 @@ export default function Viewshow({ params }: { params: { id: string } }) {
     music: `/api/audio/full_music.mp3`,
   };
 
-  const parsedData = show.parsed_script && JSON.parse(show.parsed_script);
-  const eventTiming = show.event_timing && JSON.parse(show.event_timing);
+  const parsedData = show.parsed_script;
+  const eventTiming = show.event_timing;
   const events = parsedData?.events || [];
 
-  console.log("parsedData", parsedData.characters);
+  console.log("parsedData", parsedData?.characters);
 
   const getCurrentSpeaker = (time: number) => {
-    if (!eventTiming?.dialogue_timing) return "";
-    const currentLine = eventTiming.dialogue_timing.find(
-      (timing) => time >= timing.start_time && time <= timing.end_time
-    );
-    return currentLine?.character || "";
+    if (!timeline) return "";
+    return activeAt(timeline, time, "dialogue")[0]?.speaker || "";
   };
 
   return (
@@ -107,6 +109,7 @@ export default function Viewshow({ params }: { params: { id: string } }) {
               <h2 className="text-lg font-bold mb-2">Timing</h2>
               <TimingPane 
                 dialogueTiming={eventTiming.dialogue_timing}
+                timeline={timeline}
                 currentTime={currentTime}
                 onSeek={(time) => seekToRef.current?.(time)}
               />
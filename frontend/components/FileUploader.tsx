@@ -19,16 +19,16 @@ export default function FileUploader() {
     if (!file) {
       toast({
         title: "No file selected",
-        description: "Please select a .docx file to upload.",
+        description: "Please select a .docx or .pdf file to upload.",
         variant: "destructive",
       })
       return
     }
 
-    if (!file.name.endsWith('.docx')) {
+    if (!file.name.endsWith('.docx') && !file.name.endsWith('.pdf')) {
       toast({
         title: "Invalid file type",
-        description: "Please select a .docx file.",
+        description: "Please select a .docx or .pdf file.",
         variant: "destructive",
       })
       return
@@ -66,7 +66,7 @@ export default function FileUploader() {
     <div className="flex flex-col items-center gap-4">
       <Input
         type="file"
-        accept=".docx"
+        accept=".docx,.pdf"
         onChange={handleFileChange}
         className="max-w-xs"
       />
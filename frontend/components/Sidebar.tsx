@@ -6,32 +6,37 @@ import Link from "next/link";
 
 interface Show {
   id: number;
-  original_script: string;
-  parsed_script: string;
+  name: string;
+  status: string;
+  duration: number | null;
+  updated_at: string | null;
+  stems: { [type: string]: { size: number; hash: string } };
 }
 
 export default function Sidebar() {
   const [shows, setShows] = useState<Show[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
 
-  useEffect(() => {
-    const fetchShows = async () => {
-      try {
-        const response = await fetch("/api/shows");
-        if (!response.ok) {
-          throw new Error("Failed to fetch shows");
-        }
-        const data = await response.json();
-        setShows(data);
-      } catch (err) {
-        setError("Failed to load shows");
-        console.error(err);
-      } finally {
-        setIsLoading(false);
+  const fetchShows = async (after: number | null = null) => {
+    try {
+      const response = await fetch(after ? `/api/shows?after=${after}` : "/api/shows");
+      if (!response.ok) {
+        throw new Error("Failed to fetch shows");
       }
-    };
+      const data = await response.json();
+      setShows((prev) => (after ? [...prev, ...data.shows] : data.shows));
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError("Failed to load shows");
+      console.error(err);
+    } finally {
+      setIsLoading(false);
+    }
+  };
 
+  useEffect(() => {
     fetchShows();
   }, []);
 
@@ -64,6 +69,17 @@ export default function Sidebar() {
               </Link>
             </li>
           ))}
+          {nextCursor && (
+            <li>
+              <Button
+                variant="ghost"
+                className="w-full justify-start text-left"
+                onClick={() => fetchShows(nextCursor)}
+              >
+                More...
+              </Button>
+            </li>
+          )}
           <li>
             <Link href={`/`}>
               <Button
@@ -2,6 +2,7 @@
 
 import { useState, useEffect } from "react"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
+import { activeAt, TimelineData } from "@/lib/timeline"
 
 interface DialogueTiming {
   character: string
@@ -15,17 +16,21 @@ interface DialogueTiming {
 
 interface TimingPaneProps {
   dialogueTiming: DialogueTiming[]
+  timeline?: TimelineData | null
   currentTime: number
   onSeek?: (time: number) => void
 }
 
-export default function TimingPane({ dialogueTiming, currentTime, onSeek }: TimingPaneProps) {
+export default function TimingPane({ dialogueTiming, timeline, currentTime, onSeek }: TimingPaneProps) {
   const [selectedLine, setSelectedLine] = useState<number>(-1)
 
   useEffect(() => {
-    const currentLineIndex = dialogueTiming.findIndex(
-      (timing) => currentTime >= timing.start_time && currentTime <= timing.end_time
-    );
+    // dialogue events come first in the timeline, so an event's id is its row index
+    const currentLineIndex = timeline
+      ? activeAt(timeline, currentTime, "dialogue")[0]?.id ?? -1
+      : dialogueTiming.findIndex(
+          (timing) => currentTime >= timing.start_time && currentTime <= timing.end_time
+        );
     
     console.log('Current time update:', {
       currentTime,
@@ -39,7 +44,7 @@ export default function TimingPane({ dialogueTiming, currentTime, onSeek }: Timi
       const row = document.querySelector(`[data-row-index="${currentLineIndex}"]`);
       row?.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
     }
-  }, [currentTime, dialogueTiming])
+  }, [currentTime, dialogueTiming, timeline])
 
   const handleRowClick = async (index: number) => {
     console.log('Row clicked:', {
@@ -5,6 +5,8 @@ import WaveSurfer from "wavesurfer.js";
 import RegenerateButtons from "./RegenerateButtons";
 import { audioColors } from "../constants/colors";
 
+const BACKEND_URL = "http://127.0.0.1:8000";
+
 interface WaveformPaneProps {
   showId: number;
   onTimeUpdate?: (time: number) => void;
@@ -21,9 +23,22 @@ export default function WaveformPane({ showId, onTimeUpdate, onSeek, allowRegene
   const [loading, setLoading] = useState(true);
   const [availableTypes, setAvailableTypes] = useState<string[]>([]);
   const audioTypes = ["dialogue", "sfx", "music"];
+  // precomputed waveform peaks per stem, so WaveSurfer can draw without decoding the audio
+  const stemPeaks = useRef<{ [key: string]: { data: number[]; duration: number } }>({});
   const fetchAudio = async (type: string) => {
     try {
-      const response = await fetch(`http://127.0.0.1:8000/get-audio/${showId}?type=${type}`);
+      const peaksResponse = await fetch(`${BACKEND_URL}/peaks/${showId}?type=${type}`);
+      if (peaksResponse.ok) {
+        const peaks = await peaksResponse.json();
+        stemPeaks.current[type] = { data: peaks.data, duration: peaks.duration };
+        // the audio itself streams from the backend while the waveform is drawn from the peaks
+        setAudioUrls((prev) => ({ ...prev, [type]: `${BACKEND_URL}/get-audio/${showId}?type=${type}&t=${Date.now()}` }));
+        return true;
+      }
+
+      // stems rendered before peaks were stored: download and decode the audio instead
+      delete stemPeaks.current[type];
+      const response = await fetch(`${BACKEND_URL}/get-audio/${showId}?type=${type}`);
       if (!response.ok) {
         console.log(`No audio available for ${type}`);
         return false;
@@ -100,7 +115,8 @@ export default function WaveformPane({ showId, onTimeUpdate, onSeek, allowRegene
         normalize: true,
       });
     
-      wavesurfers.current[type].load(url);
+      const peaks = stemPeaks.current[type];
+      wavesurfers.current[type].load(url, peaks ? [peaks.data] : undefined, peaks?.duration);
       wavesurfers.current[type].setVolume(volumes[type as keyof typeof volumes]);
 
       // Add timeupdate listener
@@ -0,0 +1,74 @@
+// Client side of backend/timeline.py: the show's events as columns sorted by start time,
+// with the max end time of each implicit subtree, so seeking is a tree search, not a scan.
+
+const BACKEND_URL = "http://127.0.0.1:8000"
+const NO_STRING = 0xffffffff
+
+export interface TimelineData {
+  kinds: string[]
+  strings: string[]
+  start: number[]
+  end: number[]
+  max_end: number[]
+  id: number[]
+  kind: number[]
+  source: number[]
+  text: number[]
+  speaker: number[]
+  emotion: number[]
+}
+
+export interface TimelineEvent {
+  id: number
+  kind: string
+  start: number
+  end: number
+  source: string | null
+  text: string | null
+  speaker: string | null
+  emotion: string | null
+}
+
+export async function fetchTimeline(showId: number | string): Promise<TimelineData | null> {
+  const response = await fetch(`${BACKEND_URL}/timeline/${showId}`)
+  if (!response.ok) return null
+  return response.json()
+}
+
+function lookup(timeline: TimelineData, index: number): string | null {
+  return index === NO_STRING ? null : timeline.strings[index]
+}
+
+function eventAt(timeline: TimelineData, position: number): TimelineEvent {
+  return {
+    id: timeline.id[position],
+    kind: timeline.kinds[timeline.kind[position]],
+    start: timeline.start[position],
+    end: timeline.end[position],
+    source: lookup(timeline, timeline.source[position]),
+    text: lookup(timeline, timeline.text[position]),
+    speaker: lookup(timeline, timeline.speaker[position]),
+    emotion: lookup(timeline, timeline.emotion[position]),
+  }
+}
+
+// Events with start <= t < end, optionally of one kind ("dialogue", "sfx", "background")
+export function activeAt(timeline: TimelineData, t: number, kind?: string): TimelineEvent[] {
+  const found: number[] = []
+  const stack: [number, number][] = [[0, timeline.start.length]]
+  while (stack.length) {
+    const [low, high] = stack.pop()!
+    if (low >= high) continue
+    const middle = (low + high) >> 1
+    if (timeline.max_end[middle] <= t) continue // everything in this subtree has ended
+    stack.push([low, middle])
+    if (timeline.start[middle] <= t) {
+      if (timeline.end[middle] > t) found.push(middle)
+      stack.push([middle + 1, high])
+    }
+  }
+  return found
+    .sort((a, b) => a - b)
+    .map((position) => eventAt(timeline, position))
+    .filter((event) => !kind || event.kind === kind)
+}